@@ -2,6 +2,7 @@
 Authentication utilities for CMMS API
 JWT token generation and validation
 """
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -11,6 +12,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from database.connection import get_db
 from database.models_cmms import User, Role
+from database.tenancy import claims_tenant, set_session_tenant
+from api.revocation import revocation_list
 from config.app_config import config
 
 # Password hashing
@@ -18,6 +21,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # HTTP Bearer token
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -56,34 +60,83 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.setdefault("type", "access")
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, config.JWT_SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def create_refresh_token(user_id: int) -> str:
+    """Create a long-lived JWT refresh token (single use, rotated on refresh)"""
+    return create_access_token(
+        data={"sub": str(user_id), "type": "refresh"},
+        expires_delta=timedelta(days=config.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+
+def decode_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Decode and verify a JWT of the given type; returns None when invalid or expired"""
+    try:
+        payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+    # Tokens issued before refresh tokens existed carry no type and are access tokens
+    if payload.get("type", "access") != token_type or payload.get("sub") is None:
+        return None
+    return payload
+
+
+def token_expiry(payload: dict) -> datetime:
+    """Expiry of a decoded token as naive UTC"""
+    return datetime.utcfromtimestamp(payload["exp"])
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def verify_token(token: str, db: Session) -> dict:
+    """Verify a JWT access token (signature, expiry, revocation) and return its claims"""
+    payload = decode_token(token)
+    if payload is None or not str(payload["sub"]).isdigit():
+        raise _credentials_exception()
     
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+    jti = payload.get("jti")
+    if jti and revocation_list.is_revoked(jti, db):
+        raise _credentials_exception()
+    # Deactivated, deleted or re-roled users: their tokens issued before the change are void
+    if revocation_list.is_user_revoked(int(payload["sub"]), payload.get("iat"), db):
+        raise _credentials_exception()
     
-    user = db.query(User).filter(User.id == user_id).first()
+    return payload
+
+
+def get_token_claims(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> dict:
+    """Claims of the bearer access token, without loading the user; scopes the session to the caller's tenant"""
+    claims = verify_token(credentials.credentials, db)
+    set_session_tenant(db, claims_tenant(claims))
+    return claims
+
+
+def get_current_user(
+    claims: dict = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user from JWT token"""
+    return _load_user(claims, db)
+
+
+def _load_user(claims: dict, db: Session) -> User:
+    user = db.query(User).filter(User.id == int(claims["sub"])).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
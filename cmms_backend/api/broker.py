@@ -0,0 +1,183 @@
+"""
+In-process publish/subscribe broker for server-sent events
+Routers publish change events after committing; each SSE connection holds a
+bounded queue filtered by topic and, optionally, by the assigned user.
+The broker is per process. With several workers, set SSE_REDIS_URL so events
+are relayed through a Redis channel and every worker delivers them; without
+it a client only receives events published by the worker it is connected to.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from config.app_config import config
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("worksheets", "inventory", "pm")
+
+
+class Subscription:
+    """A single SSE client's queue and filter"""
+
+    def __init__(self, topics: Set[str], user_id: int, only_mine: bool, max_queue: int, tenant_id: Optional[str] = None):
+        self.topics = topics
+        self.user_id = user_id
+        self.tenant_id = tenant_id
+        self.only_mine = only_mine
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Set when events had to be dropped; the client should resync
+        self.overflowed = False
+
+    def matches(self, topic: str, data: Dict[str, Any], tenant_id: Optional[str] = None) -> bool:
+        if topic not in self.topics or tenant_id != self.tenant_id:
+            return False
+        if self.only_mine and "assigned_to_user_id" in data:
+            return data["assigned_to_user_id"] == self.user_id
+        return True
+
+
+class RedisRelay:
+    """Relays events through a Redis channel so the broker of every worker receives them"""
+
+    def __init__(self, url: str, channel: str = "cmms:events"):
+        self.url = url
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.channel = channel
+        self._listener_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def publish(self, event: Dict[str, Any]):
+        self.client.publish(self.channel, json.dumps(event, default=str))
+
+    def listen(self, deliver: Callable[[Dict[str, Any]], None]):
+        """Start the listener thread of this process (once; workers forked after a start get their own)"""
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, args=(deliver,), name="sse-relay", daemon=True).start()
+
+    def _listen(self, deliver: Callable[[Dict[str, Any]], None]):
+        # No read timeout: the subscription blocks until the next event
+        client = redis.Redis.from_url(self.url, socket_timeout=None)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    deliver(json.loads(message["data"]))
+            except redis.RedisError as e:
+                logger.warning(f"SSE relay disconnected, retrying: {e}")
+                time.sleep(1)
+
+
+class EventBroker:
+    """Fan out published events to matching subscriptions"""
+
+    def __init__(self, max_queue: int = 100, relay: Optional[RedisRelay] = None):
+        self.max_queue = max_queue
+        self.relay = relay
+        self._subscriptions: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(
+        self, topics: Iterable[str], user_id: int, only_mine: bool = False, tenant_id: Optional[str] = None
+    ) -> Subscription:
+        """Register a subscription; must be called from the event loop"""
+        self._loop = asyncio.get_running_loop()
+        if self.relay is not None:
+            self.relay.listen(self.dispatch)
+        subscription = Subscription(set(topics), user_id, only_mine, self.max_queue, tenant_id)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, topic: str, data: Dict[str, Any], tenant_id: Optional[str] = None):
+        """Publish an event to subscribers of the same tenant; safe to call from the loop or from worker threads"""
+        event = {
+            "topic": topic,
+            "tenant_id": tenant_id,
+            "data": data,
+            "published_at": datetime.utcnow().isoformat(),
+        }
+        if self.relay is not None:
+            try:
+                self.relay.publish(event)
+                return
+            except redis.RedisError as e:
+                logger.warning(f"SSE relay unavailable, delivering locally only: {e}")
+        self.dispatch(event)
+
+    def dispatch(self, event: Dict[str, Any]):
+        """Hand an event to the event loop of this process; called by publish and by the relay thread"""
+        if not self._subscriptions:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._deliver(event)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Dict[str, Any]):
+        # Ids are assigned here so they increase on each connection, also for relayed events
+        event = {**event, "id": next(self._ids)}
+        self.published += 1
+        for subscription in list(self._subscriptions):
+            if not subscription.matches(event["topic"], event["data"], event["tenant_id"]):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serialise an event in text/event-stream format"""
+    payload = json.dumps(event["data"], default=str)
+    return f"id: {event['id']}\nevent: {event['topic']}\ndata: {payload}\n\n"
+
+
+def _create_relay() -> Optional[RedisRelay]:
+    if not config.SSE_REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("SSE_REDIS_URL is set but redis is not installed; events reach only the worker that published them")
+        return None
+    return RedisRelay(config.SSE_REDIS_URL)
+
+
+broker = EventBroker(max_queue=config.SSE_QUEUE_SIZE, relay=_create_relay())
+
+
+def publish_change(topic: str, action: str, entity_id: int, tenant_id: Optional[str] = None, **data):
+    """Publish a created/updated/deleted event for an entity of a tenant"""
+    broker.publish(topic, {"action": action, "id": entity_id, **data}, tenant_id)
@@ -0,0 +1,230 @@
+"""
+HTTP conditional GET and response caching
+ETag / Last-Modified validators are derived from a per-table stamp
+(write counter, row count and MAX(updated_at)) fetched in a single small
+query, so a revalidating client gets 304 without the payload being loaded or
+serialised. The write counters live in table_versions and are bumped after
+every commit that wrote to the table, so updates within the same second
+(DATETIME has second precision on MySQL) still change the stamp, in every
+worker.
+Rendered bodies can optionally be kept in an in-process LRU cache keyed by
+URL and stamp, and dropped whenever one of their tables is written.
+Versioned rows get a strong per-row ETag instead, which clients send back in
+If-Match to make their writes conditional.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from api.fast_json import FastJSONResponse
+from config.app_config import config
+from database.events import ChangeSet, register_commit_listener
+from database.models_cmms import TableVersion
+from database.tenancy import session_tenant
+from database.upsert import increment_rows
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _timestamp_column(model):
+    """Return the column that records the last modification of a row"""
+    for name in ("updated_at", "last_updated"):
+        column = getattr(model, name, None)
+        if column is not None:
+            return column
+    return None
+
+
+def table_stamp(db: Session, *models) -> Tuple[str, Optional[datetime]]:
+    """
+    Return a cheap change stamp for the given tables in one round trip
+    The stamp changes on every committed write (the counter is per table,
+    so writes of other tenants change it too), and on inserts, deletes and
+    timestamped updates made outside the ORM.
+    """
+    tenant_id = session_tenant(db)
+    columns = []
+    for model in models:
+        table = model.__table__
+        columns.append(select(TableVersion.version).where(TableVersion.table_name == table.name).scalar_subquery())
+        # Scoped to the session's tenant so the stamp reads one (tenant_id, updated_at) index range
+        scope = [table.c.tenant_id == tenant_id] if tenant_id is not None and "tenant_id" in table.c else []
+        columns.append(select(func.count()).select_from(table).where(*scope).scalar_subquery())
+        ts_column = _timestamp_column(model)
+        if ts_column is not None:
+            columns.append(select(func.max(ts_column)).where(*scope).scalar_subquery())
+
+    row = db.execute(select(*columns)).one()
+    last_modified = max((v for v in row if isinstance(v, datetime)), default=None)
+    return "|".join(str(v) for v in row), last_modified
+
+
+def compute_validators(request: Request, db: Session, models: Iterable, vary: str = "") -> Validators:
+    """Build the ETag and Last-Modified validators for a request"""
+    models = list(models)
+    stamp, last_modified = table_stamp(db, *models)
+    key = "\n".join([request.url.path, str(request.url.query), str(session_tenant(db)), vary, stamp])
+    etag = '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + '"'
+    return Validators(etag=etag, last_modified=last_modified)
+
+
+def _validator_headers(validators: Validators) -> Dict[str, str]:
+    headers = {"ETag": validators.etag, "Cache-Control": CACHE_CONTROL}
+    if validators.last_modified is not None:
+        # Timestamps are stored as naive UTC
+        last_modified = validators.last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return validators.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+        return validators.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def version_etag(version: Optional[int]) -> str:
+    """Strong ETag of a row with a version counter"""
+    return f'"v{version}"'
+
+
+def precondition_failed(request: Request, etag: str) -> bool:
+    """Evaluate If-Match against the current ETag (weak tags never match)"""
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return False
+    return etag not in {tag.strip() for tag in if_match.split(",")}
+
+
+class ResponseCache:
+    """In-process LRU of rendered JSON bodies, tagged by the tables they read"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Set[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, body: bytes, tables: Set[str]):
+        with self._lock:
+            self._entries[key] = (body, tables)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables: Iterable[str]):
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, (_, tags) in self._entries.items() if tags & tables]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(max_entries=config.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+@register_commit_listener
+def _bump_table_versions(changes: ChangeSet):
+    from database import connection
+
+    tables = sorted(set(changes) - {TableVersion.__tablename__})
+    if not tables or connection.engine is None:
+        return
+    try:
+        with connection.engine.begin() as conn:
+            increment_rows(conn, TableVersion.__table__, "table_name", tables, "version")
+    except Exception as e:
+        # The count and MAX(updated_at) parts of the stamp still catch most changes
+        logger.warning(f"Could not bump table versions of {tables}: {e}")
+
+
+@register_commit_listener
+def _invalidate_response_cache(changes: ChangeSet):
+    response_cache.invalidate(changes.keys())
+
+
+def conditional_json(
+    request: Request,
+    db: Session,
+    models: Iterable,
+    build: Callable[[], Any],
+    vary: str = "",
+) -> Response:
+    """
+    Answer a read-only GET with conditional request support
+    `build` is only called when the client copy is stale and the body is
+    not cached; it may return dicts (fast path) or Pydantic models.
+    """
+    models = list(models)
+    validators = compute_validators(request, db, models, vary)
+    headers = _validator_headers(validators)
+
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cache_key = validators.etag
+    if config.RESPONSE_CACHE_ENABLED:
+        body = response_cache.get(cache_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=headers)
+
+    response = FastJSONResponse(content=build(), headers=headers)
+    if config.RESPONSE_CACHE_ENABLED:
+        response_cache.set(cache_key, response.body, {model.__table__.name for model in models})
+    return response
+
+
+def conditional_row(request: Request, validators: Validators, build: Callable[[], Any]) -> Response:
+    """Answer a GET of a single versioned row: 304 when the client copy is current"""
+    headers = _validator_headers(validators)
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FastJSONResponse(content=build(), headers=headers)
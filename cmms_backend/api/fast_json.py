@@ -0,0 +1,52 @@
+"""
+Fast JSON serialization for trusted database output
+List endpoints select plain columns, map the Row tuples straight to dicts and
+encode them with orjson, skipping per-row Pydantic construction and FastAPI's
+response_model validation. Falls back to the standard json module when
+orjson is not installed.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, List
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; accepts dicts, lists and Pydantic models"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(rows: Iterable) -> List[dict]:
+    """Map SQLAlchemy Row tuples to dicts keyed by column label"""
+    rows = list(rows)
+    if not rows:
+        return []
+    keys = tuple(rows[0]._fields)
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,233 @@
+"""
+Logging pipeline
+Log calls only put the record on a bounded queue; a background thread
+formats it and writes it to stdout, so a slow terminal or log collector never
+stalls the event loop. When the queue is full records are dropped (and the
+number dropped is logged) instead of blocking the caller.
+
+Records are JSON lines (LOG_FORMAT=json) or the classic text format, and
+carry the id of the request they were logged under. RequestIdMiddleware takes
+the id from the X-Request-ID header or generates one and returns it in the
+response. SQL statements are logged with LOG_SQL and sampled per request
+(LOG_SQL_SAMPLE_RATE), so a sampled request shows all of its statements.
+"""
+import atexit
+import contextvars
+import copy
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from api.fast_json import dumps
+from config.app_config import config
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Incoming X-Request-ID values are echoed into logs and headers only if they look like ids
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+_SQL_LOGGER = "sqlalchemy.engine.Engine"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# LogRecord attributes; anything else on a record came from `extra=` and is emitted as a field
+# (except uvicorn's ANSI-colored copy of the message)
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {
+    "message", "asctime", "request_id", "taskName", "color_message"
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return dumps(entry).decode("utf-8")
+
+
+class _RequestContext(logging.Filter):
+    """Stamps records with the current request id; runs in the thread that logs"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SqlSampler(logging.Filter):
+    """
+    Keeps a fraction of SQL log records
+    Within a request the decision follows the request id, so a request is
+    logged completely or not at all. Outside requests each statement is
+    sampled together with its parameter line. Warnings always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(max(0.0, min(rate, 1.0)) * 0xFFFFFFFF)
+        self._local = threading.local()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        request_id = request_id_var.get()
+        if request_id is not None:
+            return zlib.crc32(request_id.encode()) <= self.threshold
+        # The engine logs "[cached since ...] (params)" right after each statement
+        if not str(record.msg).startswith("["):
+            self._local.keep = random.random() * 0xFFFFFFFF <= self.threshold
+        return getattr(self._local, "keep", True)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of waiting when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change later) but keep the traceback separate for the formatter
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Dropped {self.dropped} log records: the log queue was full",
+                    "request_id": "-",
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the sentinel must not be dropped or the writer thread never stops
+        self.queue.put(self._sentinel)
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[_Listener] = None
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.Queue(config.LOG_QUEUE_SIZE)
+    _handler.queue = log_queue
+    _listener = _Listener(log_queue, _output_handler())
+    _listener.start()
+
+
+def configure_logging():
+    """Route all logging through the queue; safe to call more than once"""
+    global _handler
+    if _handler is not None:
+        return
+
+    _handler = NonBlockingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    _handler.addFilter(_RequestContext())
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(getattr(logging, config.LOG_LEVEL))
+
+    sql_logger = logging.getLogger(_SQL_LOGGER)
+    if config.LOG_SQL:
+        sql_logger.setLevel(logging.INFO)
+        sql_logger.addFilter(SqlSampler(config.LOG_SQL_SAMPLE_RATE))
+    else:
+        sql_logger.setLevel(logging.WARNING)
+
+    _start_listener()
+    atexit.register(shutdown_logging)
+
+
+def after_fork():
+    """
+    Give a forked worker its own queue and writer thread
+    Threads do not survive fork and the inherited queue's lock may have been
+    held by the parent's writer at that moment.
+    """
+    if _handler is not None:
+        _start_listener()
+
+
+def shutdown_logging():
+    """Write out the queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _request_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            value = value.decode("latin-1")
+            if _REQUEST_ID_PATTERN.match(value):
+                return value
+            break
+    return uuid.uuid4().hex
+
+
+class RequestIdMiddleware:
+    """Binds a request id to the request's log records and returns it as X-Request-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = _request_id(scope)
+        # Not reset afterwards: the server runs each request in its own task (and context), and the
+        # unhandled-exception handler outside this middleware should still log with the id
+        request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
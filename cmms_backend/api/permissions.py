@@ -0,0 +1,140 @@
+"""
+Permission engine
+Role.permissions is compiled once per role into an integer bitset of
+Permission flags. The bitset is embedded in access tokens (`perms` claim),
+so `require(...)` authorizes a request from the token alone without a
+database round trip. Deactivating a user, changing their role or changing
+a role's permissions revokes the tokens the affected users hold
+(api/revocation.py), so their next request has to refresh.
+"""
+import logging
+import threading
+from enum import IntFlag
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from database.connection import get_db
+from database.events import ChangeSet, register_commit_listener
+from database.models_cmms import Role, User
+from api.auth import get_token_claims
+
+logger = logging.getLogger(__name__)
+
+
+class Permission(IntFlag):
+    """Single permissions; Role.permissions lists them by name"""
+    VIEW_MACHINES = 1 << 0
+    MANAGE_MACHINES = 1 << 1
+    VIEW_INVENTORY = 1 << 2
+    MANAGE_INVENTORY = 1 << 3
+    VIEW_WORKSHEETS = 1 << 4
+    MANAGE_WORKSHEETS = 1 << 5
+    VIEW_PM = 1 << 6
+    MANAGE_PM = 1 << 7
+    VIEW_REPORTS = 1 << 8
+    MANAGE_USERS = 1 << 9
+    MANAGE_SYSTEM = 1 << 10
+
+
+ALL_PERMISSIONS = 0
+for _permission in Permission:
+    ALL_PERMISSIONS |= _permission
+
+# Roles with no explicit permissions keep the access they had before the engine existed
+ADMIN_ROLE_NAMES = ("ADMIN", "admin", "developer")
+DEFAULT_PERMISSIONS = ALL_PERMISSIONS & ~(Permission.MANAGE_USERS | Permission.MANAGE_SYSTEM)
+
+
+def _permission_bit(name: str) -> int:
+    key = name.strip().upper().replace("-", "_").replace(".", "_")
+    if key in ("*", "ALL"):
+        return ALL_PERMISSIONS
+    try:
+        return Permission[key]
+    except KeyError:
+        logger.warning(f"Ignoring unknown permission '{name}'")
+        return 0
+
+
+def compile_permissions(role_name: Optional[str], permissions) -> int:
+    """
+    Compile a Role.permissions value into a bitset
+    Accepts a list of names, a {name: bool} mapping or "*"; None falls back
+    to the role name (admin roles get everything).
+    """
+    if permissions is None:
+        return ALL_PERMISSIONS if role_name in ADMIN_ROLE_NAMES else DEFAULT_PERMISSIONS
+    if isinstance(permissions, str):
+        permissions = [permissions]
+    elif isinstance(permissions, dict):
+        permissions = [name for name, granted in permissions.items() if granted]
+    bits = 0
+    for name in permissions:
+        bits |= _permission_bit(str(name))
+    return bits
+
+
+class RolePermissionCache:
+    """Compiled bitsets per role id, cleared whenever the roles table is written"""
+
+    def __init__(self):
+        self._bits: Dict[Optional[int], int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, role_id: Optional[int], role_name: Optional[str], permissions) -> int:
+        """Bitset for an already loaded role row"""
+        bits = self._bits.get(role_id)
+        if bits is None:
+            bits = compile_permissions(role_name, permissions)
+            with self._lock:
+                self._bits[role_id] = bits
+        return bits
+
+    def load(self, db: Session, role_id: Optional[int]) -> int:
+        """Bitset for a role id, querying the role only on a cache miss"""
+        bits = self._bits.get(role_id)
+        if bits is None:
+            role = db.query(Role.name, Role.permissions).filter(Role.id == role_id).first()
+            bits = self.get(role_id, *(role or (None, None)))
+        return bits
+
+    def clear(self):
+        with self._lock:
+            self._bits.clear()
+
+
+role_permissions = RolePermissionCache()
+
+
+@register_commit_listener
+def _invalidate_role_permissions(changes: ChangeSet):
+    if "roles" in changes:
+        role_permissions.clear()
+
+
+def claims_permissions(claims: dict, db: Session) -> int:
+    """Permission bitset of a verified token; tokens without a `perms` claim fall back to the role"""
+    perms = claims.get("perms")
+    if perms is not None:
+        return int(perms)
+    role_id = db.query(User.role_id).filter(User.id == int(claims["sub"])).scalar()
+    return role_permissions.load(db, role_id)
+
+
+def require(*permissions: Permission):
+    """Dependency that checks the caller holds every given permission; returns the token claims"""
+    needed = 0
+    for permission in permissions:
+        needed |= permission
+
+    def check_permissions(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)) -> dict:
+        if claims_permissions(claims, db) & needed != needed:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return claims
+
+    return check_permissions
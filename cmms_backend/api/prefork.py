@@ -0,0 +1,248 @@
+"""
+Preforking multi-process server
+The master binds the listening socket, creates the tables once, imports the
+application (routers, models, mappers, OpenAPI schema) and then forks the
+workers. Workers share the preloaded pages copy-on-write and serve their
+first request warm; the kernel spreads connections over them.
+
+Signals to the master:
+    TERM / INT  graceful stop (in-flight requests finish within SERVER_GRACEFUL_TIMEOUT)
+    HUP         rolling restart, one worker at a time, each replaced only once
+                its successor is serving
+Preloaded code is not re-imported by a restart; run with SERVER_PRELOAD=false
+to have HUP pick up a new release (workers then import the app themselves).
+"""
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from config.app_config import config
+from database import connection
+from api import log_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_workers(value) -> int:
+    """Worker count from SERVER_WORKERS ("auto" = one per CPU core)"""
+    if str(value).strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def preload(app_path: str):
+    """Import and warm the application in the master so workers inherit it"""
+    from sqlalchemy.orm import configure_mappers
+
+    app = import_from_string(app_path)
+    configure_mappers()
+    app.openapi()
+    return app
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the master once it is accepting requests"""
+
+    def __init__(self, server_config: uvicorn.Config, ready_fd: int):
+        super().__init__(server_config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class PreforkServer:
+    """Master process: forks, supervises and restarts uvicorn workers"""
+
+    def __init__(self, app_path: str, host: str, port: int, workers: int, preload_app: bool = True):
+        self.app_path = app_path
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload_app = preload_app
+        self.app = None
+        self.sock: Optional[socket.socket] = None
+        self.children: Dict[int, int] = {}  # pid -> readiness pipe read end
+        self.signals: List[int] = []
+        self.retiring: Set[int] = set()
+        self.stopping = False
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(write_fd)
+        os.close(write_fd)
+        self.children[pid] = read_fd
+        return pid
+
+    def _run_worker(self, ready_fd: int):
+        status = 0
+        try:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            log_pipeline.after_fork()
+            connection.after_fork(self.workers)
+            app = self.app if self.app is not None else import_from_string(self.app_path)
+            server_config = uvicorn.Config(
+                app,
+                log_level=config.LOG_LEVEL.lower(),
+                log_config=None,
+                timeout_graceful_shutdown=config.SERVER_GRACEFUL_TIMEOUT,
+            )
+            _WorkerServer(server_config, ready_fd).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker crashed")
+            status = 1
+        finally:
+            # os._exit skips atexit: flush the queued log records first
+            log_pipeline.shutdown_logging()
+            os._exit(status)
+
+    def wait_ready(self, pid: int, timeout: float) -> bool:
+        """Block until a worker reports it is serving (False if it died or timed out)"""
+        read_fd = self.children.get(pid)
+        deadline = time.monotonic() + timeout
+        while read_fd is not None and time.monotonic() < deadline:
+            readable, _, _ = select.select([read_fd], [], [], 0.5)
+            if readable:
+                return os.read(read_fd, 1) == b"1"
+            if self.reap() and pid not in self.children:
+                return False
+        return False
+
+    def reap(self) -> bool:
+        """Collect exited workers; returns True when any exited"""
+        reaped = False
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            read_fd = self.children.pop(pid, None)
+            if read_fd is not None:
+                os.close(read_fd)
+                reaped = True
+                if not self.stopping and pid not in self.retiring:
+                    logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+            self.retiring.discard(pid)
+        return reaped
+
+    def stop_worker(self, pid: int, timeout: float):
+        """SIGTERM a worker and wait for it to drain; SIGKILL after the timeout"""
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while pid in self.children and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        if pid in self.children:
+            logger.warning(f"Worker {pid} did not stop in {timeout}s, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            os.close(self.children.pop(pid))
+            self.retiring.discard(pid)
+
+    def rolling_restart(self):
+        logger.info(f"Rolling restart of {len(self.children)} workers")
+        for old_pid in list(self.children):
+            new_pid = self.spawn()
+            if not self.wait_ready(new_pid, config.SERVER_BOOT_TIMEOUT):
+                logger.error(f"Replacement worker {new_pid} did not start, keeping worker {old_pid}")
+                if new_pid in self.children:
+                    self.stop_worker(new_pid, 0)
+                return
+            self.stop_worker(old_pid, config.SERVER_GRACEFUL_TIMEOUT)
+        logger.info("Rolling restart complete")
+
+    def stop(self):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + config.SERVER_GRACEFUL_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        for pid in list(self.children):
+            self.stop_worker(pid, 0)
+
+    def _on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def run(self):
+        self.sock = self.bind()
+        # Create tables once here rather than racing in every worker's startup
+        try:
+            connection.init_db()
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+        if self.preload_app:
+            self.app = preload(self.app_path)
+        connection.prepare_fork()
+        # Objects created so far are never freed: keep the collector from touching (and copying) their pages
+        gc.collect()
+        gc.freeze()
+
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+
+        logger.info(f"Starting {self.workers} workers on {self.host}:{self.port} (preload={self.preload_app})")
+        for _ in range(self.workers):
+            self.spawn()
+
+        while True:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.rolling_restart()
+                else:
+                    logger.info("Stopping workers")
+                    self.stop()
+                    self.sock.close()
+                    return
+            self.reap()
+            # Replace crashed workers; back off so a broken release does not fork in a tight loop
+            if len(self.children) < self.workers:
+                self.spawn()
+                time.sleep(1)
+            else:
+                time.sleep(0.5)
+
+
+def serve(app_path: str, host: str, port: int, workers: int, preload_app: bool = True):
+    """Run the preforking server until it is told to stop"""
+    if not hasattr(os, "fork"):
+        logger.warning("Preforking needs os.fork; serving with a single process")
+        uvicorn.run(app_path, host=host, port=port, log_level=config.LOG_LEVEL.lower(), log_config=None)
+        return
+    PreforkServer(app_path, host, port, workers, preload_app).run()
+    sys.exit(0)
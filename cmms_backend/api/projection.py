@@ -0,0 +1,94 @@
+"""
+Column projection derived from response schemas
+Builds the column list a DTO needs from its Pydantic fields, so list queries
+select only those columns (with_entities) and detail queries load only them
+(load_only). Supports sparse fieldsets through a `fields=` query parameter.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query, Session, load_only
+
+
+@lru_cache(maxsize=None)
+def _schema_column_names(model, schema: Type[BaseModel]) -> Tuple[str, ...]:
+    """Schema fields that map 1:1 onto a mapped column of the model"""
+    mapped = set(inspect(model).columns.keys())
+    return tuple(name for name in schema.model_fields if name in mapped)
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Parse a comma separated `fields=` parameter against a response schema
+    Returns None when all fields are requested. `id` is always included.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    if "id" in schema.model_fields and "id" not in requested:
+        requested.insert(0, "id")
+    return requested
+
+
+class Projection:
+    """
+    Columns needed to build `schema` from `model`
+    `field_map` maps schema fields to column expressions when the names differ
+    (or the value comes from a joined table); schema fields with no column are
+    returned as None without being selected.
+    """
+
+    def __init__(
+        self,
+        model,
+        schema: Type[BaseModel],
+        fields: Optional[Sequence[str]] = None,
+        field_map: Optional[Dict[str, object]] = None,
+    ):
+        field_map = field_map or {}
+        self.field_names = list(fields) if fields is not None else list(schema.model_fields)
+        direct = set(_schema_column_names(model, schema))
+
+        self.columns = []
+        self.selected: List[str] = []
+        for name in self.field_names:
+            if name in field_map:
+                column = field_map[name]
+            elif name in direct:
+                column = getattr(model, name)
+            else:
+                continue
+            self.columns.append(column.label(name))
+            self.selected.append(name)
+
+    def query(self, db: Session) -> Query:
+        """Query selecting only the projected columns"""
+        return db.query(*self.columns)
+
+    def to_dicts(self, rows) -> List[dict]:
+        """Map result rows to schema-ordered dicts, filling unmapped fields with None"""
+        positions = {name: i for i, name in enumerate(self.selected)}
+        order = [(name, positions.get(name)) for name in self.field_names]
+        return [
+            {name: (row[i] if i is not None else None) for name, i in order}
+            for row in rows
+        ]
+
+
+def load_only_for(model, schema: Type[BaseModel]):
+    """load_only() option restricting an entity query to the schema's columns"""
+    names = list(_schema_column_names(model, schema))
+    primary_keys = [c.key for c in inspect(model).primary_key]
+    for key in primary_keys:
+        if key not in names:
+            names.insert(0, key)
+    return load_only(*[getattr(model, name) for name in names])
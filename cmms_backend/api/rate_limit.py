@@ -0,0 +1,184 @@
+"""
+Token-bucket rate limiting for the authentication endpoints
+Buckets are keyed by client IP and by submitted username and are checked
+before any database lookup or bcrypt verify, so credential-stuffing bursts
+are rejected with 429 at almost no cost. State lives in process memory, or
+in a SQLite file shared by all workers on the host when
+RATE_LIMIT_STORE_PATH is set.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from config.app_config import config
+
+logger = logging.getLogger(__name__)
+
+# A bucket is full again one refill period after its last use; idle ones are pruned after a few
+PRUNE_AFTER_REFILL_PERIODS = 4
+
+
+class MemoryBucketStore:
+    """Per-process bucket state, bounded to the most recently used keys"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """Consume one token; returns seconds to wait (0 when allowed)"""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _consume(tokens, updated, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBucketStore:
+    """Bucket state in a local SQLite file, shared by workers on the same host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Keyed by pid too: SQLite connections must not be used across fork, and
+        # prefork workers inherit the thread-local of the preloading master
+        pid, conn = getattr(self._local, "conn", (None, None))
+        if pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = _consume(tokens, updated, capacity, rate, now)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def prune(self, older_than: float):
+        """Drop buckets idle since before `older_than` (they would be full again)"""
+        self._connect().execute("DELETE FROM buckets WHERE updated < ?", (older_than,))
+
+
+def _consume(tokens: float, updated: float, capacity: float, rate: float, now: float) -> Tuple[float, float]:
+    """Refill a bucket up to `now` and take one token from it"""
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class RateLimiter:
+    """A named token bucket policy: `capacity` burst, refilled at `per_minute`"""
+
+    def __init__(self, name: str, capacity: int, per_minute: float, store):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = per_minute / 60.0
+        self.store = store
+        self.allowed = 0
+        self.limited = 0
+
+    def hit(self, key: str) -> float:
+        """Count one attempt for `key`; returns seconds to wait (0 when allowed)"""
+        try:
+            wait = self.store.take(f"{self.name}:{key}", self.capacity, self.rate, time.time())
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter store must not lock everyone out
+            logger.warning(f"Rate limiter store error: {e}")
+            wait = 0.0
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "capacity": self.capacity,
+            "per_minute": self.rate * 60,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+def _create_store():
+    if config.RATE_LIMIT_STORE_PATH:
+        return SQLiteBucketStore(config.RATE_LIMIT_STORE_PATH)
+    return MemoryBucketStore(max_keys=config.RATE_LIMIT_MAX_KEYS)
+
+
+_store = _create_store()
+
+ip_limiter = RateLimiter("ip", config.RATE_LIMIT_IP_BURST, config.RATE_LIMIT_IP_PER_MINUTE, _store)
+username_limiter = RateLimiter(
+    "username", config.RATE_LIMIT_USERNAME_BURST, config.RATE_LIMIT_USERNAME_PER_MINUTE, _store
+)
+
+
+def prune_buckets():
+    """Drop shared-store buckets idle for several refill periods (the memory store is bounded already)"""
+    if not isinstance(_store, SQLiteBucketStore):
+        return
+    limiters = [limiter for limiter in (ip_limiter, username_limiter) if limiter.rate > 0]
+    if not limiters:
+        return
+    refill_seconds = max(limiter.capacity / limiter.rate for limiter in limiters)
+    try:
+        _store.prune(time.time() - PRUNE_AFTER_REFILL_PERIODS * refill_seconds)
+    except sqlite3.Error as e:
+        logger.warning(f"Rate limiter store error: {e}")
+
+
+def client_ip(request: Request) -> str:
+    """Client address, honouring X-Forwarded-For only behind a trusted proxy"""
+    if config.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_rate_limit(request: Request, username: Optional[str] = None):
+    """Raise 429 when the client IP or the username has run out of attempts"""
+    if not config.RATE_LIMIT_ENABLED:
+        return
+    wait = ip_limiter.hit(client_ip(request))
+    if not wait and username:
+        wait = username_limiter.hit(username.strip().lower())
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+def rate_limit_stats() -> Dict[str, dict]:
+    """Counters of every limiter since process start"""
+    return {limiter.name: limiter.stats() for limiter in (ip_limiter, username_limiter)}
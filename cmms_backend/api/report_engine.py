@@ -0,0 +1,176 @@
+"""
+Vectorized report engine for large historical aggregations
+Streams plain columns of worksheet_parts joined with worksheets, machines and
+parts out of the database in chunks, converts each chunk into NumPy arrays
+and aggregates it with vectorized group-bys. No ORM objects are built, and
+results are cached by report parameters.
+"""
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import extract, func, select
+
+from config.app_config import config
+from database.connection import get_db_session
+from database.events import ChangeSet, register_commit_listener
+from database.models_cmms import Machine, Part, Worksheet, WorksheetPart
+from database.query_cache import LocalStore
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+COST_DIMENSIONS = ("machine", "line", "category", "month")
+
+# Tables whose writes can change a cost report
+_SOURCE_TABLES = {"worksheet_parts", "worksheets", "machines", "parts"}
+
+_NULL_KEY = -1
+
+
+class ReportCache:
+    """Parameter-keyed LRU of results with TTL, cleared when source tables change"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self._store = LocalStore(max_entries)
+
+    def get(self, key: tuple) -> Optional[List[dict]]:
+        return self._store.get(key)
+
+    def set(self, key: tuple, value: List[dict]):
+        self._store.set(key, value, self.ttl_seconds)
+
+    def clear(self):
+        self._store.clear()
+
+
+report_cache = ReportCache(ttl_seconds=config.REPORT_CACHE_TTL_SECONDS, max_entries=config.REPORT_CACHE_MAX_ENTRIES)
+
+
+@register_commit_listener
+def _invalidate_report_cache(changes: ChangeSet):
+    if _SOURCE_TABLES & changes.keys():
+        report_cache.clear()
+
+
+def _cost_query(start: Optional[date], end: Optional[date], tenant_id: Optional[str]):
+    """Plain column select feeding the cost report"""
+    cost_time = func.coalesce(WorksheetPart.added_at, Worksheet.created_at)
+    query = select(
+        Worksheet.machine_id,
+        func.coalesce(Machine.production_line_id, _NULL_KEY),
+        Part.category,
+        func.coalesce(extract("year", cost_time) * 100 + extract("month", cost_time), _NULL_KEY),
+        WorksheetPart.quantity_used,
+        func.coalesce(WorksheetPart.unit_cost_at_time, 0.0),
+    ).select_from(WorksheetPart).join(
+        Worksheet, Worksheet.id == WorksheetPart.worksheet_id
+    ).join(
+        Machine, Machine.id == Worksheet.machine_id
+    ).join(
+        Part, Part.id == WorksheetPart.part_id
+    ).where(
+        Worksheet.deleted_at.is_(None)
+    )
+    if tenant_id is not None:
+        query = query.where(Worksheet.tenant_id == tenant_id)
+    if start is not None:
+        query = query.where(cost_time >= datetime.combine(start, datetime.min.time()))
+    if end is not None:
+        query = query.where(cost_time < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query
+
+
+def _aggregate_chunk(rows: list, dims: Sequence[str], categories: Dict[Optional[str], int], totals: Dict[tuple, list]):
+    """Group one chunk with NumPy and merge the partial sums into `totals`"""
+    machine, line, category, month, quantity, unit_cost = zip(*rows)
+    columns = {
+        "machine": np.fromiter(machine, dtype=np.int64, count=len(rows)),
+        "line": np.fromiter(line, dtype=np.int64, count=len(rows)),
+        "category": np.fromiter(
+            (categories.setdefault(c, len(categories)) for c in category), dtype=np.int64, count=len(rows)
+        ),
+        "month": np.fromiter(month, dtype=np.int64, count=len(rows)),
+    }
+    quantity = np.fromiter(quantity, dtype=np.float64, count=len(rows))
+    cost = quantity * np.fromiter(unit_cost, dtype=np.float64, count=len(rows))
+
+    if dims:
+        keys = np.stack([columns[d] for d in dims], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    else:
+        groups = np.zeros((1, 0), dtype=np.int64)
+        inverse = np.zeros(len(rows), dtype=np.int64)
+
+    cost_sums = np.bincount(inverse, weights=cost, minlength=len(groups))
+    quantity_sums = np.bincount(inverse, weights=quantity, minlength=len(groups))
+    line_counts = np.bincount(inverse, minlength=len(groups))
+
+    for group, cost_sum, quantity_sum, count in zip(groups.tolist(), cost_sums, quantity_sums, line_counts):
+        entry = totals.setdefault(tuple(group), [0.0, 0.0, 0])
+        entry[0] += float(cost_sum)
+        entry[1] += float(quantity_sum)
+        entry[2] += int(count)
+
+
+def cost_report(
+    group_by: Sequence[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tenant_id: Optional[str] = None,
+) -> List[dict]:
+    """
+    Parts cost (quantity_used * unit_cost_at_time) grouped by any of
+    machine, line, category and month, optionally limited to a date range
+    and to one tenant's worksheets
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for the report engine")
+
+    dims = tuple(d for d in COST_DIMENSIONS if d in group_by)
+    cache_key = (dims, start, end, tenant_id)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    categories: Dict[Optional[str], int] = {}
+    totals: Dict[tuple, list] = {}
+    row_count = 0
+
+    with get_db_session() as db:
+        result = db.connection().execution_options(
+            stream_results=True, yield_per=config.REPORT_CHUNK_SIZE
+        ).execute(_cost_query(start, end, tenant_id))
+        for chunk in result.partitions(config.REPORT_CHUNK_SIZE):
+            _aggregate_chunk(chunk, dims, categories, totals)
+            row_count += len(chunk)
+
+    category_names = {code: name for name, code in categories.items()}
+    report = []
+    for key, (cost, quantity, lines) in sorted(totals.items()):
+        item = {}
+        for dim, value in zip(dims, key):
+            if dim == "machine":
+                item["machine_id"] = value
+            elif dim == "line":
+                item["production_line_id"] = None if value == _NULL_KEY else value
+            elif dim == "category":
+                item["category"] = category_names[value]
+            elif dim == "month":
+                item["month"] = None if value == _NULL_KEY else f"{value // 100:04d}-{value % 100:02d}"
+        item.update({"cost": round(cost, 2), "quantity": quantity, "lines": lines})
+        report.append(item)
+
+    logger.info(
+        f"Cost report {dims} over {row_count} rows in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    report_cache.set(cache_key, report)
+    return report
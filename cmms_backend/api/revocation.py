@@ -0,0 +1,240 @@
+"""
+JWT revocation list
+Revoked token ids (jti) are stored in the revoked_tokens table and mirrored
+in memory as a Bloom filter plus a hash set, so the per-request check in
+verify_token is O(1) and needs no query for the common (not revoked) case. Every worker pulls revocations made by other workers at most every
+REVOCATION_SYNC_SECONDS; rows are dropped once the token would have expired
+anyway.
+
+Access tokens are authorized from their claims (including the role's
+permission bitset) without loading the user or the role, so deactivating a
+user, changing their role or deleting them, and changing a role's
+permissions, revoke the affected users' access tokens issued until then: the
+flush writes a "user" row whose revoked_at is the cutoff, and tokens of that
+user issued before it are rejected. Token timestamps have second precision,
+so tokens issued in the cutoff second itself are accepted: a user re-roled
+or re-logging in right after a revoke-all must not be locked out until the
+next second. A token that has to die in that second is revoked by its jti. The next refresh issues tokens
+with the new claims. Writers that bypass the ORM should call
+revoke_user_tokens().
+"""
+import calendar
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config.app_config import config
+from database.events import ChangeSet, register_commit_listener
+from database.models_cmms import RevokedToken, Role, User
+from database.tenancy import ALL_TENANTS
+
+logger = logging.getLogger(__name__)
+
+# Full reloads drop entries of tokens that have expired since the last one
+_FULL_RELOAD_SECONDS = 3600
+
+# token_type of rows that revoke all of a user's access tokens issued before revoked_at
+USER_REVOCATION = "user"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)"""
+
+    def __init__(self, capacity: int, hashes: int = 7):
+        # ~1% false positives at `capacity` entries with 7 hashes and 10 bits each
+        self.size = max(capacity * 10, 64)
+        self.hashes = hashes
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class RevocationList:
+    """In-memory mirror of revoked_tokens, refreshed incrementally from the database"""
+
+    def __init__(self, capacity: int, sync_seconds: int):
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self._bloom = BloomFilter(capacity)
+        self._jtis: Set[str] = set()
+        # user id -> tokens issued before this (UTC seconds) are revoked
+        self._user_cutoffs: Dict[int, int] = {}
+        self._synced_until: Optional[datetime] = None
+        self._next_sync = 0.0
+        self._next_full_reload = 0.0
+        self._lock = threading.Lock()
+
+    def _add(self, jti: str):
+        self._bloom.add(jti)
+        self._jtis.add(jti)
+        if len(self._jtis) > self.capacity:
+            # Grow instead of letting the false positive rate climb
+            self.capacity *= 2
+            self._rebuild()
+
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity)
+        for jti in self._jtis:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def sync(self, db: Session, force: bool = False):
+        """Load revocations recorded since the last sync (full reload on first use and hourly)"""
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_seconds
+            full = self._synced_until is None or now >= self._next_full_reload
+            started = datetime.utcnow()
+            query = db.query(
+                RevokedToken.jti, RevokedToken.token_type, RevokedToken.user_id, RevokedToken.revoked_at
+            ).filter(RevokedToken.expires_at > started)
+            if full:
+                self._next_full_reload = now + _FULL_RELOAD_SECONDS
+                rows = query.all()
+                jtis = {jti for jti, token_type, _, _ in rows if token_type != USER_REVOCATION}
+                cutoffs: Dict[int, int] = {}
+                for _, token_type, user_id, revoked_at in rows:
+                    if token_type == USER_REVOCATION:
+                        cutoffs[user_id] = max(cutoffs.get(user_id, 0), _seconds(revoked_at))
+                self.capacity = max(self.capacity, len(jtis) * 2)
+                bloom = BloomFilter(self.capacity)
+                for jti in jtis:
+                    bloom.add(jti)
+                # Swap the structures at once so concurrent checks never see a partial reload
+                self._bloom, self._jtis, self._user_cutoffs = bloom, jtis, cutoffs
+            else:
+                # Overlap by one interval so rows committed late by other workers are not missed
+                since = self._synced_until - timedelta(seconds=self.sync_seconds)
+                for jti, token_type, user_id, revoked_at in query.filter(RevokedToken.revoked_at >= since).all():
+                    if token_type == USER_REVOCATION:
+                        self._add_cutoff(user_id, revoked_at)
+                    else:
+                        self._add(jti)
+            self._synced_until = started
+    
+    def _add_cutoff(self, user_id: int, revoked_at: datetime):
+        self._user_cutoffs[user_id] = max(self._user_cutoffs.get(user_id, 0), _seconds(revoked_at))
+    
+    def expire(self):
+        """Sync on the next check (after this worker committed a revocation)"""
+        self._next_sync = 0.0
+
+    def is_revoked(self, jti: str, db: Session) -> bool:
+        """O(1) check; the Bloom filter answers most lookups without touching the set"""
+        self.sync(db)
+        if jti not in self._bloom:
+            return False
+        return jti in self._jtis
+
+    def is_user_revoked(self, user_id: int, issued_at: Optional[int], db: Session) -> bool:
+        """True if the user's tokens issued at `issued_at` (JWT iat) were revoked; a dict lookup"""
+        self.sync(db)
+        cutoff = self._user_cutoffs.get(user_id)
+        # Second precision: tokens issued in the cutoff second may postdate the revoke and are kept
+        return cutoff is not None and (issued_at is None or issued_at < cutoff)
+
+    def revoke(self, db: Session, jti: str, token_type: str, expires_at: datetime, user_id: Optional[int] = None) -> bool:
+        """
+        Record a revoked jti and commit; returns False if it was already revoked
+        The primary key makes this safe against concurrent rotations of one refresh token.
+        """
+        db.add(RevokedToken(jti=jti, token_type=token_type, user_id=user_id, expires_at=expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        with self._lock:
+            self._add(jti)
+        return True
+
+
+def _seconds(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+def revoke_user_tokens(db: Session, user_id: int):
+    """
+    Add (without committing) a revocation of every access token the user holds
+    Refresh tokens need none: /auth/refresh reloads the user and the role.
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    db.add(RevokedToken(
+        jti=uuid.uuid4().hex,
+        token_type=USER_REVOCATION,
+        user_id=user_id,
+        revoked_at=now,
+        expires_at=now + timedelta(minutes=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    ))
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_changed_users(session, flush_context, instances):
+    for user in list(session.dirty):
+        if not isinstance(user, User):
+            continue
+        state = inspect(user)
+        deactivated = state.attrs.is_active.history.has_changes() and not user.is_active
+        if deactivated or state.attrs.role_id.history.has_changes():
+            revoke_user_tokens(session, user.id)
+    for user in list(session.deleted):
+        if isinstance(user, User):
+            revoke_user_tokens(session, user.id)
+    # Tokens carry the role's compiled permissions (and the name defaults them), so they go stale too
+    for role in list(session.dirty):
+        if not isinstance(role, Role):
+            continue
+        state = inspect(role)
+        if state.attrs.permissions.history.has_changes() or state.attrs.name.history.has_changes():
+            with session.no_autoflush:
+                user_ids = session.query(User.id).filter(User.role_id == role.id).execution_options(
+                    **{ALL_TENANTS: True}
+                ).all()
+            for (user_id,) in user_ids:
+                revoke_user_tokens(session, user_id)
+
+
+@register_commit_listener
+def _sync_committed_revocations(changes: ChangeSet):
+    if "revoked_tokens" in changes:
+        revocation_list.expire()
+
+
+revocation_list = RevocationList(
+    capacity=config.REVOCATION_BLOOM_CAPACITY,
+    sync_seconds=config.REVOCATION_SYNC_SECONDS,
+)
+
+
+def purge_revoked_tokens(db: Session) -> int:
+    """Delete revocations of tokens that have expired anyway; returns the number removed"""
+    removed = db.query(RevokedToken).filter(
+        RevokedToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    if removed:
+        logger.info(f"Purged {removed} expired token revocations")
+    return removed
@@ -0,0 +1,89 @@
+"""
+Attachment routes
+Downloads (with Range support), lazily rendered thumbnails and deletion of
+machine manuals/photos and profile pictures. Uploads live with their owner:
+POST /api/v1/machines/{id}/attachments and PUT /api/v1/users/me/photo.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from database.connection import get_db, unit_of_work
+from database.models_cmms import Attachment, Machine, User
+from api.auth import get_token_claims
+from api.permissions import Permission, claims_permissions
+from api.storage import attachment_url, file_response, thumbnail_response
+
+router = APIRouter(prefix="/api/v1/attachments", tags=["attachments"])
+
+
+def load_attachment(db: Session, claims: dict, attachment_id: int, manage: bool = False) -> Attachment:
+    """
+    Attachment the caller may read (or, with `manage`, delete)
+    Machine files follow the machine permissions; a profile picture can be
+    seen by any user of the tenant and changed by its owner or a user manager.
+    """
+    attachment = db.get(Attachment, attachment_id)
+    if not attachment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment not found"
+        )
+
+    permissions = claims_permissions(claims, db)
+    if attachment.machine_id is not None:
+        needed = Permission.MANAGE_MACHINES if manage else Permission.VIEW_MACHINES
+        allowed = bool(permissions & needed)
+    elif manage:
+        allowed = bool(permissions & Permission.MANAGE_USERS) or attachment.created_by_user_id == int(claims["sub"])
+    else:
+        allowed = True
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return attachment
+
+
+@router.get("/{attachment_id}")
+async def download_attachment(
+    attachment_id: int,
+    request: Request,
+    claims: dict = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """Download an attachment (supports Range and If-None-Match)"""
+    return file_response(request, load_attachment(db, claims, attachment_id))
+
+
+@router.get("/{attachment_id}/thumbnail")
+async def get_thumbnail(
+    attachment_id: int,
+    request: Request,
+    size: int = 256,
+    claims: dict = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """JPEG thumbnail of an image attachment, rendered on first request"""
+    return await thumbnail_response(request, load_attachment(db, claims, attachment_id), size)
+
+
+@router.delete("/{attachment_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_attachment(
+    attachment_id: int,
+    claims: dict = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """Delete an attachment; its file is removed once no attachment uses it"""
+    attachment = load_attachment(db, claims, attachment_id, manage=True)
+    with unit_of_work(db):
+        if attachment.kind == "manual":
+            machine = db.get(Machine, attachment.machine_id)
+            if machine is not None and machine.manual_pdf_path == attachment_url(attachment.id):
+                machine.manual_pdf_path = None
+        elif attachment.kind == "profile":
+            db.query(User).filter(User.profile_attachment_id == attachment.id).update(
+                {"profile_attachment_id": None}, synchronize_session=False
+            )
+        db.delete(attachment)
+    return None
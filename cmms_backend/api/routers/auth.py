@@ -1,34 +1,77 @@
 """
 Authentication routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
 from datetime import timedelta
+from typing import Optional
 from database.connection import get_db
-from database.models_cmms import User, Role
-from api.auth import verify_password, create_access_token, get_password_hash
-from api.schemas import LoginRequest, TokenResponse, RegisterRequest, RegisterResponse
+from database.models_cmms import User, Role, login_key
+from database.tenancy import ALL_TENANTS
+from api.auth import (
+    verify_password, create_access_token, create_refresh_token, decode_token, token_expiry,
+    get_password_hash, optional_security
+)
+from api.permissions import Permission, require, role_permissions
+from api.revocation import revocation_list
+from api.rate_limit import enforce_rate_limit, rate_limit_stats
+from api.schemas import LoginRequest, TokenResponse, RefreshRequest, LogoutRequest, RegisterRequest, RegisterResponse
 from config.app_config import config
 
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
 
+def _token_response(
+    user_id: int, username: str, tenant_id: str, role_id: Optional[int], role_name: Optional[str], role_perms
+) -> TokenResponse:
+    """Issue a new access/refresh token pair; the access token carries tenant and permission bitset"""
+    access_token = create_access_token(
+        data={
+            "sub": str(user_id),
+            "tenant": tenant_id,
+            "perms": role_permissions.get(role_id, role_name, role_perms),
+        },
+        expires_delta=timedelta(minutes=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return TokenResponse(
+        access_token=access_token,
+        token_type="Bearer",
+        expires_in=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        user_id=user_id,
+        username=username,
+        role_name=role_name or "USER",
+        refresh_token=create_refresh_token(user_id),
+        refresh_expires_in=config.JWT_REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    )
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(
     login_data: LoginRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     User login endpoint
     Accepts username (or email) and password
-    Returns JWT access token
+    Returns JWT access and refresh tokens
     """
-    # Try to find user by username (as per spec, only username is accepted)
-    user = db.query(User).filter(User.username == login_data.username).first()
+    # Throttle by IP and username before any lookup or bcrypt work
+    enforce_rate_limit(request, login_data.username)
     
-    # If not found by username, try email (for backward compatibility)
-    if not user:
-        user = db.query(User).filter(User.email == login_data.username).first()
+    # Resolve user and role in one query; a username match wins over an email match
+    identifier = login_key(login_data.username)
+    rows = db.query(User, Role.name, Role.permissions).outerjoin(
+        Role, Role.id == User.role_id
+    ).filter(
+        or_(User.username_lower == identifier, User.email_lower == identifier)
+    ).limit(2).all()
+    user, role_name, role_perms = next(
+        (row for row in rows if row[0].username_lower == identifier),
+        rows[0] if rows else (None, None, None)
+    )
     
     if not user:
         raise HTTPException(
@@ -49,48 +92,101 @@ async def login(
             detail="Invalid credentials"
         )
     
-    # Get role name
-    role = db.query(Role).filter(Role.id == user.role_id).first()
-    role_name = role.name if role else "USER"
-    
-    # Create access token
-    access_token_expires = timedelta(minutes=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id)},
-        expires_delta=access_token_expires
+    return _token_response(
+        user.id, user.username or user.email or "", user.tenant_id, user.role_id, role_name, role_perms
     )
-    
-    return TokenResponse(
-        access_token=access_token,
-        token_type="Bearer",
-        expires_in=config.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        user_id=user.id,
-        username=user.username or user.email or "",
-        role_name=role_name
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(
+    refresh_data: RefreshRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Exchange a refresh token for a new access/refresh token pair
+    Each refresh token can be used once; the old one is revoked on rotation
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token"
     )
+    payload = decode_token(refresh_data.refresh_token, "refresh")
+    if payload is None or not payload.get("jti") or not str(payload["sub"]).isdigit():
+        raise credentials_exception
+    
+    row = db.query(
+        User.id, User.username, User.email, User.is_active, User.tenant_id,
+        User.role_id, Role.name, Role.permissions
+    ).outerjoin(
+        Role, Role.id == User.role_id
+    ).filter(User.id == int(payload["sub"])).first()
+    if row is None:
+        raise credentials_exception
+    user_id, username, email, is_active, tenant_id, role_id, role_name, role_perms = row
+    if not is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    
+    # Claiming the jti fails when the token was already rotated or logged out
+    if not revocation_list.revoke(db, payload["jti"], "refresh", token_expiry(payload), user_id):
+        raise credentials_exception
+    
+    return _token_response(user_id, username or email or "", tenant_id, role_id, role_name, role_perms)
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout():
+async def logout(
+    logout_data: Optional[LogoutRequest] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+):
     """
-    User logout endpoint (optional)
-    In a stateless JWT system, logout is typically handled client-side
+    User logout endpoint
+    Revokes the bearer access token and, when given, the refresh token
     """
+    tokens = []
+    if credentials is not None:
+        tokens.append((credentials.credentials, "access"))
+    if logout_data is not None and logout_data.refresh_token:
+        tokens.append((logout_data.refresh_token, "refresh"))
+    
+    for token, token_type in tokens:
+        payload = decode_token(token, token_type)
+        if payload is not None and payload.get("jti"):
+            revocation_list.revoke(
+                db, payload["jti"], token_type, token_expiry(payload),
+                int(payload["sub"]) if str(payload["sub"]).isdigit() else None
+            )
     return None
 
 
+@router.get("/rate-limits")
+async def get_rate_limits(
+    claims: dict = Depends(require(Permission.MANAGE_SYSTEM))
+):
+    """Rate limiter counters of this worker"""
+    return rate_limit_stats()
+
+
 @router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED)
 async def register(
     register_data: RegisterRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     User registration endpoint (optional)
     """
-    # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.email == register_data.email) | (User.username == register_data.email)
-    ).first()
+    enforce_rate_limit(request)
+    
+    # Check if user already exists: the username (email prefix) and the email, in all tenants (as login does)
+    username = register_data.email.split("@")[0]
+    keys = [login_key(register_data.email), login_key(username)]
+    existing_user = db.query(User.id).filter(
+        User.username_lower.in_(keys) | User.email_lower.in_(keys)
+    ).execution_options(**{ALL_TENANTS: True}).first()
     
     if existing_user:
         raise HTTPException(
@@ -112,7 +208,7 @@ async def register(
     # Create new user
     password_hash = get_password_hash(register_data.password)
     new_user = User(
-        username=register_data.email.split("@")[0],  # Use email prefix as username
+        username=username,  # Use email prefix as username
         email=register_data.email,
         password_hash=password_hash,
         role_id=role.id,
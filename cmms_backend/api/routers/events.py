@@ -0,0 +1,87 @@
+"""
+Server-sent events push channel
+"""
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from typing import Optional
+from database.connection import get_db_session
+from database.tenancy import claims_tenant
+from api.auth import security, verify_token
+from api.permissions import Permission, claims_permissions
+from api.broker import broker, format_sse, TOPICS
+from config.app_config import config
+
+router = APIRouter(prefix="/api/v1/events", tags=["events"])
+
+TOPIC_PERMISSIONS = {
+    "worksheets": Permission.VIEW_WORKSHEETS,
+    "inventory": Permission.VIEW_INVENTORY,
+    "pm": Permission.VIEW_PM,
+}
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = None,
+    assigned_to_me: bool = False,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Stream worksheet, inventory and PM change events (text/event-stream)
+    `topics` is a comma separated subset of worksheets,inventory,pm (default: all).
+    With `assigned_to_me=true`, worksheet and PM events are limited to items
+    assigned to the current user. An `event: resync` message means events
+    were dropped and the client should call /api/v1/sync.
+    """
+    selected = [t.strip() for t in topics.split(",") if t.strip()] if topics else list(TOPICS)
+    unknown = [t for t in selected if t not in TOPICS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown topics: {', '.join(unknown)}"
+        )
+
+    # Authenticate with a short-lived session so the stream does not pin a DB connection
+    with get_db_session() as db:
+        claims = verify_token(credentials.credentials, db)
+        permissions = claims_permissions(claims, db)
+    user_id = int(claims["sub"])
+
+    # Without an explicit list, subscribe to every topic the caller may read
+    allowed = [t for t in selected if permissions & TOPIC_PERMISSIONS[t]]
+    if topics and len(allowed) < len(selected):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    selected = allowed
+
+    subscription = broker.subscribe(selected, user_id, only_mine=assigned_to_me, tenant_id=claims_tenant(claims))
+
+    async def event_stream():
+        try:
+            yield f"retry: {config.SSE_HEARTBEAT_SECONDS * 1000}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=config.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,109 +1,166 @@
 """
 Inventory management routes (using parts table)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, func
 from typing import List, Optional
-from database.connection import get_db
-from database.models_cmms import Part, InventoryLevel
-from api.auth import get_current_active_user
-from api.schemas import InventoryDto, CreateInventoryDto, UpdateInventoryDto
+from database.connection import get_db, unit_of_work
+from database.models_cmms import Part, InventoryLevel, ReorderItem, Supplier
+from api.permissions import Permission, require
+from api.caching import conditional_json
+from api.projection import Projection, parse_fields
+from api.broker import publish_change
+from database.soft_delete import soft_delete
+from database.tenancy import session_tenant
+from api.schemas import InventoryDto, CreateInventoryDto, UpdateInventoryDto, ReorderGroupDto
 
 router = APIRouter(prefix="/api/v1/inventory", tags=["inventory"])
 
 
 @router.get("", response_model=List[InventoryDto])
 async def get_inventory(
+    request: Request,
     search: Optional[str] = None,
     category: Optional[str] = None,
     min_stock_level: Optional[int] = None,
-    current_user = Depends(get_current_active_user),
+    fields: Optional[str] = None,
+    claims: dict = Depends(require(Permission.VIEW_INVENTORY)),
     db: Session = Depends(get_db)
 ):
-    """Get all inventory items with optional filters"""
-    query = db.query(Part)
+    """
+    Get all inventory items with optional filters (supports ETag / If-None-Match)
+    `fields` selects a comma separated subset of InventoryDto fields
+    """
+    quantity = func.coalesce(InventoryLevel.quantity_on_hand, 0)
+    projection = Projection(Part, InventoryDto, parse_fields(fields, InventoryDto), field_map={
+        "quantity": quantity,
+        "min_stock_level": func.coalesce(Part.safety_stock, 0),
+        "location": InventoryLevel.bin_location,
+        "unit_price": Part.buy_price,
+    })
     
-    if search:
-        query = query.filter(
-            or_(
-                Part.name.like(f"%{search}%"),
-                Part.sku.like(f"%{search}%")
+    def load():
+        query = projection.query(db).select_from(Part).outerjoin(InventoryLevel, InventoryLevel.part_id == Part.id)
+        
+        if search:
+            query = query.filter(
+                or_(
+                    Part.name.like(f"%{search}%"),
+                    Part.sku.like(f"%{search}%")
+                )
             )
-        )
-    
-    if category:
-        query = query.filter(Part.category == category)
-    
-    parts = query.all()
-    result = []
-    
-    for part in parts:
-        # Get inventory level
-        inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
-        quantity = inv_level.quantity_on_hand if inv_level else 0
-        min_stock = part.safety_stock or 0
+        
+        if category:
+            query = query.filter(Part.category == category)
         
         # Filter by min_stock_level if provided
-        if min_stock_level is not None and quantity >= min_stock_level:
-            continue
+        if min_stock_level is not None:
+            query = query.filter(quantity < min_stock_level)
         
-        result.append(InventoryDto(
-            id=part.id,
-            name=part.name,
-            sku=part.sku,
-            quantity=quantity,
-            min_stock_level=min_stock,
-            location=inv_level.bin_location if inv_level else None,
-            unit_price=part.buy_price,
-            created_at=part.created_at
-        ))
+        return projection.to_dicts(query.all())
     
-    return result
+    return conditional_json(request, db, [Part, InventoryLevel], load)
+
+
+@router.get("/reorder", response_model=List[ReorderGroupDto])
+async def get_reorder_list(
+    request: Request,
+    supplier_id: Optional[int] = None,
+    claims: dict = Depends(require(Permission.VIEW_INVENTORY)),
+    db: Session = Depends(get_db)
+):
+    """
+    Parts below safety stock grouped by supplier, with suggested order quantities
+    Reads the maintained reorder_items table, so cost is proportional to the result.
+    """
+    def load():
+        query = db.query(
+            ReorderItem.supplier_id,
+            Supplier.name,
+            ReorderItem.part_id,
+            Part.sku,
+            Part.name,
+            ReorderItem.quantity_on_hand,
+            ReorderItem.safety_stock,
+            ReorderItem.suggested_quantity,
+        ).join(
+            Part, Part.id == ReorderItem.part_id
+        ).outerjoin(
+            Supplier, Supplier.id == ReorderItem.supplier_id
+        )
+        if supplier_id is not None:
+            query = query.filter(ReorderItem.supplier_id == supplier_id)
+        
+        groups = {}
+        for row in query.order_by(ReorderItem.supplier_id, ReorderItem.part_id).all():
+            group = groups.get(row[0])
+            if group is None:
+                group = groups[row[0]] = {"supplier_id": row[0], "supplier_name": row[1], "items": []}
+            group["items"].append({
+                "part_id": row[2],
+                "sku": row[3],
+                "name": row[4],
+                "quantity_on_hand": row[5],
+                "safety_stock": row[6],
+                "suggested_quantity": row[7],
+            })
+        return list(groups.values())
+    
+    return conditional_json(request, db, [ReorderItem, Part], load)
 
 
 @router.get("/{inventory_id}", response_model=InventoryDto)
 async def get_inventory_item(
     inventory_id: int,
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    claims: dict = Depends(require(Permission.VIEW_INVENTORY)),
     db: Session = Depends(get_db)
 ):
-    """Get inventory item by ID"""
-    part = db.query(Part).filter(Part.id == inventory_id).first()
-    if not part:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Inventory item not found"
+    """Get inventory item by ID (supports ETag / If-None-Match)"""
+    # Not through the query cache: the ETag comes from the shared stamp, another worker's cached rows may be older
+    def load():
+        part = db.query(Part).filter(Part.id == inventory_id).first()
+        if not part:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Inventory item not found"
+            )
+        
+        inv_level = db.query(
+            InventoryLevel.quantity_on_hand, InventoryLevel.bin_location
+        ).filter(InventoryLevel.part_id == part.id).first()
+        
+        return InventoryDto(
+            id=part.id,
+            name=part.name,
+            sku=part.sku,
+            quantity=inv_level.quantity_on_hand if inv_level else 0,
+            min_stock_level=part.safety_stock or 0,
+            location=inv_level.bin_location if inv_level else None,
+            unit_price=part.buy_price,
+            created_at=part.created_at
         )
     
-    inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
-    
-    return InventoryDto(
-        id=part.id,
-        name=part.name,
-        sku=part.sku,
-        quantity=inv_level.quantity_on_hand if inv_level else 0,
-        min_stock_level=part.safety_stock or 0,
-        location=inv_level.bin_location if inv_level else None,
-        unit_price=part.buy_price,
-        created_at=part.created_at
-    )
+    return conditional_json(request, db, [Part, InventoryLevel], load)
 
 
 @router.post("", response_model=InventoryDto, status_code=status.HTTP_201_CREATED)
 async def create_inventory_item(
     inventory_data: CreateInventoryDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_INVENTORY)),
     db: Session = Depends(get_db)
 ):
     """Create new inventory item"""
     # Check if SKU already exists
     if inventory_data.sku:
-        existing = db.query(Part).filter(Part.sku == inventory_data.sku).first()
+        existing = db.query(Part.deleted_at).filter(Part.sku == inventory_data.sku).execution_options(
+            include_deleted=True
+        ).first()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail="SKU already exists"
+                detail="SKU already exists" if existing.deleted_at is None else "SKU belongs to a deleted item that has not been purged yet"
             )
     
     part = Part(
@@ -115,18 +172,18 @@ async def create_inventory_item(
         safety_stock=inventory_data.min_stock_level
     )
     
-    db.add(part)
-    db.commit()
-    db.refresh(part)
-    
-    # Create inventory level
-    inv_level = InventoryLevel(
-        part_id=part.id,
-        quantity_on_hand=inventory_data.quantity or 0,
-        bin_location=inventory_data.location
-    )
-    db.add(inv_level)
-    db.commit()
+    with unit_of_work(db):
+        db.add(part)
+        db.flush()
+        
+        # Create inventory level
+        inv_level = InventoryLevel(
+            part_id=part.id,
+            quantity_on_hand=inventory_data.quantity or 0,
+            bin_location=inventory_data.location
+        )
+        db.add(inv_level)
+    publish_change("inventory", "created", part.id, tenant_id=session_tenant(db), quantity=inv_level.quantity_on_hand)
     
     return InventoryDto(
         id=part.id,
@@ -144,7 +201,7 @@ async def create_inventory_item(
 async def update_inventory_item(
     inventory_id: int,
     inventory_data: UpdateInventoryDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_INVENTORY)),
     db: Session = Depends(get_db)
 ):
     """Update inventory item"""
@@ -156,33 +213,26 @@ async def update_inventory_item(
         )
     
     update_data = inventory_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        if key == "quantity":
-            # Update inventory level
-            inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
-            if inv_level:
-                inv_level.quantity_on_hand = value
-            else:
-                inv_level = InventoryLevel(part_id=part.id, quantity_on_hand=value)
-                db.add(inv_level)
-        elif key == "location":
-            inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
-            if inv_level:
-                inv_level.bin_location = value
-            else:
-                inv_level = InventoryLevel(part_id=part.id, bin_location=value)
-                db.add(inv_level)
-        elif key == "unit_price":
-            part.buy_price = value
-        elif key == "min_stock_level":
-            part.safety_stock = value
-        elif hasattr(part, key):
-            setattr(part, key, value)
-    
-    db.commit()
-    db.refresh(part)
+    with unit_of_work(db):
+        # Loaded once: it is written below and returned in the response
+        inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
+        for key, value in update_data.items():
+            if key in ("quantity", "location"):
+                if inv_level is None:
+                    inv_level = InventoryLevel(part_id=part.id)
+                    db.add(inv_level)
+                if key == "quantity":
+                    inv_level.quantity_on_hand = value
+                else:
+                    inv_level.bin_location = value
+            elif key == "unit_price":
+                part.buy_price = value
+            elif key == "min_stock_level":
+                part.safety_stock = value
+            elif hasattr(part, key):
+                setattr(part, key, value)
     
-    inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
+    publish_change("inventory", "updated", part.id, tenant_id=session_tenant(db), quantity=inv_level.quantity_on_hand if inv_level else 0)
     return InventoryDto(
         id=part.id,
         name=part.name,
@@ -198,7 +248,7 @@ async def update_inventory_item(
 @router.delete("/{inventory_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_inventory_item(
     inventory_id: int,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_INVENTORY)),
     db: Session = Depends(get_db)
 ):
     """Delete inventory item"""
@@ -209,12 +259,9 @@ async def delete_inventory_item(
             detail="Inventory item not found"
         )
     
-    # Delete inventory level first
-    inv_level = db.query(InventoryLevel).filter(InventoryLevel.part_id == part.id).first()
-    if inv_level:
-        db.delete(inv_level)
-    
-    db.delete(part)
-    db.commit()
+    # Its stock level and worksheet usage are removed with it by the purger
+    with unit_of_work(db):
+        soft_delete(part)
+    publish_change("inventory", "deleted", inventory_id, tenant_id=session_tenant(db))
     return None
 
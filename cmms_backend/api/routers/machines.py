@@ -1,58 +1,109 @@
 """
 Machine management routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List, Optional
-from database.connection import get_db
-from database.models_cmms import Machine
-from api.auth import get_current_active_user
-from api.schemas import MachineDto, CreateMachineDto, UpdateMachineDto
+from database.connection import get_db, unit_of_work
+from database.models_cmms import Machine, Attachment
+from api.permissions import Permission, require
+from api.caching import Validators, conditional_json, conditional_row, precondition_failed, version_etag
+from api.projection import Projection, parse_fields, load_only_for
+from database.soft_delete import soft_delete
+from api.storage import UPLOAD_OPENAPI, attachment_dict, attachment_url, receive_upload
+from api.schemas import MachineDto, CreateMachineDto, UpdateMachineDto, AttachmentDto
 
 router = APIRouter(prefix="/api/v1/machines", tags=["machines"])
 
 
 @router.get("", response_model=List[MachineDto])
 async def get_machines(
+    request: Request,
     status_filter: Optional[str] = None,
-    current_user = Depends(get_current_active_user),
+    fields: Optional[str] = None,
+    claims: dict = Depends(require(Permission.VIEW_MACHINES)),
     db: Session = Depends(get_db)
 ):
-    """Get all machines with optional status filter"""
-    query = db.query(Machine)
-    if status_filter:
-        query = query.filter(Machine.status == status_filter)
-    machines = query.all()
-    return machines
+    """
+    Get all machines with optional status filter (supports ETag / If-None-Match)
+    `fields` selects a comma separated subset of MachineDto fields
+    """
+    projection = Projection(Machine, MachineDto, parse_fields(fields, MachineDto))
+    
+    def load():
+        query = projection.query(db)
+        if status_filter:
+            query = query.filter(Machine.status == status_filter)
+        return projection.to_dicts(query.all())
+    
+    return conditional_json(request, db, [Machine], load)
 
 
 @router.get("/{machine_id}", response_model=MachineDto)
 async def get_machine(
     machine_id: int,
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    claims: dict = Depends(require(Permission.VIEW_MACHINES)),
     db: Session = Depends(get_db)
 ):
-    """Get machine by ID"""
-    machine = db.query(Machine).filter(Machine.id == machine_id).first()
+    """Get machine by ID (ETag is the row version; supports If-None-Match)"""
+    # Not through the query cache: a version cached by another worker could be stale
+    machine = db.query(Machine).options(load_only_for(Machine, MachineDto)).filter(
+        Machine.id == machine_id
+    ).first()
     if not machine:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Machine not found"
         )
-    return machine
+    
+    validators = Validators(etag=version_etag(machine.version), last_modified=machine.updated_at)
+    return conditional_row(request, validators, lambda: MachineDto.model_validate(machine))
+
+
+def _conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Machine was modified by another request"
+    )
+
+
+# Unique per tenant, also against deleted machines until they are purged
+_UNIQUE_FIELDS = (("serial_number", "Serial number"), ("asset_tag", "Asset tag"))
+
+
+def _check_unique(db: Session, values: dict, machine_id: Optional[int] = None):
+    """Raise 409 if another machine (deleted ones included) has the serial number or asset tag"""
+    for field, label in _UNIQUE_FIELDS:
+        value = values.get(field)
+        if value is None:
+            continue
+        query = db.query(Machine.deleted_at).filter(getattr(Machine, field) == value)
+        if machine_id is not None:
+            query = query.filter(Machine.id != machine_id)
+        existing = query.execution_options(include_deleted=True).first()
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{label} already exists" if existing.deleted_at is None else f"{label} belongs to a deleted machine that has not been purged yet"
+            )
 
 
 @router.post("", response_model=MachineDto, status_code=status.HTTP_201_CREATED)
 async def create_machine(
     machine_data: CreateMachineDto,
-    current_user = Depends(get_current_active_user),
+    response: Response,
+    claims: dict = Depends(require(Permission.MANAGE_MACHINES)),
     db: Session = Depends(get_db)
 ):
     """Create new machine"""
-    machine = Machine(**machine_data.dict(exclude_unset=True))
-    db.add(machine)
-    db.commit()
-    db.refresh(machine)
+    values = machine_data.dict(exclude_unset=True)
+    _check_unique(db, values)
+    machine = Machine(**values)
+    with unit_of_work(db):
+        db.add(machine)
+    response.headers["ETag"] = version_etag(machine.version)
     return machine
 
 
@@ -60,41 +111,125 @@ async def create_machine(
 async def update_machine(
     machine_id: int,
     machine_data: UpdateMachineDto,
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    response: Response,
+    claims: dict = Depends(require(Permission.MANAGE_MACHINES)),
     db: Session = Depends(get_db)
 ):
-    """Update machine"""
-    machine = db.query(Machine).filter(Machine.id == machine_id).first()
+    """
+    Update machine (send the ETag of the copy being edited in If-Match)
+    Returns 412 when the machine changed since that copy was read, or when
+    another request updates it concurrently.
+    """
+    machine = db.get(Machine, machine_id)
     if not machine:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Machine not found"
         )
+    if precondition_failed(request, version_etag(machine.version)):
+        raise _conflict()
     
     update_data = machine_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(machine, key, value)
-    
-    db.commit()
-    db.refresh(machine)
+    _check_unique(db, update_data, machine_id)
+    # UPDATE ... WHERE id = :id AND version = :loaded_version
+    try:
+        with unit_of_work(db):
+            for key, value in update_data.items():
+                setattr(machine, key, value)
+    except StaleDataError:
+        raise _conflict()
+    response.headers["ETag"] = version_etag(machine.version)
     return machine
 
 
 @router.delete("/{machine_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_machine(
     machine_id: int,
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    claims: dict = Depends(require(Permission.MANAGE_MACHINES)),
     db: Session = Depends(get_db)
 ):
-    """Delete machine"""
-    machine = db.query(Machine).filter(Machine.id == machine_id).first()
+    """Delete machine (honours If-Match like update)"""
+    machine = db.get(Machine, machine_id)
     if not machine:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Machine not found"
         )
+    if precondition_failed(request, version_etag(machine.version)):
+        raise _conflict()
     
-    db.delete(machine)
-    db.commit()
+    try:
+        with unit_of_work(db):
+            soft_delete(machine)
+    except StaleDataError:
+        raise _conflict()
     return None
 
+
+@router.get("/{machine_id}/attachments", response_model=List[AttachmentDto])
+async def get_machine_attachments(
+    machine_id: int,
+    request: Request,
+    claims: dict = Depends(require(Permission.VIEW_MACHINES)),
+    db: Session = Depends(get_db)
+):
+    """Manuals and photos of a machine (supports ETag / If-None-Match)"""
+    def load():
+        return [attachment_dict(attachment) for attachment in db.query(Attachment).filter(
+            Attachment.machine_id == machine_id
+        ).order_by(Attachment.id).all()]
+    
+    return conditional_json(request, db, [Attachment], load, vary=str(machine_id))
+
+
+@router.post(
+    "/{machine_id}/attachments",
+    response_model=AttachmentDto,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=UPLOAD_OPENAPI
+)
+async def upload_machine_attachment(
+    machine_id: int,
+    request: Request,
+    kind: str = "photo",
+    filename: Optional[str] = None,
+    claims: dict = Depends(require(Permission.MANAGE_MACHINES)),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a manual (PDF) or photo; the file is the raw request body
+    A manual becomes the machine's manual_pdf_path.
+    """
+    if kind not in ("manual", "photo"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="kind must be manual or photo"
+        )
+    machine = db.get(Machine, machine_id)
+    if not machine:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Machine not found"
+        )
+    
+    blob, content_type = await receive_upload(request, kind)
+    attachment = Attachment(
+        machine_id=machine.id,
+        kind=kind,
+        filename=filename,
+        content_type=content_type,
+        size=blob.size,
+        sha256=blob.sha256,
+        created_by_user_id=int(claims["sub"])
+    )
+    try:
+        with unit_of_work(db):
+            db.add(attachment)
+            if kind == "manual":
+                db.flush()
+                machine.manual_pdf_path = attachment_url(attachment.id)
+    except StaleDataError:
+        raise _conflict()
+    return attachment_dict(attachment)
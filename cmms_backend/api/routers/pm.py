@@ -1,12 +1,17 @@
 """
 Preventive Maintenance routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import List
-from database.connection import get_db
+from typing import List, Optional
+from database.connection import get_db, unit_of_work
 from database.models_cmms import PMTask
-from api.auth import get_current_active_user
+from api.permissions import Permission, require
+from api.caching import conditional_json
+from api.broker import publish_change
+from database.soft_delete import soft_delete
+from database.tenancy import session_tenant
+from api.projection import Projection, parse_fields
 from api.schemas import PMTaskDto, CreatePMTaskDto, UpdatePMTaskDto
 
 router = APIRouter(prefix="/api/v1/pm", tags=["pm"])
@@ -14,52 +19,64 @@ router = APIRouter(prefix="/api/v1/pm", tags=["pm"])
 
 @router.get("/tasks", response_model=List[PMTaskDto])
 async def get_pm_tasks(
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    fields: Optional[str] = None,
+    claims: dict = Depends(require(Permission.VIEW_PM)),
     db: Session = Depends(get_db)
 ):
-    """Get all PM tasks"""
-    tasks = db.query(PMTask).all()
-    result = []
-    for task in tasks:
-        result.append(PMTaskDto(
-            id=task.id,
-            machine_id=task.machine_id,
-            title=task.task_name,
-            description=task.task_description,
-            frequency=f"{task.frequency_days} days" if task.frequency_days else None,
-            next_due_date=task.next_due_date
-        ))
-    return result
+    """
+    Get all PM tasks (supports ETag / If-None-Match)
+    `fields` selects a comma separated subset of PMTaskDto fields
+    """
+    projection = Projection(PMTask, PMTaskDto, parse_fields(fields, PMTaskDto), field_map={
+        "title": PMTask.task_name,
+        "description": PMTask.task_description,
+        "frequency": PMTask.frequency_days,
+    })
+    
+    def load():
+        rows = projection.to_dicts(projection.query(db).all())
+        if "frequency" in projection.selected:
+            for row in rows:
+                row["frequency"] = f"{row['frequency']} days" if row["frequency"] else None
+        return rows
+    
+    return conditional_json(request, db, [PMTask], load)
 
 
 @router.get("/tasks/{task_id}", response_model=PMTaskDto)
 async def get_pm_task(
     task_id: int,
-    current_user = Depends(get_current_active_user),
+    request: Request,
+    claims: dict = Depends(require(Permission.VIEW_PM)),
     db: Session = Depends(get_db)
 ):
-    """Get PM task by ID"""
-    task = db.query(PMTask).filter(PMTask.id == task_id).first()
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="PM task not found"
+    """Get PM task by ID (supports ETag / If-None-Match)"""
+    # Not through the query cache: the ETag comes from the shared stamp, another worker's cached row may be older
+    def load():
+        task = db.query(PMTask).filter(PMTask.id == task_id).first()
+        if not task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="PM task not found"
+            )
+        
+        return PMTaskDto(
+            id=task.id,
+            machine_id=task.machine_id,
+            title=task.task_name,
+            description=task.task_description,
+            frequency=f"{task.frequency_days} days" if task.frequency_days else None,
+            next_due_date=task.next_due_date
         )
     
-    return PMTaskDto(
-        id=task.id,
-        machine_id=task.machine_id,
-        title=task.task_name,
-        description=task.task_description,
-        frequency=f"{task.frequency_days} days" if task.frequency_days else None,
-        next_due_date=task.next_due_date
-    )
+    return conditional_json(request, db, [PMTask], load)
 
 
 @router.post("/tasks", response_model=PMTaskDto, status_code=status.HTTP_201_CREATED)
 async def create_pm_task(
     task_data: CreatePMTaskDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_PM)),
     db: Session = Depends(get_db)
 ):
     """Create new PM task"""
@@ -81,9 +98,9 @@ async def create_pm_task(
         is_active=True
     )
     
-    db.add(task)
-    db.commit()
-    db.refresh(task)
+    with unit_of_work(db):
+        db.add(task)
+    publish_change("pm", "created", task.id, tenant_id=session_tenant(db), assigned_to_user_id=task.assigned_to_user_id)
     
     return PMTaskDto(
         id=task.id,
@@ -99,7 +116,7 @@ async def create_pm_task(
 async def update_pm_task(
     task_id: int,
     task_data: UpdatePMTaskDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_PM)),
     db: Session = Depends(get_db)
 ):
     """Update PM task"""
@@ -110,22 +127,22 @@ async def update_pm_task(
             detail="PM task not found"
         )
     
-    if task_data.title:
-        task.task_name = task_data.title
-    if task_data.description is not None:
-        task.task_description = task_data.description
-    if task_data.machine_id is not None:
-        task.machine_id = task_data.machine_id
-    if task_data.next_due_date:
-        task.next_due_date = task_data.next_due_date
-    if task_data.frequency:
-        try:
-            task.frequency_days = int(task_data.frequency.split()[0])
-        except:
-            pass
+    with unit_of_work(db):
+        if task_data.title:
+            task.task_name = task_data.title
+        if task_data.description is not None:
+            task.task_description = task_data.description
+        if task_data.machine_id is not None:
+            task.machine_id = task_data.machine_id
+        if task_data.next_due_date:
+            task.next_due_date = task_data.next_due_date
+        if task_data.frequency:
+            try:
+                task.frequency_days = int(task_data.frequency.split()[0])
+            except:
+                pass
     
-    db.commit()
-    db.refresh(task)
+    publish_change("pm", "updated", task.id, tenant_id=session_tenant(db), assigned_to_user_id=task.assigned_to_user_id)
     
     return PMTaskDto(
         id=task.id,
@@ -140,7 +157,7 @@ async def update_pm_task(
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_pm_task(
     task_id: int,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_PM)),
     db: Session = Depends(get_db)
 ):
     """Delete PM task"""
@@ -151,7 +168,9 @@ async def delete_pm_task(
             detail="PM task not found"
         )
     
-    db.delete(task)
-    db.commit()
+    assigned_to_user_id = task.assigned_to_user_id
+    with unit_of_work(db):
+        soft_delete(task)
+    publish_change("pm", "deleted", task_id, tenant_id=session_tenant(db), assigned_to_user_id=assigned_to_user_id)
     return None
 
@@ -0,0 +1,151 @@
+"""
+Production line routes
+The plant tree (lines -> machines with open worksheet counts and the next
+PM task) is loaded in a fixed number of queries regardless of plant size.
+"""
+from collections import defaultdict
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from database.connection import get_db
+from database.models_cmms import ProductionLine, Machine, Worksheet, PMTask
+from api.permissions import Permission, require
+from api.caching import conditional_json
+from api.schemas import ProductionLineDto
+
+router = APIRouter(prefix="/api/v1/production-lines", tags=["production-lines"])
+
+INCLUDE_OPTIONS = ("machines", "open_worksheets", "next_pm")
+
+# Worksheet statuses that no longer need work
+FINISHED_STATUSES = ("COMPLETED", "CLOSED", "CANCELLED")
+
+
+def parse_include(include: Optional[str]) -> List[str]:
+    """Validate `include=`; next_pm is reported per machine and implies machines"""
+    requested = [name.strip() for name in (include or "").split(",") if name.strip()]
+    unknown = [name for name in requested if name not in INCLUDE_OPTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include: {', '.join(unknown)} (allowed: {', '.join(INCLUDE_OPTIONS)})"
+        )
+    if "next_pm" in requested and "machines" not in requested:
+        requested.append("machines")
+    return [name for name in INCLUDE_OPTIONS if name in requested]
+
+
+def _open_worksheet_counts(db: Session):
+    """(production_line_id, machine_id, open worksheets) for machines with open work"""
+    return db.query(
+        Machine.production_line_id, Worksheet.machine_id, func.count(Worksheet.id)
+    ).join(
+        Machine, Machine.id == Worksheet.machine_id
+    ).filter(
+        Worksheet.status.notin_(FINISHED_STATUSES)
+    ).group_by(Machine.production_line_id, Worksheet.machine_id).all()
+
+
+def _next_pm_tasks(db: Session):
+    """Earliest due active PM task of every machine"""
+    ranked = db.query(
+        PMTask.machine_id,
+        PMTask.id,
+        PMTask.task_name,
+        PMTask.next_due_date,
+        func.row_number().over(
+            partition_by=PMTask.machine_id,
+            order_by=(PMTask.next_due_date, PMTask.id)
+        ).label("position"),
+    ).filter(
+        PMTask.is_active == True,
+        PMTask.machine_id.isnot(None),
+        PMTask.next_due_date.isnot(None)
+    ).subquery()
+    return db.query(ranked.c.machine_id, ranked.c.id, ranked.c.task_name, ranked.c.next_due_date).filter(
+        ranked.c.position == 1
+    ).all()
+
+
+def load_plant_tree(db: Session, include: List[str]) -> List[dict]:
+    """ProductionLineDto-shaped dicts for every line"""
+    query = db.query(ProductionLine).order_by(ProductionLine.id)
+    if "machines" in include:
+        query = query.options(selectinload(ProductionLine.machines).load_only(
+            Machine.id, Machine.production_line_id, Machine.name, Machine.status,
+            Machine.serial_number, Machine.asset_tag
+        ))
+    lines = query.all()
+
+    machine_counts = {}
+    if "machines" not in include:
+        machine_counts = dict(db.query(Machine.production_line_id, func.count(Machine.id)).group_by(
+            Machine.production_line_id
+        ).all())
+
+    open_by_machine, open_by_line = {}, defaultdict(int)
+    if "open_worksheets" in include:
+        for line_id, machine_id, count in _open_worksheet_counts(db):
+            open_by_machine[machine_id] = count
+            open_by_line[line_id] += count
+
+    next_pm = {}
+    if "next_pm" in include:
+        next_pm = {
+            machine_id: {"id": task_id, "title": title, "next_due_date": due}
+            for machine_id, task_id, title, due in _next_pm_tasks(db)
+        }
+
+    result = []
+    for line in lines:
+        item = {
+            "id": line.id,
+            "name": line.name,
+            "description": line.description,
+            "location": line.location,
+            "machine_count": machine_counts.get(line.id, 0),
+            "open_worksheets": open_by_line[line.id] if "open_worksheets" in include else None,
+            "machines": None,
+        }
+        if "machines" in include:
+            machines = sorted(line.machines, key=lambda machine: machine.id)
+            item["machine_count"] = len(machines)
+            item["machines"] = [
+                {
+                    "id": machine.id,
+                    "name": machine.name,
+                    "status": machine.status,
+                    "serial_number": machine.serial_number,
+                    "asset_tag": machine.asset_tag,
+                    "open_worksheets": open_by_machine.get(machine.id, 0) if "open_worksheets" in include else None,
+                    "next_pm": next_pm.get(machine.id),
+                }
+                for machine in machines
+            ]
+        result.append(item)
+    return result
+
+
+@router.get("", response_model=List[ProductionLineDto])
+async def get_production_lines(
+    request: Request,
+    include: Optional[str] = None,
+    claims: dict = Depends(require(Permission.VIEW_MACHINES)),
+    db: Session = Depends(get_db)
+):
+    """
+    Production lines, optionally with the plant tree (supports ETag / If-None-Match)
+    `include` is a comma separated subset of machines, open_worksheets, next_pm.
+    At most four queries run whatever the number of lines and machines.
+    """
+    include = parse_include(include)
+    models = [ProductionLine, Machine]
+    if "open_worksheets" in include:
+        models.append(Worksheet)
+    if "next_pm" in include:
+        models.append(PMTask)
+
+    return conditional_json(request, db, models, lambda: load_plant_tree(db, include), vary=",".join(include))
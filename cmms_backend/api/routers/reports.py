@@ -1,21 +1,26 @@
 """
 Reports and dashboard routes
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from typing import List, Optional
 from database.connection import get_db
-from database.models_cmms import Machine, Worksheet, Part, InventoryLevel, PMTask
-from api.auth import get_current_active_user
-from api.schemas import ReportsSummaryDto
+from database.models_cmms import Machine, Worksheet, PMTask, ReorderItem
+from database.reliability import reliability_report, GROUP_BY_OPTIONS
+from database.tenancy import claims_tenant
+from api.permissions import Permission, require
+from api.report_engine import cost_report, COST_DIMENSIONS
+from api.schemas import ReportsSummaryDto, ReliabilityDto, CostReportRowDto
 
 router = APIRouter(prefix="/api/v1/reports", tags=["reports"])
 
 
 @router.get("/summary", response_model=ReportsSummaryDto)
 async def get_reports_summary(
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.VIEW_REPORTS)),
     db: Session = Depends(get_db)
 ):
     """Get dashboard summary statistics"""
@@ -27,15 +32,8 @@ async def get_reports_summary(
         Worksheet.status.notin_(["COMPLETED", "CANCELLED"])
     ).scalar() or 0
     
-    # Low stock items (quantity < min_stock_level)
-    low_stock_query = db.query(
-        func.count(Part.id)
-    ).join(
-        InventoryLevel, Part.id == InventoryLevel.part_id
-    ).filter(
-        InventoryLevel.quantity_on_hand < Part.safety_stock
-    )
-    inventory_low_stock = low_stock_query.scalar() or 0
+    # Low stock items (quantity < min_stock_level), from the maintained reorder set
+    inventory_low_stock = db.query(func.count(ReorderItem.part_id)).scalar() or 0
     
     # PM tasks due this week
     week_start = datetime.now().date()
@@ -53,3 +51,57 @@ async def get_reports_summary(
         pm_due_this_week=pm_due_this_week
     )
 
+
+@router.get("/reliability", response_model=List[ReliabilityDto])
+async def get_reliability_report(
+    group_by: str = "machine",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    machine_id: Optional[int] = None,
+    production_line_id: Optional[int] = None,
+    claims: dict = Depends(require(Permission.VIEW_REPORTS)),
+    db: Session = Depends(get_db)
+):
+    """
+    Downtime, failure count, MTTR and MTBF per machine, production line or day
+    Answered from the precomputed reliability rollups; defaults to the last 30 days
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"group_by must be one of: {', '.join(GROUP_BY_OPTIONS)}"
+        )
+    
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    
+    return reliability_report(db, group_by, start, end, machine_id, production_line_id)
+
+
+@router.get("/costs", response_model=List[CostReportRowDto])
+async def get_cost_report(
+    group_by: str = "machine,month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    claims: dict = Depends(require(Permission.VIEW_REPORTS))
+):
+    """
+    Parts cost (quantity_used * unit_cost_at_time) of worksheets
+    `group_by` is a comma separated subset of machine,line,category,month.
+    Computed by the vectorized report engine and cached by parameters.
+    """
+    dims = [d.strip() for d in group_by.split(",") if d.strip()]
+    unknown = [d for d in dims if d not in COST_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"group_by must be a subset of: {', '.join(COST_DIMENSIONS)}"
+        )
+    
+    # Long aggregation: keep it off the event loop
+    return await run_in_threadpool(cost_report, dims, start, end, claims_tenant(claims))
@@ -0,0 +1,120 @@
+"""
+Delta sync routes for offline-first mobile clients
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+from collections import defaultdict
+from database.connection import get_db
+from database.models_cmms import Machine, Part, InventoryLevel, Worksheet, WorksheetPart, PMTask, SyncTombstone
+from database.sync import SYNC_TABLES, encode_token, decode_token, next_watermark, watermark_expired
+from api.permissions import Permission, require
+from api.schemas import (
+    SyncResponse, SyncChangesDto, SyncDeletedDto, MachineDto, PartDto, InventoryLevelDto,
+    WorksheetDto, WorksheetPartDto, PMTaskDto
+)
+
+# Sync returns every synced entity, so it needs read access to all of them
+SYNC_PERMISSIONS = (Permission.VIEW_MACHINES, Permission.VIEW_INVENTORY, Permission.VIEW_WORKSHEETS, Permission.VIEW_PM)
+
+router = APIRouter(prefix="/api/v1/sync", tags=["sync"])
+
+
+def _changed(db: Session, model, column, since: Optional[datetime]):
+    """Rows of a table changed since the watermark (all rows for a full sync)"""
+    query = db.query(model)
+    if since is not None:
+        query = query.filter(column >= since)
+    return query.all()
+
+
+def _worksheet_dtos(db: Session, worksheets) -> list:
+    parts_by_worksheet = defaultdict(list)
+    worksheet_ids = [ws.id for ws in worksheets]
+    if worksheet_ids:
+        parts = db.query(WorksheetPart).filter(WorksheetPart.worksheet_id.in_(worksheet_ids)).all()
+        for p in parts:
+            parts_by_worksheet[p.worksheet_id].append(WorksheetPartDto(inventory_id=p.part_id, qty=p.quantity_used))
+
+    return [
+        WorksheetDto(
+            id=ws.id,
+            title=ws.title,
+            description=ws.description,
+            status=ws.status,
+            assigned_to_user_id=ws.assigned_to_user_id,
+            actual_start_date=ws.breakdown_time,
+            actual_end_date=ws.repair_finished_time,
+            completion_notes=ws.notes,
+            parts_used=parts_by_worksheet[ws.id]
+        )
+        for ws in worksheets
+    ]
+
+
+def _pm_task_dtos(tasks) -> list:
+    return [
+        PMTaskDto(
+            id=task.id,
+            machine_id=task.machine_id,
+            title=task.task_name,
+            description=task.task_description,
+            frequency=f"{task.frequency_days} days" if task.frequency_days else None,
+            next_due_date=task.next_due_date
+        )
+        for task in tasks
+    ]
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = None,
+    claims: dict = Depends(require(*SYNC_PERMISSIONS)),
+    db: Session = Depends(get_db)
+):
+    """
+    Return machines, parts, inventory levels, worksheets and PM tasks changed
+    or deleted since the `since` token. Without a token (or with a token older
+    than the tombstone retention window) a full snapshot is returned.
+    Pass the returned token as `since` on the next call.
+    """
+    watermark = None
+    if since:
+        watermark = decode_token(since)
+        if watermark is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid sync token"
+            )
+        if watermark_expired(watermark):
+            watermark = None
+
+    started_at = datetime.utcnow()
+
+    changes = SyncChangesDto(
+        machines=[MachineDto.model_validate(m) for m in _changed(db, Machine, Machine.updated_at, watermark)],
+        parts=[PartDto.model_validate(p) for p in _changed(db, Part, Part.updated_at, watermark)],
+        inventory_levels=[
+            InventoryLevelDto.model_validate(level)
+            for level in _changed(db, InventoryLevel, InventoryLevel.last_updated, watermark)
+        ],
+        worksheets=_worksheet_dtos(db, _changed(db, Worksheet, Worksheet.updated_at, watermark)),
+        pm_tasks=_pm_task_dtos(_changed(db, PMTask, PMTask.updated_at, watermark)),
+    )
+
+    deleted = SyncDeletedDto()
+    if watermark is not None:
+        tombstones = db.query(SyncTombstone.table_name, SyncTombstone.row_id).filter(
+            SyncTombstone.deleted_at >= watermark,
+            SyncTombstone.table_name.in_(SYNC_TABLES)
+        ).all()
+        for table_name, row_id in tombstones:
+            getattr(deleted, table_name).append(row_id)
+
+    return SyncResponse(
+        token=encode_token(next_watermark(started_at)),
+        full=watermark is None,
+        changes=changes,
+        deleted=deleted
+    )
@@ -1,13 +1,16 @@
 """
 User management routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import List
-from database.connection import get_db
-from database.models_cmms import User, Role
-from api.auth import get_current_active_user
-from api.schemas import UserDto, CreateUserRequest, CreateUserResponse
+from typing import List, Optional
+from database.connection import get_db, unit_of_work
+from database.models_cmms import User, Role, Attachment, login_key
+from database.tenancy import ALL_TENANTS
+from api.auth import get_current_active_user, get_token_claims
+from api.storage import UPLOAD_OPENAPI, attachment_dict, file_response, receive_upload, thumbnail_response
+from api.permissions import Permission, require
+from api.schemas import UserDto, CreateUserRequest, CreateUserResponse, AttachmentDto
 from api.auth import get_password_hash
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
@@ -25,24 +28,81 @@ async def get_current_user_info(
         email=current_user.email,
         username=current_user.username,
         role=role.name if role else None,
+        profile_attachment_id=current_user.profile_attachment_id,
         created_at=current_user.created_at
     )
 
 
-@router.get("", response_model=List[UserDto])
-async def get_users(
+@router.put("/me/photo", response_model=AttachmentDto, openapi_extra=UPLOAD_OPENAPI)
+async def set_profile_photo(
+    request: Request,
+    filename: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get all users (ADMIN only)"""
-    # Check if user is admin
-    role = db.query(Role).filter(Role.id == current_user.role_id).first()
-    if not role or role.name not in ["ADMIN", "admin", "developer"]:
+    """Replace the current user's profile picture; the image is the raw request body"""
+    blob, content_type = await receive_upload(request, "profile")
+    attachment = Attachment(
+        kind="profile",
+        filename=filename,
+        content_type=content_type,
+        size=blob.size,
+        sha256=blob.sha256,
+        created_by_user_id=current_user.id
+    )
+    with unit_of_work(db):
+        db.add(attachment)
+        db.flush()
+        previous_id = current_user.profile_attachment_id
+        current_user.profile_attachment_id = attachment.id
+        previous = db.get(Attachment, previous_id) if previous_id is not None else None
+        if previous is not None:
+            db.delete(previous)
+    return attachment_dict(attachment)
+
+
+@router.delete("/me/photo", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_profile_photo(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Remove the current user's profile picture"""
+    with unit_of_work(db):
+        previous_id = current_user.profile_attachment_id
+        current_user.profile_attachment_id = None
+        previous = db.get(Attachment, previous_id) if previous_id is not None else None
+        if previous is not None:
+            db.delete(previous)
+    return None
+
+
+@router.get("/{user_id}/photo")
+async def get_profile_photo(
+    user_id: int,
+    request: Request,
+    size: Optional[int] = None,
+    claims: dict = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """A user's profile picture, or its JPEG thumbnail with `size` (supports Range and If-None-Match)"""
+    user = db.get(User, user_id)
+    attachment = db.get(Attachment, user.profile_attachment_id) if user and user.profile_attachment_id else None
+    if attachment is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile picture not found"
         )
-    
+    if size is not None:
+        return await thumbnail_response(request, attachment, size)
+    return file_response(request, attachment)
+
+
+@router.get("", response_model=List[UserDto])
+async def get_users(
+    claims: dict = Depends(require(Permission.MANAGE_USERS)),
+    db: Session = Depends(get_db)
+):
+    """Get all users (requires MANAGE_USERS)"""
     users = db.query(User).all()
     result = []
     for user in users:
@@ -52,6 +112,7 @@ async def get_users(
             email=user.email,
             username=user.username,
             role=user_role.name if user_role else None,
+            profile_attachment_id=user.profile_attachment_id,
             created_at=user.created_at
         ))
     return result
@@ -60,22 +121,16 @@ async def get_users(
 @router.post("", response_model=CreateUserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_data: CreateUserRequest,
-    current_user: User = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_USERS)),
     db: Session = Depends(get_db)
 ):
-    """Create new user (ADMIN only)"""
-    # Check if user is admin
-    role = db.query(Role).filter(Role.id == current_user.role_id).first()
-    if not role or role.name not in ["ADMIN", "admin", "developer"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
-    # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.email)
-    ).first()
+    """Create new user (requires MANAGE_USERS)"""
+    # Usernames and emails are unique across tenants, so look in all of them (as login does)
+    username = user_data.email.split("@")[0]
+    keys = [login_key(user_data.email), login_key(username)]
+    existing_user = db.query(User.id).filter(
+        User.username_lower.in_(keys) | User.email_lower.in_(keys)
+    ).execution_options(**{ALL_TENANTS: True}).first()
     
     if existing_user:
         raise HTTPException(
@@ -96,7 +151,7 @@ async def create_user(
     # Create new user
     password_hash = get_password_hash(user_data.password)
     new_user = User(
-        username=user_data.email.split("@")[0],
+        username=username,
         email=user_data.email,
         password_hash=password_hash,
         role_id=user_role.id,
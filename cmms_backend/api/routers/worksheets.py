@@ -4,9 +4,15 @@ Worksheet management routes
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database.connection import get_db
+from collections import defaultdict
+from database.connection import get_db, unit_of_work
 from database.models_cmms import Worksheet, WorksheetPart
-from api.auth import get_current_active_user
+from api.permissions import Permission, require
+from api.broker import publish_change
+from database.query_cache import cached_get, cached_rows
+from database.soft_delete import soft_delete
+from database.tenancy import session_tenant
+from api.fast_json import FastJSONResponse
 from api.schemas import WorksheetDto, CreateWorksheetDto, UpdateWorksheetDto, WorksheetPartDto
 
 router = APIRouter(prefix="/api/v1/worksheets", tags=["worksheets"])
@@ -15,56 +21,74 @@ router = APIRouter(prefix="/api/v1/worksheets", tags=["worksheets"])
 @router.get("", response_model=List[WorksheetDto])
 async def get_worksheets(
     status_filter: Optional[str] = None,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.VIEW_WORKSHEETS)),
     db: Session = Depends(get_db)
 ):
     """Get all worksheets with optional status filter"""
-    query = db.query(Worksheet)
+    query = db.query(
+        Worksheet.id,
+        Worksheet.title,
+        Worksheet.description,
+        Worksheet.status,
+        Worksheet.assigned_to_user_id,
+        Worksheet.breakdown_time,
+        Worksheet.repair_finished_time,
+        Worksheet.notes,
+    )
     if status_filter:
         query = query.filter(Worksheet.status == status_filter)
     worksheets = query.all()
     
-    result = []
-    for ws in worksheets:
-        # Get parts used
-        parts = db.query(WorksheetPart).filter(WorksheetPart.worksheet_id == ws.id).all()
-        parts_used = [WorksheetPartDto(inventory_id=p.part_id, qty=p.quantity_used) for p in parts]
-        
-        result.append(WorksheetDto(
-            id=ws.id,
-            worksheet_number=None,  # Not in schema
-            title=ws.title,
-            description=ws.description,
-            type=None,  # Not in schema
-            priority=None,  # Not in schema
-            status=ws.status,
-            assigned_to_user_id=ws.assigned_to_user_id,
-            scheduled_start_date=None,  # Not in schema
-            scheduled_end_date=None,  # Not in schema
-            actual_start_date=ws.breakdown_time,
-            actual_end_date=ws.repair_finished_time,
-            completion_notes=ws.notes,
-            parts_used=parts_used
-        ))
+    # Get parts used for all listed worksheets in one query
+    parts_used = defaultdict(list)
+    parts_query = db.query(WorksheetPart.worksheet_id, WorksheetPart.part_id, WorksheetPart.quantity_used)
+    if status_filter:
+        parts_query = parts_query.join(Worksheet, Worksheet.id == WorksheetPart.worksheet_id).filter(
+            Worksheet.status == status_filter
+        )
+    for worksheet_id, part_id, quantity_used in parts_query.all():
+        parts_used[worksheet_id].append({"inventory_id": part_id, "qty": quantity_used})
     
-    return result
+    # Trusted DB output: build WorksheetDto-shaped dicts without per-row validation
+    result = [
+        {
+            "id": ws.id,
+            "worksheet_number": None,  # Not in schema
+            "title": ws.title,
+            "description": ws.description,
+            "type": None,  # Not in schema
+            "priority": None,  # Not in schema
+            "status": ws.status,
+            "assigned_to_user_id": ws.assigned_to_user_id,
+            "scheduled_start_date": None,  # Not in schema
+            "scheduled_end_date": None,  # Not in schema
+            "actual_start_date": ws.breakdown_time,
+            "actual_end_date": ws.repair_finished_time,
+            "completion_notes": ws.notes,
+            "parts_used": parts_used[ws.id],
+        }
+        for ws in worksheets
+    ]
+    return FastJSONResponse(content=result)
 
 
 @router.get("/{worksheet_id}", response_model=WorksheetDto)
 async def get_worksheet(
     worksheet_id: int,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.VIEW_WORKSHEETS)),
     db: Session = Depends(get_db)
 ):
     """Get worksheet by ID"""
-    worksheet = db.query(Worksheet).filter(Worksheet.id == worksheet_id).first()
+    worksheet = cached_get(db, Worksheet, worksheet_id)
     if not worksheet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Worksheet not found"
         )
     
-    parts = db.query(WorksheetPart).filter(WorksheetPart.worksheet_id == worksheet.id).all()
+    parts = cached_rows(db, f"worksheet_parts:{worksheet.id}", [WorksheetPart], lambda: db.query(
+        WorksheetPart.part_id, WorksheetPart.quantity_used
+    ).filter(WorksheetPart.worksheet_id == worksheet.id).all())
     parts_used = [WorksheetPartDto(inventory_id=p.part_id, qty=p.quantity_used) for p in parts]
     
     return WorksheetDto(
@@ -88,21 +112,22 @@ async def get_worksheet(
 @router.post("", response_model=WorksheetDto, status_code=status.HTTP_201_CREATED)
 async def create_worksheet(
     worksheet_data: CreateWorksheetDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_WORKSHEETS)),
     db: Session = Depends(get_db)
 ):
     """Create new worksheet"""
     worksheet = Worksheet(
         machine_id=1,  # Default, should be in DTO
-        assigned_to_user_id=worksheet_data.assigned_to_user_id or current_user.id,
+        assigned_to_user_id=worksheet_data.assigned_to_user_id or int(claims["sub"]),
         title=worksheet_data.title,
         description=worksheet_data.description,
         status="PENDING"
     )
     
-    db.add(worksheet)
-    db.commit()
-    db.refresh(worksheet)
+    with unit_of_work(db):
+        db.add(worksheet)
+    publish_change("worksheets", "created", worksheet.id,
+                   tenant_id=session_tenant(db), status=worksheet.status, assigned_to_user_id=worksheet.assigned_to_user_id)
     
     return WorksheetDto(
         id=worksheet.id,
@@ -126,7 +151,7 @@ async def create_worksheet(
 async def update_worksheet(
     worksheet_id: int,
     worksheet_data: UpdateWorksheetDto,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_WORKSHEETS)),
     db: Session = Depends(get_db)
 ):
     """Update worksheet"""
@@ -138,24 +163,26 @@ async def update_worksheet(
         )
     
     update_data = worksheet_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        if key == "status" and value:
-            worksheet.status = value
-        elif key == "title" and value:
-            worksheet.title = value
-        elif key == "description" and value is not None:
-            worksheet.description = value
-        elif key == "completion_notes" and value is not None:
-            worksheet.notes = value
-        elif key == "actual_start_date" and value:
-            worksheet.breakdown_time = value
-        elif key == "actual_end_date" and value:
-            worksheet.repair_finished_time = value
-    
-    db.commit()
-    db.refresh(worksheet)
+    with unit_of_work(db):
+        for key, value in update_data.items():
+            if key == "status" and value:
+                worksheet.status = value
+            elif key == "title" and value:
+                worksheet.title = value
+            elif key == "description" and value is not None:
+                worksheet.description = value
+            elif key == "completion_notes" and value is not None:
+                worksheet.notes = value
+            elif key == "actual_start_date" and value:
+                worksheet.breakdown_time = value
+            elif key == "actual_end_date" and value:
+                worksheet.repair_finished_time = value
+    publish_change("worksheets", "updated", worksheet.id,
+                   tenant_id=session_tenant(db), status=worksheet.status, assigned_to_user_id=worksheet.assigned_to_user_id)
     
-    parts = db.query(WorksheetPart).filter(WorksheetPart.worksheet_id == worksheet.id).all()
+    parts = cached_rows(db, f"worksheet_parts:{worksheet.id}", [WorksheetPart], lambda: db.query(
+        WorksheetPart.part_id, WorksheetPart.quantity_used
+    ).filter(WorksheetPart.worksheet_id == worksheet.id).all())
     parts_used = [WorksheetPartDto(inventory_id=p.part_id, qty=p.quantity_used) for p in parts]
     
     return WorksheetDto(
@@ -179,7 +206,7 @@ async def update_worksheet(
 @router.delete("/{worksheet_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_worksheet(
     worksheet_id: int,
-    current_user = Depends(get_current_active_user),
+    claims: dict = Depends(require(Permission.MANAGE_WORKSHEETS)),
     db: Session = Depends(get_db)
 ):
     """Delete worksheet"""
@@ -190,12 +217,10 @@ async def delete_worksheet(
             detail="Worksheet not found"
         )
     
-    # Delete parts first
-    parts = db.query(WorksheetPart).filter(WorksheetPart.worksheet_id == worksheet.id).all()
-    for part in parts:
-        db.delete(part)
-    
-    db.delete(worksheet)
-    db.commit()
+    # Its parts are removed with it by the purger
+    assigned_to_user_id = worksheet.assigned_to_user_id
+    with unit_of_work(db):
+        soft_delete(worksheet)
+    publish_change("worksheets", "deleted", worksheet_id, tenant_id=session_tenant(db), assigned_to_user_id=assigned_to_user_id)
     return None
 
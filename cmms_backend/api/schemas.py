@@ -3,7 +3,7 @@ Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 
 
 # Authentication schemas
@@ -19,6 +19,16 @@ class TokenResponse(BaseModel):
     user_id: int
     username: str
     role_name: str
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 
 class RegisterRequest(BaseModel):
@@ -37,6 +47,7 @@ class UserDto(BaseModel):
     email: Optional[str] = None
     username: Optional[str] = None
     role: Optional[str] = None
+    profile_attachment_id: Optional[int] = None
     created_at: Optional[datetime] = None
     
     class Config:
@@ -65,6 +76,9 @@ class MachineDto(BaseModel):
     asset_tag: Optional[str] = None
     description: Optional[str] = None
     install_date: Optional[datetime] = None
+    # Set by uploading a manual (POST /machines/{id}/attachments?kind=manual)
+    manual_pdf_path: Optional[str] = None
+    version: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -248,6 +262,45 @@ class UpdatePMTaskDto(BaseModel):
     next_due_date: Optional[datetime] = None
 
 
+# Production line tree schemas
+class NextPMDto(BaseModel):
+    id: int
+    title: str
+    next_due_date: Optional[datetime] = None
+
+
+class LineMachineDto(BaseModel):
+    id: int
+    name: str
+    status: Optional[str] = None
+    serial_number: Optional[str] = None
+    asset_tag: Optional[str] = None
+    open_worksheets: Optional[int] = None
+    next_pm: Optional[NextPMDto] = None
+
+
+class ProductionLineDto(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    location: Optional[str] = None
+    machine_count: int
+    open_worksheets: Optional[int] = None
+    machines: Optional[List[LineMachineDto]] = None
+
+
+# Attachment schemas
+class AttachmentDto(BaseModel):
+    id: int
+    machine_id: Optional[int] = None
+    kind: str
+    filename: Optional[str] = None
+    content_type: str
+    size: int
+    created_at: Optional[datetime] = None
+    url: str
+
+
 # Reports schemas
 class ReportsSummaryDto(BaseModel):
     machines_total: int
@@ -255,3 +308,91 @@ class ReportsSummaryDto(BaseModel):
     inventory_low_stock: int
     pm_due_this_week: int
 
+
+class ReliabilityDto(BaseModel):
+    machine_id: Optional[int] = None
+    production_line_id: Optional[int] = None
+    day: Optional[date] = None
+    failures: int
+    downtime_hours: float
+    mttr_hours: Optional[float] = None
+    mtbf_hours: Optional[float] = None
+
+
+class CostReportRowDto(BaseModel):
+    machine_id: Optional[int] = None
+    production_line_id: Optional[int] = None
+    category: Optional[str] = None
+    month: Optional[str] = None
+    cost: float
+    quantity: float
+    lines: int
+
+
+class ReorderItemDto(BaseModel):
+    part_id: int
+    sku: str
+    name: str
+    quantity_on_hand: int
+    safety_stock: int
+    suggested_quantity: int
+
+
+class ReorderGroupDto(BaseModel):
+    supplier_id: Optional[int] = None
+    supplier_name: Optional[str] = None
+    items: List[ReorderItemDto]
+
+
+# Sync schemas
+class PartDto(BaseModel):
+    id: int
+    sku: str
+    name: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    unit: Optional[str] = None
+    buy_price: Optional[float] = None
+    safety_stock: Optional[int] = None
+    reorder_quantity: Optional[int] = None
+    supplier_id: Optional[int] = None
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class InventoryLevelDto(BaseModel):
+    id: int
+    part_id: int
+    quantity_on_hand: Optional[int] = None
+    quantity_reserved: Optional[int] = None
+    bin_location: Optional[str] = None
+    last_updated: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class SyncChangesDto(BaseModel):
+    machines: List[MachineDto] = []
+    parts: List[PartDto] = []
+    inventory_levels: List[InventoryLevelDto] = []
+    worksheets: List[WorksheetDto] = []
+    pm_tasks: List[PMTaskDto] = []
+
+
+class SyncDeletedDto(BaseModel):
+    machines: List[int] = []
+    parts: List[int] = []
+    inventory_levels: List[int] = []
+    worksheets: List[int] = []
+    pm_tasks: List[int] = []
+
+
+class SyncResponse(BaseModel):
+    token: str
+    full: bool
+    changes: SyncChangesDto
+    deleted: SyncDeletedDto
+
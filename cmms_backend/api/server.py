@@ -14,25 +14,50 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from config.app_config import config
-from database.connection import get_db, init_db, test_connection
-from api.routers import auth, users, machines, inventory, worksheets, pm, reports
-
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from database.connection import get_db, get_db_session, init_db, test_connection
+from database.locks import try_lock
+from database.query_cache import query_cache
+from database.soft_delete import PURGE_LOCK, purge_deleted
+from api.broker import broker
+from api.caching import response_cache
+from api.revocation import purge_revoked_tokens
+from api.rate_limit import prune_buckets
+from api.log_pipeline import RequestIdMiddleware, configure_logging
+from api.permissions import Permission, require
+from api.routers import auth, users, machines, production_lines, inventory, worksheets, pm, reports, sync, events, attachments
+
+# Configure logging (queued, written by a background thread; SQL logging with LOG_SQL)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
 
+def purge_once():
+    """Run the purgers unless another worker or server is already running them"""
+    with try_lock(PURGE_LOCK) as acquired:
+        if acquired:
+            purge_deleted()
+            with get_db_session() as db:
+                purge_revoked_tokens(db)
+
+
+async def purge_periodically(interval: int):
+    """Run the soft-delete and token revocation purgers off the event loop every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(purge_once)
+        except Exception as e:
+            logger.error(f"Soft-delete purge failed: {e}")
+        # Per host, not under the purge lock: the bucket file is local to this machine
+        await asyncio.to_thread(prune_buckets)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan events for FastAPI"""
@@ -54,12 +79,18 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database initialization failed: {e}")
         # Don't fail startup if tables already exist
     
+    purger = None
+    if config.SOFT_DELETE_PURGE_INTERVAL_SECONDS > 0:
+        purger = asyncio.create_task(purge_periodically(config.SOFT_DELETE_PURGE_INTERVAL_SECONDS))
+    
     logger.info(f"CMMS API Backend started on {config.API_HOST}:{config.API_PORT}")
     
     yield
     
     # Shutdown
     logger.info("Shutting down CMMS API Backend...")
+    if purger is not None:
+        purger.cancel()
 
 
 # Create FastAPI app
@@ -79,8 +110,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Outermost, so every log record of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 
 # Health check endpoints
 @app.get("/")
@@ -122,10 +157,14 @@ async def health_detailed(db: Session = Depends(get_db)):
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(machines.router)
+app.include_router(production_lines.router)
 app.include_router(inventory.router)
 app.include_router(worksheets.router)
 app.include_router(pm.router)
 app.include_router(reports.router)
+app.include_router(sync.router)
+app.include_router(events.router)
+app.include_router(attachments.router)
 
 # API Routes
 @app.get("/api/v1/info")
@@ -139,6 +178,15 @@ async def api_info():
     }
 
 
+@app.get("/api/v1/cache/stats")
+async def cache_stats(claims: dict = Depends(require(Permission.MANAGE_SYSTEM))):
+    """Query and response cache counters of this worker"""
+    return {
+        "query_cache": query_cache.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+
 # Error handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -151,12 +199,23 @@ async def global_exception_handler(request, exc):
 
 
 if __name__ == "__main__":
+    from api.prefork import resolve_workers, serve
+    workers = resolve_workers(config.SERVER_WORKERS)
+    if workers > 1 and not config.DEBUG:
+        if broker.relay is None:
+            logger.warning(
+                f"{workers} workers without an SSE relay: event streams only carry changes made through "
+                "the worker the client is connected to; set SSE_REDIS_URL to deliver them all"
+            )
+        serve("api.server:app", config.API_HOST, config.API_PORT, workers, preload_app=config.SERVER_PRELOAD)
+    
     import uvicorn
     uvicorn.run(
         "api.server:app",
         host=config.API_HOST,
         port=config.API_PORT,
         reload=config.DEBUG,
-        log_level=config.LOG_LEVEL.lower()
+        log_level=config.LOG_LEVEL.lower(),
+        log_config=None  # uvicorn's loggers propagate to the queued root handler
     )
 
@@ -0,0 +1,282 @@
+"""
+Attachment storage
+Files are stored once per content under STORAGE_DIR/blobs/<aa>/<bb>/<sha256>,
+so identical uploads share one blob. Uploads are streamed to a temporary
+file while being hashed and then renamed into place; memory use does not
+depend on the file size. Downloads go through FileResponse, which streams
+from disk (or hands the path to the server where it supports that) and
+answers Range requests. Image thumbnails are rendered on first request and
+kept under STORAGE_DIR/thumbs. Blobs that no attachment references any more
+are removed by collect_garbage() (scripts/gc_attachments.py).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable, NamedTuple, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+
+from api.caching import Validators, is_not_modified
+from config.app_config import config
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp", "image/gif")
+
+# Content types accepted for each attachment kind
+KIND_CONTENT_TYPES = {
+    "manual": ("application/pdf",),
+    "photo": IMAGE_TYPES,
+    "profile": IMAGE_TYPES,
+}
+
+THUMBNAIL_SIZES = (64, 128, 256, 512)
+
+# Blob contents never change under their hash
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Uploads are written to disk in blocks of this size, off the event loop
+WRITE_BLOCK_BYTES = 1024 * 1024
+
+# Request body documentation for the raw (non-multipart) upload routes
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {content_type: {"schema": {"type": "string", "format": "binary"}}
+                    for content_type in ("application/pdf",) + IMAGE_TYPES},
+    }
+}
+
+
+class StoredBlob(NamedTuple):
+    sha256: str
+    size: int
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded STORAGE_MAX_UPLOAD_MB"""
+
+
+class BlobStore:
+    """Content-addressed files on local disk"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, sha256: str) -> Path:
+        return self.root / "blobs" / sha256[:2] / sha256[2:4] / sha256
+
+    def thumbnail_path(self, sha256: str, size: int) -> Path:
+        return self.root / "thumbs" / sha256[:2] / f"{sha256}_{size}.jpg"
+
+    def _temp_file(self, directory: str = "tmp"):
+        path = self.root / directory
+        path.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=path, delete=False)
+
+    def _commit(self, temp_path: str, sha256: str):
+        target = self.path(sha256)
+        if target.exists():
+            os.unlink(temp_path)
+            # A fresh mtime keeps the shared blob out of the garbage collector's grace window
+            os.utime(target)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], max_bytes: int) -> StoredBlob:
+        """Hash and store a streamed upload; raises UploadTooLarge past `max_bytes`"""
+        digest = hashlib.sha256()
+        size = 0
+        pending = bytearray()
+        temp = await asyncio.to_thread(self._temp_file)
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                pending += chunk
+                if len(pending) >= WRITE_BLOCK_BYTES:
+                    await asyncio.to_thread(temp.write, bytes(pending))
+                    pending.clear()
+            if pending:
+                await asyncio.to_thread(temp.write, bytes(pending))
+            await asyncio.to_thread(temp.close)
+            sha256 = digest.hexdigest()
+            await asyncio.to_thread(self._commit, temp.name, sha256)
+        except BaseException:
+            temp.close()
+            Path(temp.name).unlink(missing_ok=True)
+            raise
+        return StoredBlob(sha256, size)
+
+    def save_bytes(self, data: bytes) -> StoredBlob:
+        """Store an in-memory file (imports and scripts)"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._temp_file() as temp:
+            temp.write(data)
+        self._commit(temp.name, sha256)
+        return StoredBlob(sha256, len(data))
+
+    def thumbnail(self, sha256: str, size: int) -> Path:
+        """JPEG thumbnail of an image blob, rendered on first use"""
+        target = self.thumbnail_path(sha256, size)
+        if target.exists():
+            return target
+        with Image.open(self.path(sha256)) as image:
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            with self._temp_file() as temp:
+                image.save(temp, "JPEG", quality=85)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp.name, target)
+        return target
+
+    def collect_garbage(self, referenced: Iterable[str], grace_seconds: float = 3600) -> int:
+        """
+        Remove blobs (and their thumbnails) that no attachment references
+        Files younger than the grace period are kept: their attachment row
+        may not be committed yet. Returns the number of blobs removed.
+        """
+        referenced = set(referenced)
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for path in (self.root / "blobs").glob("*/*/*"):
+            if path.name in referenced or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink(missing_ok=True)
+            for thumbnail in (self.root / "thumbs" / path.name[:2]).glob(f"{path.name}_*.jpg"):
+                thumbnail.unlink(missing_ok=True)
+            removed += 1
+        for path in (self.root / "tmp").glob("*"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+
+
+blob_store = BlobStore(config.STORAGE_DIR)
+
+
+def attachment_url(attachment_id: int) -> str:
+    return f"/api/v1/attachments/{attachment_id}"
+
+
+def attachment_dict(attachment) -> dict:
+    """AttachmentDto-shaped dict of an Attachment row"""
+    return {
+        "id": attachment.id,
+        "machine_id": attachment.machine_id,
+        "kind": attachment.kind,
+        "filename": attachment.filename,
+        "content_type": attachment.content_type,
+        "size": attachment.size,
+        "created_at": attachment.created_at,
+        "url": attachment_url(attachment.id),
+    }
+
+
+async def receive_upload(request: Request, kind: str) -> Tuple[StoredBlob, str]:
+    """Stream the raw request body into the store; returns the blob and its content type"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in KIND_CONTENT_TYPES[kind]:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"A {kind} must be one of: {', '.join(KIND_CONTENT_TYPES[kind])}"
+        )
+    max_bytes = config.STORAGE_MAX_UPLOAD_MB * 1024 * 1024
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Uploads are limited to {config.STORAGE_MAX_UPLOAD_MB} MB"
+    )
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise too_large
+
+    try:
+        blob = await blob_store.save_stream(request.stream(), max_bytes)
+    except UploadTooLarge:
+        raise too_large
+    if blob.size == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empty upload"
+        )
+    return blob, content_type
+
+
+def _immutable_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "X-Content-Type-Options": "nosniff"}
+
+
+def file_response(request: Request, attachment) -> Response:
+    """Serve an attachment's blob (Range and If-None-Match aware)"""
+    validators = Validators(etag=f'"{attachment.sha256}"', last_modified=None)
+    headers = _immutable_headers(validators.etag)
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    path = blob_store.path(attachment.sha256)
+    if not path.exists():
+        logger.error(f"Blob {attachment.sha256} of attachment {attachment.id} is missing")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment content not found"
+        )
+    return FileResponse(
+        path,
+        media_type=attachment.content_type,
+        filename=attachment.filename,
+        content_disposition_type="inline",
+        headers=headers,
+    )
+
+
+async def thumbnail_response(request: Request, attachment, size: int) -> Response:
+    """Serve (rendering it on first use) a JPEG thumbnail of an image attachment"""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Thumbnail size must be one of: {', '.join(map(str, THUMBNAIL_SIZES))}"
+        )
+    if attachment.content_type not in IMAGE_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Thumbnails are only available for images"
+        )
+    if Image is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Thumbnails need Pillow installed on the server"
+        )
+    validators = Validators(etag=f'"{attachment.sha256}-{size}"', last_modified=None)
+    headers = _immutable_headers(validators.etag)
+    if is_not_modified(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        path = await asyncio.to_thread(blob_store.thumbnail, attachment.sha256, size)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attachment content not found"
+        )
+    except (OSError, Image.DecompressionBombError) as e:
+        # Unreadable files, and images whose pixel count exceeds Pillow's decompression bomb limit
+        logger.warning(f"Cannot render a thumbnail of attachment {attachment.id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="The image could not be decoded"
+        )
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
@@ -24,6 +24,12 @@ class AppConfig:
     MYSQL_USER: str = os.getenv("MYSQL_USER", "zedin_cmms")
     MYSQL_PASSWORD: str = os.getenv("MYSQL_PASSWORD", "Gele007ta...")
     
+    # Apply pending schema migrations in init_db (once per server, before workers fork)
+    MIGRATE_ON_STARTUP: bool = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+    
+    # Model bounded contexts to load (see database/base.py)
+    MODEL_CONTEXTS: list = os.getenv("MODEL_CONTEXTS", "cmms").split(",")
+    
     # API configuration
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
@@ -32,11 +38,74 @@ class AppConfig:
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "production")
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Logging (see api/log_pipeline.py): "json" or "text" lines on stdout, written by a background thread
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text" if DEBUG else "json")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # SQL statement logging (replaces engine echo); the sample rate applies per request
+    LOG_SQL: bool = os.getenv("LOG_SQL", str(DEBUG)).lower() == "true"
+    LOG_SQL_SAMPLE_RATE: float = float(os.getenv("LOG_SQL_SAMPLE_RATE", "1.0" if DEBUG else "0.01"))
     
     # Security
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "change-this-secret-key-in-production")
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+    REVOCATION_SYNC_SECONDS: int = int(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+    REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+    
+    # Response cache for read-mostly endpoints (ETag validation is always on)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+    
+    # Delta sync
+    SYNC_OVERLAP_SECONDS: int = int(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+    
+    # Soft delete: deleted rows are hard-deleted in batches after the retention window
+    SOFT_DELETE_RETENTION_HOURS: float = float(os.getenv("SOFT_DELETE_RETENTION_HOURS", "24"))
+    SOFT_DELETE_PURGE_BATCH: int = int(os.getenv("SOFT_DELETE_PURGE_BATCH", "1000"))
+    SOFT_DELETE_PURGE_INTERVAL_SECONDS: int = int(os.getenv("SOFT_DELETE_PURGE_INTERVAL_SECONDS", "300"))
+    
+    # Server-sent events
+    SSE_HEARTBEAT_SECONDS: int = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_QUEUE_SIZE: int = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+    # Redis channel relaying events between workers (needs redis; without it events stay in their worker)
+    SSE_REDIS_URL: Optional[str] = os.getenv("SSE_REDIS_URL")
+    
+    # Report engine
+    REPORT_CHUNK_SIZE: int = int(os.getenv("REPORT_CHUNK_SIZE", "50000"))
+    REPORT_CACHE_TTL_SECONDS: int = int(os.getenv("REPORT_CACHE_TTL_SECONDS", "600"))
+    REPORT_CACHE_MAX_ENTRIES: int = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "64"))
+    
+    # Auth rate limiting (token buckets: burst size, refill per minute)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_IP_BURST: int = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+    RATE_LIMIT_IP_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "10"))
+    RATE_LIMIT_USERNAME_BURST: int = int(os.getenv("RATE_LIMIT_USERNAME_BURST", "5"))
+    RATE_LIMIT_USERNAME_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_USERNAME_PER_MINUTE", "2"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_STORE_PATH: Optional[str] = os.getenv("RATE_LIMIT_STORE_PATH")
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    
+    # Query cache (PK lookups and selected list queries); the shared store needs redis
+    QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "false").lower() == "true"
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+    QUERY_CACHE_TTL_SECONDS: int = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "60"))
+    QUERY_CACHE_REDIS_URL: Optional[str] = os.getenv("QUERY_CACHE_REDIS_URL")
+    
+    # Attachment storage (content-addressed files on local disk; thumbnails need Pillow)
+    STORAGE_DIR: str = os.getenv("STORAGE_DIR", "./storage")
+    STORAGE_MAX_UPLOAD_MB: int = int(os.getenv("STORAGE_MAX_UPLOAD_MB", "50"))
+    
+    # Serving (SERVER_WORKERS > 1 or "auto" runs the preforking server)
+    SERVER_WORKERS: str = os.getenv("SERVER_WORKERS", "1")
+    SERVER_PRELOAD: bool = os.getenv("SERVER_PRELOAD", "true").lower() == "true"
+    SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+    SERVER_BOOT_TIMEOUT: int = int(os.getenv("SERVER_BOOT_TIMEOUT", "60"))
+    
+    # Connection pool per worker; DB_MAX_CONNECTIONS (0 = no limit) is shared by all workers
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
     
     # CORS
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "*").split(",")
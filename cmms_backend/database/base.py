@@ -0,0 +1,65 @@
+"""
+Shared declarative registry for all SQLAlchemy models
+Every model module maps onto the single Base defined here. Models are grouped
+into bounded contexts which are imported lazily, so mappers are only built for
+the contexts this deployment actually uses.
+"""
+import importlib
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Table
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.schema import sort_tables
+
+Base = declarative_base()
+
+# Bounded context name -> module that declares its models
+BOUNDED_CONTEXTS: Dict[str, str] = {
+    "cmms": "database.models_cmms",
+    "platform": "database.models",
+}
+
+
+def _resolve_contexts(contexts: Optional[Iterable[str]]) -> List[str]:
+    if contexts is None:
+        from config.app_config import config
+        contexts = config.MODEL_CONTEXTS
+
+    resolved = []
+    for context in contexts:
+        context = context.strip()
+        if not context:
+            continue
+        if context not in BOUNDED_CONTEXTS:
+            raise ValueError(f"Unknown model context: {context}")
+        if context not in resolved:
+            resolved.append(context)
+    return resolved
+
+
+def load_models(contexts: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Import the model modules of the given bounded contexts
+    Defaults to the contexts enabled in config.MODEL_CONTEXTS
+    Returns the loaded context names
+    """
+    resolved = _resolve_contexts(contexts)
+    for context in resolved:
+        importlib.import_module(BOUNDED_CONTEXTS[context])
+    return resolved
+
+
+def context_tables(contexts: Optional[Iterable[str]] = None) -> List[Table]:
+    """
+    Return the tables owned by the given bounded contexts, in dependency order
+    Used by create_all, schema export and migrations so all three agree
+    """
+    resolved = load_models(contexts)
+    modules = {BOUNDED_CONTEXTS[context] for context in resolved}
+
+    tables = []
+    for mapper in Base.registry.mappers:
+        if mapper.class_.__module__ in modules and mapper.local_table is not None:
+            if mapper.local_table not in tables:
+                tables.append(mapper.local_table)
+    return sort_tables(tables)
@@ -2,7 +2,7 @@
 Database connection and session management
 Supports MySQL with connection pooling and auto-reconnect
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
@@ -10,23 +10,43 @@ from typing import Generator
 import logging
 
 from config.app_config import config
+from database import events  # noqa: F401 - registers session change tracking
+from database import sync  # noqa: F401 - registers sync tombstones
+from database import reliability  # noqa: F401 - maintains reliability rollups
+from database import reorder  # noqa: F401 - maintains the reorder set
+from database import query_cache  # noqa: F401 - invalidates cached query results
 
 logger = logging.getLogger(__name__)
 
 # Database engine
 engine = None
 SessionLocal = None
+_tables_created = False
 
 
-def create_database_engine():
-    """Create database engine with appropriate settings"""
+def pool_settings(workers: int = 1) -> dict:
+    """
+    QueuePool size for one of `workers` server processes
+    Each worker holds its own pool. With DB_MAX_CONNECTIONS set, the budget
+    is split evenly so that workers * (pool_size + max_overflow) stays within
+    it (keep it below the server's max_connections minus admin/script headroom).
+    """
+    pool_size, max_overflow = config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW
+    if config.DB_MAX_CONNECTIONS > 0:
+        share = max(1, config.DB_MAX_CONNECTIONS // max(1, workers))
+        pool_size = min(pool_size, share)
+        max_overflow = min(max_overflow, share - pool_size)
+    return {"pool_size": pool_size, "max_overflow": max_overflow}
+
+
+def create_database_engine(workers: int = 1):
+    """Create database engine with appropriate settings (pool sized for one of `workers` processes)"""
     global engine, SessionLocal
     
     database_url = config.get_database_url()
     
     # Engine arguments
     engine_args = {
-        "echo": config.DEBUG,  # Log SQL queries in debug mode
         "pool_pre_ping": True,  # Auto-reconnect
     }
     
@@ -34,8 +54,7 @@ def create_database_engine():
     if config.USE_MYSQL:
         engine_args.update({
             "poolclass": QueuePool,
-            "pool_size": 5,
-            "max_overflow": 10,
+            **pool_settings(workers),
             "pool_recycle": 3600,  # Recycle connections after 1 hour
             "pool_timeout": 30,
         })
@@ -50,6 +69,20 @@ def create_database_engine():
         raise
 
 
+def prepare_fork():
+    """Close pooled connections before forking workers; sockets must not be shared across processes"""
+    if engine is not None:
+        engine.dispose()
+
+
+def after_fork(workers: int):
+    """Give a forked worker its own engine with a pool sized for its share of connections"""
+    if engine is not None:
+        # Drop the inherited pool without touching the parent's connections
+        engine.dispose(close=False)
+    create_database_engine(workers)
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency for FastAPI to get database session
@@ -87,22 +120,56 @@ def get_db_session() -> Generator[Session, None, None]:
         db.close()
 
 
+@contextmanager
+def unit_of_work(db: Session) -> Generator[Session, None, None]:
+    """
+    Run a request's writes as one transaction, committed when the block exits
+    Call db.flush() inside the block for generated keys. Instances are not
+    expired by the commit, so responses built from them afterwards need no
+    refresh query; the values are the ones just written (defaults and
+    onupdate are applied in Python by the flush).
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
 def init_db():
-    """Initialize database (create tables)"""
-    from database import models  # Import models to register them
+    """Initialize database (create tables of the enabled model contexts); once per process tree"""
+    from database.base import Base, context_tables
+    from database.migrations import stamp, upgrade
+    global _tables_created
+    
+    # Workers forked from a preloaded server inherit the flag and skip the check
+    if _tables_created:
+        return
     
     if engine is None:
         create_database_engine()
     
-    # Import all models to ensure they're registered
-    from database.models_cmms import Base
-    
+    tables = context_tables()
+    fresh = not any(inspect(engine).has_table(table.name) for table in tables)
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=engine, tables=tables)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Failed to create database tables: {e}")
         raise
+    
+    # A new database already matches the models; existing tables get their
+    # new columns, indexes and backfills from the versioned migrations
+    if fresh:
+        stamp(engine)
+    elif config.MIGRATE_ON_STARTUP:
+        upgrade(engine)
+    _tables_created = True
 
 
 def test_connection() -> bool:
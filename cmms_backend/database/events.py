@@ -0,0 +1,93 @@
+"""
+Session change tracking
+Collects the rows written through any session and notifies registered
+listeners once the transaction commits. Used to invalidate caches and to
+fan out change notifications without touching every router.
+"""
+import logging
+from typing import Callable, Dict, List, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# table name -> operation ("insert", "update", "delete", "bulk") -> primary keys
+ChangeSet = Dict[str, Dict[str, Set]]
+
+_PENDING_KEY = "pending_changes"
+
+_commit_listeners: List[Callable[[ChangeSet], None]] = []
+
+
+def register_commit_listener(listener: Callable[[ChangeSet], None]) -> Callable[[ChangeSet], None]:
+    """
+    Register a callable invoked with the ChangeSet of every committed transaction
+    Can be used as a decorator. Listeners must be fast and must not raise.
+    """
+    if listener not in _commit_listeners:
+        _commit_listeners.append(listener)
+    return listener
+
+
+def unregister_commit_listener(listener: Callable[[ChangeSet], None]):
+    """Remove a previously registered commit listener"""
+    if listener in _commit_listeners:
+        _commit_listeners.remove(listener)
+
+
+def _record(session: Session, table_name: str, operation: str, pk):
+    changes = session.info.setdefault(_PENDING_KEY, {})
+    changes.setdefault(table_name, {}).setdefault(operation, set()).add(pk)
+
+
+def _primary_key(obj):
+    identity = inspect(obj).identity
+    if identity is None:
+        return None
+    return identity[0] if len(identity) == 1 else identity
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flush_changes(session, flush_context):
+    for operation, objects in (
+        ("insert", session.new),
+        ("update", session.dirty),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            if operation == "update" and not session.is_modified(obj):
+                continue
+            table = inspect(obj).mapper.local_table
+            _record(session, table.name, operation, _primary_key(obj))
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _collect_bulk_update(update_context):
+    _record(update_context.session, update_context.mapper.local_table.name, "bulk", None)
+
+
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk_delete(delete_context):
+    _record(delete_context.session, delete_context.mapper.local_table.name, "bulk", None)
+
+
+def notify_changes(changes: ChangeSet):
+    """Invoke the commit listeners for writes committed outside an ORM session"""
+    for listener in list(_commit_listeners):
+        try:
+            listener(changes)
+        except Exception as e:
+            logger.error(f"Commit listener {listener!r} failed: {e}", exc_info=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        notify_changes(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
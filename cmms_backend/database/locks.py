@@ -0,0 +1,78 @@
+"""
+Cross-process locks for maintenance jobs
+Every worker (and every server sharing the database) schedules the periodic
+jobs, but only the one that gets the lock runs them. On MySQL this is a
+named lock (GET_LOCK), held by the connection for the duration of the job
+and released by the server if that connection dies. SQLite databases are
+local files, so a file lock next to the database does the same there.
+"""
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+try:
+    import fcntl
+except ImportError:  # optional dependency (not on Windows, which has no prefork workers either)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _lock_file(engine: Engine, name: str) -> Path:
+    database = engine.url.database
+    if engine.dialect.name == "sqlite" and database and database != ":memory:":
+        return Path(f"{os.path.abspath(database)}.{name}.lock")
+    return Path(tempfile.gettempdir()) / f"{name}.lock"
+
+
+@contextmanager
+def _mysql_lock(engine: Engine, name: str) -> Iterator[bool]:
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[bool]:
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def try_lock(name: str, engine: Optional[Engine] = None) -> Iterator[bool]:
+    """Take the named lock without waiting; yields whether this process holds it"""
+    if engine is None:
+        from database import connection
+
+        if connection.engine is None:
+            connection.create_database_engine()
+        engine = connection.engine
+    if engine.dialect.name in ("mysql", "mariadb"):
+        lock = _mysql_lock(engine, name)
+    else:
+        lock = _file_lock(_lock_file(engine, name))
+    with lock as acquired:
+        if not acquired:
+            logger.debug(f"Lock {name} is held elsewhere, skipping")
+        yield acquired
@@ -0,0 +1,16 @@
+# Schema migrations package
+from database.migrations.runner import (
+    generate_migration,
+    upgrade,
+    stamp,
+    pending_migrations,
+    applied_versions,
+)
+
+__all__ = [
+    "generate_migration",
+    "upgrade",
+    "stamp",
+    "pending_migrations",
+    "applied_versions",
+]
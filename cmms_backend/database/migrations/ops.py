@@ -0,0 +1,137 @@
+"""
+Schema operations for Python migrations
+Each operation inspects the live schema first and does nothing when the
+change is already there, so a migration also runs cleanly on a database
+that create_all() built from the current models. ALTERs use online DDL on
+MySQL like the generated SQL migrations.
+"""
+import logging
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Column, MetaData, Table, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from database.migrations.runner import ONLINE_DDL_CLAUSE, _execute_ddl, _index_key, _is_mysql
+
+logger = logging.getLogger(__name__)
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def has_table(conn: Connection, table_name: str) -> bool:
+    return inspect(conn).has_table(table_name)
+
+
+def has_column(conn: Connection, table_name: str, column_name: str) -> bool:
+    return column_name.lower() in {c["name"].lower() for c in inspect(conn).get_columns(table_name)}
+
+
+def add_column(conn: Connection, table_name: str, column: Column) -> bool:
+    """Add a column unless the table already has it (or does not exist yet)"""
+    if not has_table(conn, table_name) or has_column(conn, table_name, column.name):
+        return False
+    # The DDL compiler needs the column attached to a table
+    Table(table_name, MetaData(), column)
+    spec = conn.dialect.ddl_compiler(conn.dialect, None).get_column_specification(column)
+    sql = f"ALTER TABLE {_quote(conn, table_name)} ADD COLUMN {spec}"
+    if _is_mysql(conn):
+        sql += ONLINE_DDL_CLAUSE
+    _execute_ddl(conn, sql)
+    logger.info(f"Added column {table_name}.{column.name}")
+    return True
+
+
+def _live_indexes(conn: Connection, table_name: str) -> List[dict]:
+    """Indexes and unique constraints as {name, columns, unique}"""
+    inspector = inspect(conn)
+    indexes = [
+        {"name": index["name"], "columns": _index_key(index["column_names"]), "unique": bool(index["unique"])}
+        for index in inspector.get_indexes(table_name)
+    ]
+    indexes += [
+        {"name": constraint["name"], "columns": _index_key(constraint["column_names"]), "unique": True}
+        for constraint in inspector.get_unique_constraints(table_name)
+    ]
+    return indexes
+
+
+def create_index(
+    conn: Connection,
+    table_name: str,
+    name: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+) -> bool:
+    """Create an index unless one with that name or those columns exists; `where` makes it partial off MySQL"""
+    if not has_table(conn, table_name):
+        return False
+    if any(index["name"] == name or index["columns"] == _index_key(columns) for index in _live_indexes(conn, table_name)):
+        return False
+    quoted_columns = ", ".join(_quote(conn, c) for c in columns)
+    unique_sql = "UNIQUE " if unique else ""
+    if _is_mysql(conn):
+        sql = (
+            f"ALTER TABLE {_quote(conn, table_name)} ADD {unique_sql}INDEX {_quote(conn, name)} "
+            f"({quoted_columns}){ONLINE_DDL_CLAUSE}"
+        )
+    else:
+        sql = f"CREATE {unique_sql}INDEX {_quote(conn, name)} ON {_quote(conn, table_name)} ({quoted_columns})"
+        if where:
+            sql += f" WHERE {where}"
+    _execute_ddl(conn, sql)
+    logger.info(f"Created index {name} on {table_name}")
+    return True
+
+
+def drop_unique(conn: Connection, table_name: str, columns: Sequence[str]) -> bool:
+    """
+    Drop the unique index or constraint over exactly `columns`
+    SQLite cannot drop an inline UNIQUE constraint, so the table is rebuilt
+    from its current model there.
+    """
+    if not has_table(conn, table_name):
+        return False
+    key = _index_key(columns)
+    matches = [index for index in _live_indexes(conn, table_name) if index["unique"] and index["columns"] == key]
+    if not matches:
+        return False
+    for index in matches:
+        if _is_mysql(conn):
+            _execute_ddl(conn, f"ALTER TABLE {_quote(conn, table_name)} DROP INDEX {_quote(conn, index['name'])}{ONLINE_DDL_CLAUSE}")
+        elif index["name"] and not index["name"].startswith("sqlite_autoindex"):
+            _execute_ddl(conn, f"DROP INDEX {_quote(conn, index['name'])}")
+        else:
+            rebuild_sqlite_table(conn, table_name)
+            break
+    logger.info(f"Dropped unique constraint on {table_name} ({', '.join(columns)})")
+    return True
+
+
+def rebuild_sqlite_table(conn: Connection, table_name: str):
+    """Recreate a SQLite table from its model, keeping the rows of the columns both share"""
+    from database.base import Base
+    from database import models_cmms  # noqa: F401 - registers the tables
+
+    model = Base.metadata.tables[table_name]
+    temp_name = f"_rebuild_{table_name}"
+    # Copy the referenced tables too so the foreign keys of the copy resolve
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    temp = model.to_metadata(metadata, name=temp_name)
+    live_columns = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    shared = ", ".join(_quote(conn, c.name) for c in model.columns if c.name in live_columns)
+
+    conn.exec_driver_sql(str(CreateTable(temp).compile(dialect=conn.dialect)))
+    conn.exec_driver_sql(
+        f"INSERT INTO {_quote(conn, temp_name)} ({shared}) SELECT {shared} FROM {_quote(conn, table_name)}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {_quote(conn, table_name)}")
+    conn.exec_driver_sql(f"ALTER TABLE {_quote(conn, temp_name)} RENAME TO {_quote(conn, table_name)}")
+    for index in model.indexes:
+        index.create(conn, checkfirst=True)
+    logger.info(f"Rebuilt SQLite table {table_name}")
@@ -0,0 +1,318 @@
+"""
+Versioned schema migration runner
+Diffs the model metadata against the live schema, writes ordered SQL
+migration scripts and applies them, recording applied versions.
+On MySQL, ALTER statements use online DDL (ALGORITHM=INPLACE, LOCK=NONE)
+so indexes and columns can be added without blocking writes.
+
+Besides generated SQL scripts, a migration can be a Python module with an
+`upgrade(conn)` function (for drops and data backfills). Those are written
+with database/migrations/ops.py, whose operations skip changes that are
+already present, so they also apply to databases created by create_all().
+"""
+import hashlib
+import importlib.util
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateTable, UniqueConstraint
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "versions"
+
+ONLINE_DDL_CLAUSE = ", ALGORITHM=INPLACE, LOCK=NONE"
+
+# MySQL error codes raised when an ALTER cannot run with the requested
+# algorithm/lock (ER_ALTER_OPERATION_NOT_SUPPORTED[_REASON])
+ONLINE_DDL_UNSUPPORTED_ERRORS = (1845, 1846)
+
+_FILENAME_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.(sql|py)$")
+
+# Bookkeeping table lives in its own metadata so create_all() never touches it
+_migrations_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _migrations_metadata,
+    Column("version", String(20), primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("checksum", String(64), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _default_engine() -> Engine:
+    from database import connection
+
+    if connection.engine is None:
+        connection.create_database_engine()
+    return connection.engine
+
+
+def _default_tables() -> List[Table]:
+    from database.base import context_tables
+
+    return context_tables()
+
+
+def _is_mysql(engine: Engine) -> bool:
+    return engine.dialect.name in ("mysql", "mariadb")
+
+
+def _index_key(columns) -> Tuple[str, ...]:
+    return tuple(c.lower() for c in columns if c)
+
+
+def _live_index_keys(inspector, table_name: str) -> Tuple[set, set]:
+    """Return (column tuples, names) of every index-like structure on a live table"""
+    keys = set()
+    names = set()
+
+    pk = inspector.get_pk_constraint(table_name)
+    if pk and pk.get("constrained_columns"):
+        keys.add(_index_key(pk["constrained_columns"]))
+
+    for index in inspector.get_indexes(table_name):
+        keys.add(_index_key(index["column_names"]))
+        names.add(index["name"])
+
+    for constraint in inspector.get_unique_constraints(table_name):
+        keys.add(_index_key(constraint["column_names"]))
+        names.add(constraint["name"])
+
+    return keys, names
+
+
+def _model_indexes(table: Table) -> List[Tuple[str, List[str], bool]]:
+    """Return (name, columns, unique) for every index the model declares"""
+    result = []
+    for index in sorted(table.indexes, key=lambda i: i.name or ""):
+        result.append((index.name, [c.name for c in index.columns], bool(index.unique)))
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = [c.name for c in constraint.columns]
+            name = constraint.name or f"uq_{table.name}_{'_'.join(columns)}"
+            result.append((name, columns, True))
+    return result
+
+
+def _add_column_sql(engine: Engine, table: Table, column: Column) -> str:
+    dialect = engine.dialect
+    preparer = dialect.identifier_preparer
+    spec = dialect.ddl_compiler(dialect, None).get_column_specification(column)
+    sql = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {spec}"
+    if _is_mysql(engine):
+        sql += ONLINE_DDL_CLAUSE
+    return sql
+
+
+def _add_index_sql(engine: Engine, table: Table, name: str, columns: List[str], unique: bool) -> str:
+    preparer = engine.dialect.identifier_preparer
+    quoted_table = preparer.format_table(table)
+    quoted_name = preparer.quote(name)
+    quoted_columns = ", ".join(preparer.quote(c) for c in columns)
+    unique_sql = "UNIQUE " if unique else ""
+
+    if _is_mysql(engine):
+        return (
+            f"ALTER TABLE {quoted_table} ADD {unique_sql}INDEX {quoted_name} "
+            f"({quoted_columns}){ONLINE_DDL_CLAUSE}"
+        )
+    return f"CREATE {unique_sql}INDEX {quoted_name} ON {quoted_table} ({quoted_columns})"
+
+
+def diff_schema(engine: Optional[Engine] = None, metadata: Optional[MetaData] = None) -> List[str]:
+    """
+    Compare model metadata with the live database
+    Defaults to the tables of the enabled model contexts.
+    Returns ordered DDL statements: new tables, then new columns, then new indexes.
+    Only additive changes are generated; drops and type changes stay manual.
+    """
+    engine = engine or _default_engine()
+    tables = metadata.sorted_tables if metadata is not None else _default_tables()
+    inspector = inspect(engine)
+    live_tables = set(inspector.get_table_names())
+
+    table_statements = []
+    column_statements = []
+    index_statements = []
+
+    for table in tables:
+        if table.name not in live_tables:
+            table_statements.append(str(CreateTable(table).compile(dialect=engine.dialect)).strip())
+            live_keys, live_names = set(), set()
+            # CREATE TABLE already carries the primary key and UNIQUE constraints
+            live_keys.add(_index_key([c.name for c in table.primary_key.columns]))
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint):
+                    live_keys.add(_index_key([c.name for c in constraint.columns]))
+        else:
+            live_columns = {c["name"].lower() for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name.lower() not in live_columns:
+                    column_statements.append(_add_column_sql(engine, table, column))
+            live_keys, live_names = _live_index_keys(inspector, table.name)
+
+        for name, columns, unique in _model_indexes(table):
+            if name in live_names or _index_key(columns) in live_keys:
+                continue
+            live_keys.add(_index_key(columns))
+            index_statements.append(_add_index_sql(engine, table, name, columns, unique))
+
+    return table_statements + column_statements + index_statements
+
+
+def _migration_files() -> List[Tuple[str, str, Path]]:
+    """Return (version, name, path) for every migration script, in order"""
+    files = []
+    if not MIGRATIONS_DIR.exists():
+        return files
+    for path in sorted(MIGRATIONS_DIR.iterdir()):
+        match = _FILENAME_RE.match(path.name)
+        if match:
+            files.append((match.group(1), match.group(2), path))
+    return files
+
+
+def _checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _split_statements(sql: str) -> List[str]:
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in re.split(r";\s*(?:\n|$)", "\n".join(lines)) if s.strip()]
+
+
+def applied_versions(engine: Optional[Engine] = None) -> Dict[str, str]:
+    """Return applied migration versions mapped to their recorded checksum"""
+    engine = engine or _default_engine()
+    _migrations_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        rows = conn.execute(schema_migrations.select()).fetchall()
+    return {row.version: row.checksum for row in rows}
+
+
+def pending_migrations(engine: Optional[Engine] = None) -> List[Tuple[str, str, Path]]:
+    """Return migration scripts that have not been applied yet"""
+    applied = applied_versions(engine)
+    pending = []
+    for version, name, path in _migration_files():
+        if version in applied:
+            if applied[version] != _checksum(path):
+                logger.warning(f"Migration {version}_{name} was modified after being applied")
+            continue
+        pending.append((version, name, path))
+    return pending
+
+
+def generate_migration(
+    name: str,
+    engine: Optional[Engine] = None,
+    metadata: Optional[MetaData] = None,
+) -> Optional[Path]:
+    """
+    Write the next migration script for the current schema diff
+    Returns the script path, or None if the schema is already up to date
+    """
+    engine = engine or _default_engine()
+    if pending_migrations(engine):
+        raise RuntimeError("Apply pending migrations before generating a new one")
+
+    statements = diff_schema(engine, metadata)
+    if not statements:
+        logger.info("Schema is up to date, no migration generated")
+        return None
+
+    existing = _migration_files()
+    version = f"{(int(existing[-1][0]) + 1) if existing else 1:04d}"
+    slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "auto"
+    path = MIGRATIONS_DIR / f"{version}_{slug}.sql"
+
+    MIGRATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"-- Migration {version}: {slug}\n")
+        f.write(f"-- Generated {datetime.utcnow().isoformat(timespec='seconds')}Z\n")
+        f.write(f"-- Dialect: {engine.dialect.name}\n\n")
+        for statement in statements:
+            f.write(statement)
+            f.write(";\n\n")
+
+    logger.info(f"Generated migration {path.name} ({len(statements)} statements)")
+    return path
+
+
+def _run_python_migration(conn, path: Path):
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def _execute_ddl(conn, statement: str):
+    """Execute a DDL statement, falling back to a locking ALTER if online DDL is refused"""
+    try:
+        conn.exec_driver_sql(statement)
+    except DBAPIError as e:
+        code = e.orig.args[0] if e.orig is not None and e.orig.args else None
+        if ONLINE_DDL_CLAUSE not in statement or code not in ONLINE_DDL_UNSUPPORTED_ERRORS:
+            raise
+        logger.warning(f"Online DDL not supported, retrying with default algorithm: {e.orig}")
+        conn.exec_driver_sql(statement.replace(ONLINE_DDL_CLAUSE, ""))
+
+
+def _record(conn, version: str, name: str, path: Path):
+    conn.execute(schema_migrations.insert().values(
+        version=version,
+        name=name,
+        checksum=_checksum(path),
+        applied_at=datetime.utcnow(),
+    ))
+
+
+def stamp(engine: Optional[Engine] = None) -> List[str]:
+    """
+    Record all pending migrations as applied without running them
+    For a database whose tables create_all() just built from the current models.
+    """
+    engine = engine or _default_engine()
+    pending = pending_migrations(engine)
+    with engine.begin() as conn:
+        for version, name, path in pending:
+            _record(conn, version, name, path)
+    if pending:
+        logger.info(f"Stamped {len(pending)} migration(s) as applied")
+    return [version for version, _, _ in pending]
+
+
+def upgrade(engine: Optional[Engine] = None) -> List[str]:
+    """
+    Apply all pending migrations in version order
+    Returns the list of applied versions
+    """
+    engine = engine or _default_engine()
+    applied = []
+
+    for version, name, path in pending_migrations(engine):
+        logger.info(f"Applying migration {path.name}")
+        # MySQL commits DDL implicitly, so each migration is recorded only after
+        # all of its statements succeeded; a failed script must be fixed by hand
+        with engine.begin() as conn:
+            if path.suffix == ".py":
+                _run_python_migration(conn, path)
+            else:
+                for statement in _split_statements(path.read_text(encoding="utf-8")):
+                    _execute_ddl(conn, statement)
+            _record(conn, version, name, path)
+        applied.append(version)
+
+    if applied:
+        logger.info(f"Applied {len(applied)} migration(s)")
+    else:
+        logger.info("No pending migrations")
+    return applied
@@ -0,0 +1,15 @@
+"""
+Migration 0001: worksheets.updated_at
+Adds the change timestamp used by incremental sync and stamps existing
+worksheets with their last known change (closed, otherwise created).
+"""
+from sqlalchemy import Column, DateTime
+
+from database.migrations import ops
+
+
+def upgrade(conn):
+    ops.add_column(conn, "worksheets", Column("updated_at", DateTime, nullable=True))
+    conn.exec_driver_sql(
+        "UPDATE worksheets SET updated_at = COALESCE(closed_at, created_at) WHERE updated_at IS NULL"
+    )
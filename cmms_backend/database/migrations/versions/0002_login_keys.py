@@ -0,0 +1,37 @@
+"""
+Migration 0002: normalized login keys
+Adds users.username_lower / users.email_lower, fills them for existing users
+and makes them unique. Where two users differ only in case, the later one
+keeps a NULL key (and cannot log in by that name) until it is renamed.
+"""
+import logging
+
+from sqlalchemy import Column, String, text
+
+from database.migrations import ops
+
+logger = logging.getLogger(__name__)
+
+
+def _backfill(conn, column: str, source: str):
+    """Fill `column` row by row (databases differ in what they allow in UPDATE subqueries)"""
+    taken = {key for (key,) in conn.execute(text(f"SELECT {column} FROM users WHERE {column} IS NOT NULL"))}
+    rows = conn.execute(text(f"SELECT id, {source} FROM users WHERE {column} IS NULL ORDER BY id")).fetchall()
+    for user_id, value in rows:
+        key = value.strip().lower() if value else None
+        if not key:
+            continue
+        if key in taken:
+            logger.warning(f"User {user_id}: {source} {value!r} differs from another user's only in case, rename it to log in with it")
+            continue
+        taken.add(key)
+        conn.execute(text(f"UPDATE users SET {column} = :key WHERE id = :id"), {"key": key, "id": user_id})
+
+
+def upgrade(conn):
+    ops.add_column(conn, "users", Column("username_lower", String(50), nullable=True))
+    ops.add_column(conn, "users", Column("email_lower", String(120), nullable=True))
+    _backfill(conn, "username_lower", "username")
+    _backfill(conn, "email_lower", "email")
+    ops.create_index(conn, "users", "ix_users_username_lower", ["username_lower"], unique=True)
+    ops.create_index(conn, "users", "ix_users_email_lower", ["email_lower"], unique=True)
@@ -0,0 +1,72 @@
+"""
+Migration 0003: tenant scoping
+Adds tenant_id (existing rows belong to the 'default' tenant) and the
+tenant-leading composite indexes, then drops the global unique constraints
+on names, SKUs, serial numbers and asset tags, which are unique per tenant
+now. The per-tenant unique indexes are created before the global ones are
+dropped so uniqueness is enforced throughout.
+"""
+from sqlalchemy import Column, String
+
+from database.migrations import ops
+
+TENANT_TABLES = (
+    "users",
+    "production_lines",
+    "machines",
+    "parts",
+    "inventory_levels",
+    "suppliers",
+    "worksheets",
+    "worksheet_parts",
+    "pm_tasks",
+    "sync_tombstones",
+    "reliability_rollups",
+    "reorder_items",
+)
+
+# (table, index name, columns, unique)
+INDEXES = (
+    ("users", "ix_users_tenant_id", ["tenant_id", "id"], False),
+    ("production_lines", "uq_production_lines_tenant_name", ["tenant_id", "name"], True),
+    ("machines", "uq_machines_tenant_serial_number", ["tenant_id", "serial_number"], True),
+    ("machines", "uq_machines_tenant_asset_tag", ["tenant_id", "asset_tag"], True),
+    ("machines", "ix_machines_tenant_production_line", ["tenant_id", "production_line_id"], False),
+    ("machines", "ix_machines_tenant_updated_at", ["tenant_id", "updated_at"], False),
+    ("parts", "uq_parts_tenant_sku", ["tenant_id", "sku"], True),
+    ("parts", "ix_parts_tenant_category", ["tenant_id", "category"], False),
+    ("parts", "ix_parts_tenant_updated_at", ["tenant_id", "updated_at"], False),
+    ("inventory_levels", "ix_inventory_levels_tenant_last_updated", ["tenant_id", "last_updated"], False),
+    ("suppliers", "uq_suppliers_tenant_name", ["tenant_id", "name"], True),
+    ("worksheets", "ix_worksheets_tenant_machine", ["tenant_id", "machine_id"], False),
+    ("worksheets", "ix_worksheets_tenant_status", ["tenant_id", "status"], False),
+    ("worksheets", "ix_worksheets_tenant_updated_at", ["tenant_id", "updated_at"], False),
+    ("worksheet_parts", "ix_worksheet_parts_tenant_worksheet", ["tenant_id", "worksheet_id"], False),
+    ("pm_tasks", "ix_pm_tasks_tenant_next_due_date", ["tenant_id", "next_due_date"], False),
+    ("pm_tasks", "ix_pm_tasks_tenant_updated_at", ["tenant_id", "updated_at"], False),
+    ("sync_tombstones", "ix_sync_tombstones_tenant_deleted_at", ["tenant_id", "deleted_at"], False),
+    ("reliability_rollups", "uq_reliability_rollups_tenant_machine_day", ["tenant_id", "machine_id", "day"], True),
+    ("reliability_rollups", "ix_reliability_rollups_tenant_day", ["tenant_id", "day"], False),
+    ("reliability_rollups", "ix_reliability_rollups_tenant_line_day", ["tenant_id", "production_line_id", "day"], False),
+    ("reorder_items", "ix_reorder_items_tenant_supplier", ["tenant_id", "supplier_id"], False),
+)
+
+# Global unique constraints replaced by the per-tenant ones above
+GLOBAL_UNIQUES = (
+    ("production_lines", ["name"]),
+    ("machines", ["serial_number"]),
+    ("machines", ["asset_tag"]),
+    ("parts", ["sku"]),
+    ("suppliers", ["name"]),
+)
+
+
+def upgrade(conn):
+    for table_name in TENANT_TABLES:
+        ops.add_column(conn, table_name, Column(
+            "tenant_id", String(36), nullable=False, server_default="default"
+        ))
+    for table_name, name, columns, unique in INDEXES:
+        ops.create_index(conn, table_name, name, columns, unique=unique)
+    for table_name, columns in GLOBAL_UNIQUES:
+        ops.drop_unique(conn, table_name, columns)
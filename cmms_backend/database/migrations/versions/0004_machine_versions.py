@@ -0,0 +1,10 @@
+"""
+Migration 0004: machine versions
+Sets machines.version to 1 on rows created before the column was used for
+optimistic concurrency. The ORM checks the loaded version in every UPDATE
+and DELETE, so rows with a NULL version could not be changed.
+"""
+
+
+def upgrade(conn):
+    conn.exec_driver_sql("UPDATE machines SET version = 1 WHERE version IS NULL")
@@ -0,0 +1,16 @@
+"""
+Migration 0005: soft delete
+Adds deleted_at to the soft-deletable tables, with the index the purger
+scans (partial over deleted rows where the database supports it).
+"""
+from sqlalchemy import Column, DateTime
+
+from database.migrations import ops
+
+SOFT_DELETE_TABLES = ("machines", "parts", "worksheets", "pm_tasks")
+
+
+def upgrade(conn):
+    for table_name in SOFT_DELETE_TABLES:
+        ops.add_column(conn, table_name, Column("deleted_at", DateTime, nullable=True))
+        ops.create_index(conn, table_name, f"ix_{table_name}_deleted_at", ["deleted_at"], where="deleted_at IS NOT NULL")
@@ -0,0 +1,12 @@
+"""
+Migration 0006: profile attachments
+Adds users.profile_attachment_id; scripts/import_attachments.py moves the
+legacy inline pictures into the attachment store.
+"""
+from sqlalchemy import Column, Integer
+
+from database.migrations import ops
+
+
+def upgrade(conn):
+    ops.add_column(conn, "users", Column("profile_attachment_id", Integer, nullable=True))
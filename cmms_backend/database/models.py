@@ -1,14 +1,16 @@
 """
-SQLAlchemy database models for CMMS
+SQLAlchemy database models for the hosting platform
+Bounded context: "platform" (tenants, audit log, async tasks)
+Not loaded unless "platform" is listed in MODEL_CONTEXTS. Users are shared with
+the CMMS context, so this module maps onto the CMMS users table.
 """
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, Enum as SQLEnum, JSON
-from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, JSON
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import uuid
 
-Base = declarative_base()
+from database.base import Base
+from database.models_cmms import User
 
 
 def generate_uuid():
@@ -41,25 +43,6 @@ class TaskType:
 
 
 # Models
-class User(Base):
-    """User model"""
-    __tablename__ = "users"
-    
-    id = Column(String(36), primary_key=True, default=generate_uuid)
-    email = Column(String(255), unique=True, nullable=False, index=True)
-    password_hash = Column(String(255), nullable=False)
-    role = Column(String(50), nullable=False, default=UserRole.USER)
-    two_factor_secret = Column(String(255), nullable=True)
-    balance = Column(Float, default=0.0)
-    tenant_id = Column(String(36), ForeignKey("tenants.id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-    
-    # Relationships
-    tenant = relationship("Tenant", back_populates="users")
-    audit_logs = relationship("AuditLog", back_populates="user")
-
-
 class Tenant(Base):
     """Tenant model"""
     __tablename__ = "tenants"
@@ -71,9 +54,6 @@ class Tenant(Base):
     smtp_config = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-    
-    # Relationships
-    users = relationship("User", back_populates="tenant")
 
 
 class AuditLog(Base):
@@ -81,7 +61,7 @@ class AuditLog(Base):
     __tablename__ = "audit_logs"
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     action = Column(String(255), nullable=False)
     resource_id = Column(String(255), nullable=False)
     ip_address = Column(String(45), nullable=False)
@@ -89,7 +69,7 @@ class AuditLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Relationships
-    user = relationship("User", back_populates="audit_logs")
+    user = relationship(User)
 
 
 class Task(Base):
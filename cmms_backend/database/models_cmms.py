@@ -1,12 +1,19 @@
 """
 SQLAlchemy database models for CMMS - matching actual database schema
+Bounded context: "cmms" (maintenance, inventory, users and roles)
 """
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, String, Integer, Float, Boolean, Date, DateTime, Text, ForeignKey, JSON, Index, UniqueConstraint
+from sqlalchemy.orm import deferred, relationship, validates
 from datetime import datetime
 
-Base = declarative_base()
+from database.base import Base
+from database.tenancy import TenantScoped
+from database.soft_delete import SoftDeletable, deleted_index
+
+
+def login_key(value):
+    """Normalized form of a username or email used for case-insensitive login"""
+    return value.strip().lower() if value else None
 
 
 # User and Role models
@@ -22,16 +29,26 @@ class Role(Base):
     users = relationship("User", back_populates="role_obj")
 
 
-class User(Base):
+class User(TenantScoped, Base):
     """User model matching database schema"""
     __tablename__ = "users"
+    # Usernames and emails stay globally unique: login resolves the tenant from them
+    __table_args__ = (
+        Index("ix_users_tenant_id", "tenant_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String(50), unique=True, nullable=False, index=True)
     full_name = Column(String(100), nullable=True)
     email = Column(String(120), unique=True, nullable=True)
+    # Indexed lower-cased copies of username/email, maintained by _normalize_login
+    username_lower = Column(String(50), unique=True, index=True, nullable=True)
+    email_lower = Column(String(120), unique=True, index=True, nullable=True)
     phone = Column(String(20), nullable=True)
-    profile_picture = Column(Text, nullable=True)
+    # Legacy inline (base64) image, superseded by profile_attachment_id; never loaded with the row
+    profile_picture = deferred(Column(Text, nullable=True))
+    # No FK: attachments -> machines -> users would form a cycle
+    profile_attachment_id = Column(Integer, nullable=True)
     password_hash = Column(String(255), nullable=False)
     role_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
     is_active = Column(Boolean, default=True, nullable=True)
@@ -50,38 +67,53 @@ class User(Base):
     
     # Relationships
     role_obj = relationship("Role", back_populates="users")
+    
+    @validates("username", "email")
+    def _normalize_login(self, key, value):
+        setattr(self, f"{key}_lower", login_key(value))
+        return value
 
 
 # Machine models
-class ProductionLine(Base):
+class ProductionLine(TenantScoped, Base):
     """Production line model"""
     __tablename__ = "production_lines"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_production_lines_tenant_name"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(100), unique=True, nullable=False)
+    name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     location = Column(String(200), nullable=True)
-    created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
     
     machines = relationship("Machine", back_populates="production_line")
 
 
-class Machine(Base):
+class Machine(TenantScoped, SoftDeletable, Base):
     """Machine model"""
     __tablename__ = "machines"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "serial_number", name="uq_machines_tenant_serial_number"),
+        UniqueConstraint("tenant_id", "asset_tag", name="uq_machines_tenant_asset_tag"),
+        Index("ix_machines_tenant_production_line", "tenant_id", "production_line_id"),
+        Index("ix_machines_tenant_updated_at", "tenant_id", "updated_at"),
+        deleted_index("machines"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     production_line_id = Column(Integer, ForeignKey("production_lines.id"), nullable=False)
     name = Column(String(100), nullable=False)
-    serial_number = Column(String(100), unique=True, nullable=True)
+    serial_number = Column(String(100), nullable=True)
     model = Column(String(100), nullable=True)
     manufacturer = Column(String(100), nullable=True)
     manual_pdf_path = Column(String(500), nullable=True)
     install_date = Column(DateTime, nullable=True)
     status = Column(String(50), nullable=True)
     maintenance_interval = Column(String(100), nullable=True)
-    asset_tag = Column(String(50), unique=True, nullable=True)
+    asset_tag = Column(String(50), nullable=True)
     purchase_date = Column(DateTime, nullable=True)
     purchase_price = Column(Float, nullable=True)
     warranty_expiry_date = Column(DateTime, nullable=True)
@@ -99,20 +131,29 @@ class Machine(Base):
     version = Column(Integer, nullable=True)
     created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     updated_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
     
     # Relationships
     production_line = relationship("ProductionLine", back_populates="machines")
+    
+    # Every ORM UPDATE/DELETE checks and bumps `version`; a concurrent change raises StaleDataError
+    __mapper_args__ = {"version_id_col": version}
 
 
 # Inventory models (using parts table)
-class Part(Base):
+class Part(TenantScoped, SoftDeletable, Base):
     """Part/Inventory model"""
     __tablename__ = "parts"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "sku", name="uq_parts_tenant_sku"),
+        Index("ix_parts_tenant_category", "tenant_id", "category"),
+        Index("ix_parts_tenant_updated_at", "tenant_id", "updated_at"),
+        deleted_index("parts"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    sku = Column(String(50), unique=True, nullable=False)
+    sku = Column(String(50), nullable=False)
     name = Column(String(150), nullable=False)
     description = Column(Text, nullable=True)
     category = Column(String(100), nullable=True)
@@ -123,28 +164,34 @@ class Part(Base):
     reorder_quantity = Column(Integer, nullable=True)
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=True)
     last_count_date = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
 
-class InventoryLevel(Base):
+class InventoryLevel(TenantScoped, Base):
     """Inventory level model"""
     __tablename__ = "inventory_levels"
+    __table_args__ = (
+        Index("ix_inventory_levels_tenant_last_updated", "tenant_id", "last_updated"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     part_id = Column(Integer, ForeignKey("parts.id"), unique=True, nullable=False)
     quantity_on_hand = Column(Integer, nullable=True)
     quantity_reserved = Column(Integer, nullable=True)
     bin_location = Column(String(100), nullable=True)
-    last_updated = Column(DateTime, nullable=True)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
 
-class Supplier(Base):
+class Supplier(TenantScoped, Base):
     """Supplier model"""
     __tablename__ = "suppliers"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_suppliers_tenant_name"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(150), unique=True, nullable=False)
+    name = Column(String(150), nullable=False)
     contact_person = Column(String(100), nullable=True)
     email = Column(String(120), nullable=True)
     phone = Column(String(20), nullable=True)
@@ -156,9 +203,15 @@ class Supplier(Base):
 
 
 # Worksheet models
-class Worksheet(Base):
+class Worksheet(TenantScoped, SoftDeletable, Base):
     """Worksheet model"""
     __tablename__ = "worksheets"
+    __table_args__ = (
+        Index("ix_worksheets_tenant_machine", "tenant_id", "machine_id"),
+        Index("ix_worksheets_tenant_status", "tenant_id", "status"),
+        Index("ix_worksheets_tenant_updated_at", "tenant_id", "updated_at"),
+        deleted_index("worksheets"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     machine_id = Column(Integer, ForeignKey("machines.id"), nullable=False)
@@ -170,14 +223,18 @@ class Worksheet(Base):
     repair_finished_time = Column(DateTime, nullable=True)
     total_downtime_hours = Column(Float, nullable=True)
     fault_cause = Column(Text, nullable=True)
-    created_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
     closed_at = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
 
 
-class WorksheetPart(Base):
+class WorksheetPart(TenantScoped, Base):
     """Worksheet part model"""
     __tablename__ = "worksheet_parts"
+    __table_args__ = (
+        Index("ix_worksheet_parts_tenant_worksheet", "tenant_id", "worksheet_id"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     worksheet_id = Column(Integer, ForeignKey("worksheets.id"), nullable=False)
@@ -189,9 +246,14 @@ class WorksheetPart(Base):
 
 
 # PM Task models
-class PMTask(Base):
+class PMTask(TenantScoped, SoftDeletable, Base):
     """Preventive Maintenance Task model"""
     __tablename__ = "pm_tasks"
+    __table_args__ = (
+        Index("ix_pm_tasks_tenant_next_due_date", "tenant_id", "next_due_date"),
+        Index("ix_pm_tasks_tenant_updated_at", "tenant_id", "updated_at"),
+        deleted_index("pm_tasks"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     machine_id = Column(Integer, ForeignKey("machines.id"), nullable=True)
@@ -202,8 +264,8 @@ class PMTask(Base):
     last_executed_date = Column(DateTime, nullable=True)
     next_due_date = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True, nullable=True)
-    created_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
     assigned_to_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     priority = Column(String(20), nullable=True)
     status = Column(String(50), nullable=True)
@@ -212,3 +274,94 @@ class PMTask(Base):
     created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     location = Column(String(200), nullable=True)
 
+
+# Authentication models
+class RevokedToken(Base):
+    """JWT id that may no longer be used (logged out or already rotated refresh token)"""
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(36), primary_key=True)
+    token_type = Column(String(10), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# Offline sync models
+class SyncTombstone(TenantScoped, Base):
+    """Record of a deleted row, kept so offline clients can sync deletions"""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index("ix_sync_tombstones_tenant_deleted_at", "tenant_id", "deleted_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Analytics models
+class ReliabilityRollup(TenantScoped, Base):
+    """Per-machine, per-day reliability figures maintained from closed worksheets"""
+    __tablename__ = "reliability_rollups"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "machine_id", "day", name="uq_reliability_rollups_tenant_machine_day"),
+        Index("ix_reliability_rollups_tenant_day", "tenant_id", "day"),
+        Index("ix_reliability_rollups_tenant_line_day", "tenant_id", "production_line_id", "day"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"), nullable=False)
+    production_line_id = Column(Integer, nullable=True)
+    day = Column(Date, nullable=False)
+    failure_count = Column(Integer, default=0, nullable=False)
+    downtime_hours = Column(Float, default=0.0, nullable=False)
+    repair_hours = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+
+
+class ReorderItem(TenantScoped, Base):
+    """Part below safety stock, maintained whenever stock or reorder settings change"""
+    __tablename__ = "reorder_items"
+    __table_args__ = (
+        Index("ix_reorder_items_tenant_supplier", "tenant_id", "supplier_id"),
+    )
+    
+    # No FK to parts: rows are refreshed after the part itself has been deleted
+    part_id = Column(Integer, primary_key=True, autoincrement=False)
+    supplier_id = Column(Integer, nullable=True)
+    quantity_on_hand = Column(Integer, nullable=False)
+    safety_stock = Column(Integer, nullable=False)
+    suggested_quantity = Column(Integer, nullable=False)
+    flagged_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
+
+
+# Attachment models
+class Attachment(TenantScoped, Base):
+    """Uploaded file (machine manual or photo, profile picture); the content lives in the blob store"""
+    __tablename__ = "attachments"
+    __table_args__ = (
+        Index("ix_attachments_tenant_machine", "tenant_id", "machine_id"),
+        Index("ix_attachments_sha256", "sha256"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"), nullable=True)
+    kind = Column(String(20), nullable=False)
+    filename = Column(String(255), nullable=True)
+    content_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+
+
+# Cache models
+class TableVersion(Base):
+    """Write counter of a table, bumped after every commit that wrote to it (see api/caching.py)"""
+    __tablename__ = "table_versions"
+    
+    table_name = Column(String(64), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,336 @@
+"""
+Query result cache
+Caches primary-key lookups (column values of one row) and selected list
+queries in front of the session: an in-process LRU with TTL, optionally
+backed by a shared store (Redis) for row lookups.
+
+Invalidation is driven by the session: `after_flush` drops the rows each
+flush writes (per table and primary key) and marks the tables written by the
+open transaction, whose sessions then bypass the cache until commit or
+rollback. The commit listener drops the same keys again once the data is
+visible to other sessions, and loads that raced with a write are not stored.
+A worker therefore never serves a stale row after its own write.
+
+Invalidation is process-local: other workers keep their cached rows and
+lists until QUERY_CACHE_TTL_SECONDS expires, whether or not a shared store
+is used. Models with a version column (Machine) are therefore never cached:
+their version is the ETag clients send back in If-Match, and a stale one
+from one worker would fail the precondition on another. For the same reason
+routes that answer with an ETag (api/caching.py conditional_json) must not
+read through this cache: the ETag stamp is shared by all workers, so a body
+built from an older cached row would be served, and then confirmed with 304,
+under the new ETag.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from config.app_config import config
+from database.events import ChangeSet, register_commit_listener
+from database.soft_delete import is_deleted
+from database.tenancy import TenantScoped, session_tenant
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_WRITTEN_KEY = "query_cache_written"
+
+
+class LocalStore:
+    """Thread-safe LRU of (expires_at, value) entries"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys: Iterable):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisStore:
+    """Shared row store; values are pickled column dicts written only by this application"""
+
+    def __init__(self, url: str, prefix: str = "cmms:qc:"):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.prefix = prefix
+
+    def _key(self, key: Tuple[str, Any]) -> str:
+        return f"{self.prefix}{key[0]}:{key[1]}"
+
+    def get(self, key):
+        data = self.client.get(self._key(key))
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl: float):
+        self.client.set(self._key(key), pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, keys: Iterable):
+        names = [self._key(key) for key in keys]
+        if names:
+            self.client.delete(*names)
+
+
+class QueryCache:
+    """Row and list cache with per-table write counters"""
+
+    def __init__(self, enabled: bool, max_entries: int, ttl: float, shared=None):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.local = LocalStore(max_entries)
+        self.shared = shared
+        # Every write to a table bumps its counter: list entries and in-flight loads compare against it
+        self._writes: Dict[str, int] = defaultdict(int)
+        # This worker skips the shared store for tables it wrote recently (other workers may re-store old rows)
+        self._shared_bypass: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def token(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """Write counters of `tables`; take it before loading and pass it to set_*"""
+        return tuple((table, self._writes[table]) for table in sorted(tables))
+
+    def _current(self, token) -> bool:
+        return all(self._writes[table] == count for table, count in token)
+
+    def _use_shared(self, table: str) -> bool:
+        return self.shared is not None and self._shared_bypass.get(table, 0) < time.monotonic()
+
+    def get_row(self, table: str, pk) -> Optional[dict]:
+        key = (table, pk)
+        values = self.local.get(key)
+        if values is None and self._use_shared(table):
+            try:
+                values = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared query cache unavailable: {e}")
+                self.counters["shared_errors"] += 1
+            if values is not None:
+                self.local.set(key, values, self.ttl)
+        self.counters["hits" if values is not None else "misses"] += 1
+        return values
+
+    def set_row(self, table: str, pk, values: dict, token):
+        if not self._current(token):
+            self.counters["skipped"] += 1
+            return
+        key = (table, pk)
+        self.local.set(key, values, self.ttl)
+        if self._use_shared(table):
+            try:
+                self.shared.set(key, values, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared query cache unavailable: {e}")
+                self.counters["shared_errors"] += 1
+
+    def get_rows(self, name: str):
+        entry = self.local.get(("list", name))
+        if entry is not None and self._current(entry[0]):
+            self.counters["hits"] += 1
+            return entry[1]
+        self.counters["misses"] += 1
+        return None
+
+    def set_rows(self, name: str, value, token):
+        if not self._current(token):
+            self.counters["skipped"] += 1
+            return
+        self.local.set(("list", name), (token, value), self.ttl)
+
+    def invalidate(self, table: str, pks: Optional[Iterable] = None):
+        """Drop cached rows of a table (all of them when `pks` is None) and stale its list entries"""
+        with self._lock:
+            self._writes[table] += 1
+            if self.shared is not None:
+                self._shared_bypass[table] = time.monotonic() + self.ttl
+        if pks is None:
+            self.local.delete_where(lambda key: key[0] == table)
+            return
+        keys = [(table, pk) for pk in pks if pk is not None]
+        self.local.delete(keys)
+        if self.shared is not None:
+            try:
+                self.shared.delete(keys)
+            except Exception as e:
+                logger.warning(f"Shared query cache unavailable: {e}")
+                self.counters["shared_errors"] += 1
+        self.counters["invalidations"] += len(keys)
+
+    def clear(self):
+        self.local.clear()
+        with self._lock:
+            for table in list(self._writes):
+                self._writes[table] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared is not None,
+            "entries": len(self.local),
+            "hit_ratio": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            **self.counters,
+        }
+
+
+def _shared_store():
+    if not config.QUERY_CACHE_REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("QUERY_CACHE_REDIS_URL is set but redis is not installed; using the in-process cache only")
+        return None
+    return RedisStore(config.QUERY_CACHE_REDIS_URL)
+
+
+query_cache = QueryCache(
+    enabled=config.QUERY_CACHE_ENABLED,
+    max_entries=config.QUERY_CACHE_MAX_ENTRIES,
+    ttl=config.QUERY_CACHE_TTL_SECONDS,
+    shared=_shared_store() if config.QUERY_CACHE_ENABLED else None,
+)
+
+
+def _identity(obj):
+    identity = inspect(obj).identity
+    if identity is None:
+        return None
+    return identity[0] if len(identity) == 1 else identity
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session, flush_context):
+    written = session.info.setdefault(_WRITTEN_KEY, set())
+    pks = defaultdict(list)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = inspect(obj).mapper.local_table.name
+        written.add(table)
+        pks[table].append(_identity(obj))
+    for table, keys in pks.items():
+        query_cache.invalidate(table, keys)
+
+
+def _invalidate_bulk(context):
+    table = context.mapper.local_table.name
+    context.session.info.setdefault(_WRITTEN_KEY, set()).add(table)
+    query_cache.invalidate(table)
+
+
+event.listen(Session, "after_bulk_update", _invalidate_bulk)
+event.listen(Session, "after_bulk_delete", _invalidate_bulk)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _end_transaction(session):
+    session.info.pop(_WRITTEN_KEY, None)
+
+
+@register_commit_listener
+def _invalidate_committed(changes: ChangeSet):
+    # Other sessions may have cached the old row between our flush and commit
+    for table, operations in changes.items():
+        if "bulk" in operations:
+            query_cache.invalidate(table)
+        else:
+            query_cache.invalidate(table, set().union(*operations.values()))
+
+
+def _bypass(db: Session, tables: Iterable[str]) -> bool:
+    written = db.info.get(_WRITTEN_KEY)
+    return not query_cache.enabled or bool(written and written.intersection(tables))
+
+
+def _attach(db: Session, model, values: dict):
+    """Persistent instance built from cached column values, without SQL"""
+    obj = inspect(model).class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    make_transient_to_detached(obj)
+    return db.merge(obj, load=False)
+
+
+def cached_get(db: Session, model, pk):
+    """Session.get() through the query cache; returns None when the row does not exist"""
+    table = model.__table__.name
+    if _bypass(db, [table]) or inspect(model).version_id_col is not None:
+        return db.get(model, pk)
+    if db.identity_key(model, pk) in db.identity_map:
+        return db.get(model, pk)
+
+    values = query_cache.get_row(table, pk)
+    if values is not None:
+        tenant_id = session_tenant(db)
+        if tenant_id is not None and issubclass(model, TenantScoped) and values.get("tenant_id") != tenant_id:
+            return None
+        if is_deleted(values):
+            return None
+        return _attach(db, model, values)
+
+    token = query_cache.token([table])
+    obj = db.get(model, pk)
+    if obj is not None:
+        values = {attr.key: getattr(obj, attr.key) for attr in inspect(model).column_attrs}
+        query_cache.set_row(table, pk, values, token)
+    return obj
+
+
+def cached_rows(db: Session, name: str, models: Iterable, load: Callable[[], Any]):
+    """
+    Result of `load()` through the query cache, invalidated by writes to `models`
+    `name` must identify the query and its parameters; the session tenant is
+    added to it. The result is shared between requests and must not be mutated.
+    """
+    tables = [model.__table__.name for model in models]
+    if _bypass(db, tables):
+        return load()
+    name = f"{session_tenant(db)}:{name}"
+    result = query_cache.get_rows(name)
+    if result is not None:
+        return result
+    token = query_cache.token(tables)
+    result = load()
+    query_cache.set_rows(name, result, token)
+    return result
@@ -0,0 +1,217 @@
+"""
+Reliability rollups (downtime, failure counts, MTTR, MTBF)
+Closed worksheets are aggregated into one row per machine and day. Whenever
+a worksheet is written, the affected (machine, day) cells are recomputed in
+the same transaction, so reports read a small rollup table instead of
+scanning worksheets.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database.upsert import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+# Worksheet statuses that count as a finished repair
+CLOSED_STATUSES = ("COMPLETED", "CLOSED")
+
+GROUP_BY_OPTIONS = ("machine", "line", "day")
+
+_CELLS_KEY = "reliability_cells"
+
+Cell = Tuple[int, date]
+
+
+def _attribute_values(obj, name: str) -> list:
+    """Old and new values of an attribute within the current flush"""
+    history = inspect(obj).attrs[name].history
+    values = list(chain(history.added, history.deleted, history.unchanged))
+    if not values:
+        values = [getattr(obj, name)]
+    return values
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_cells(session, flush_context, instances):
+    cells = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, "__tablename__", None) != "worksheets":
+            continue
+        if cells is None:
+            cells = session.info.setdefault(_CELLS_KEY, set())
+        for machine_id in _attribute_values(obj, "machine_id"):
+            for breakdown_time in _attribute_values(obj, "breakdown_time"):
+                if machine_id is not None and breakdown_time is not None:
+                    cells.add((machine_id, breakdown_time.date()))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refresh_cells(session, flush_context):
+    cells = session.info.pop(_CELLS_KEY, None)
+    if cells:
+        refresh_cells(session.connection(), cells)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cells(session):
+    session.info.pop(_CELLS_KEY, None)
+
+
+def _repair_hours(breakdown_time: datetime, repair_finished_time: Optional[datetime]) -> float:
+    if repair_finished_time is None or repair_finished_time < breakdown_time:
+        return 0.0
+    return (repair_finished_time - breakdown_time).total_seconds() / 3600
+
+
+def refresh_cells(conn, cells: Iterable[Cell]):
+    """Recompute the rollup rows for the given (machine_id, day) cells"""
+    from database.models_cmms import Machine, Worksheet, ReliabilityRollup
+
+    rows = []
+    for machine_id, day in cells:
+        start = datetime.combine(day, time.min)
+        worksheets = conn.execute(
+            select(Worksheet.breakdown_time, Worksheet.repair_finished_time, Worksheet.total_downtime_hours).where(
+                Worksheet.machine_id == machine_id,
+                Worksheet.status.in_(CLOSED_STATUSES),
+                Worksheet.deleted_at.is_(None),
+                Worksheet.breakdown_time >= start,
+                Worksheet.breakdown_time < start + timedelta(days=1),
+            )
+        ).all()
+        production_line_id, tenant_id = conn.execute(
+            select(Machine.production_line_id, Machine.tenant_id).where(Machine.id == machine_id)
+        ).one()
+
+        repair_hours = [_repair_hours(b, r) for b, r, _ in worksheets]
+        downtime_hours = [d if d is not None else h for (_, _, d), h in zip(worksheets, repair_hours)]
+        rows.append({
+            "tenant_id": tenant_id,
+            "machine_id": machine_id,
+            "production_line_id": production_line_id,
+            "day": day,
+            "failure_count": len(worksheets),
+            "downtime_hours": sum(downtime_hours),
+            "repair_hours": sum(repair_hours),
+            "updated_at": datetime.utcnow(),
+        })
+    upsert_rows(conn, ReliabilityRollup.__table__, rows, key_columns=("tenant_id", "machine_id", "day"))
+
+
+def rebuild_rollups(db: Session, batch_size: int = 5000) -> int:
+    """Recompute every rollup row from the worksheets table; returns rows written"""
+    from database.models_cmms import Machine, Worksheet, ReliabilityRollup
+
+    totals: Dict[Cell, dict] = defaultdict(lambda: {"failure_count": 0, "downtime_hours": 0.0, "repair_hours": 0.0})
+    result = db.execute(
+        select(
+            Worksheet.machine_id, Worksheet.breakdown_time,
+            Worksheet.repair_finished_time, Worksheet.total_downtime_hours
+        ).where(
+            Worksheet.status.in_(CLOSED_STATUSES),
+            Worksheet.breakdown_time.isnot(None)
+        ).execution_options(yield_per=batch_size)
+    )
+    for machine_id, breakdown_time, repair_finished_time, total_downtime_hours in result:
+        cell = totals[(machine_id, breakdown_time.date())]
+        repair = _repair_hours(breakdown_time, repair_finished_time)
+        cell["failure_count"] += 1
+        cell["repair_hours"] += repair
+        cell["downtime_hours"] += total_downtime_hours if total_downtime_hours is not None else repair
+
+    machines = {
+        machine_id: (production_line_id, tenant_id)
+        for machine_id, production_line_id, tenant_id
+        in db.execute(select(Machine.id, Machine.production_line_id, Machine.tenant_id)).all()
+    }
+    db.query(ReliabilityRollup).delete(synchronize_session=False)
+    rows = [
+        {
+            "tenant_id": machines[machine_id][1], "machine_id": machine_id,
+            "production_line_id": machines[machine_id][0], "day": day, **values
+        }
+        for (machine_id, day), values in totals.items()
+        if machine_id in machines
+    ]
+    for i in range(0, len(rows), batch_size):
+        db.execute(ReliabilityRollup.__table__.insert(), rows[i:i + batch_size])
+    db.commit()
+    logger.info(f"Rebuilt {len(rows)} reliability rollup rows")
+    return len(rows)
+
+
+def reliability_report(
+    db: Session,
+    group_by: str,
+    start: date,
+    end: date,
+    machine_id: Optional[int] = None,
+    production_line_id: Optional[int] = None,
+) -> List[dict]:
+    """
+    Aggregate rollups between start and end (inclusive)
+    MTTR = repair hours / failures
+    MTBF = (scheduled hours - downtime hours) / failures, where scheduled hours
+    is the length of the period times the number of machines in the group
+    """
+    from database.models_cmms import Machine, ReliabilityRollup
+
+    group_columns = {
+        "machine": [ReliabilityRollup.machine_id, ReliabilityRollup.production_line_id],
+        "line": [ReliabilityRollup.production_line_id],
+        "day": [ReliabilityRollup.day],
+    }[group_by]
+
+    query = db.query(
+        *group_columns,
+        func.sum(ReliabilityRollup.failure_count),
+        func.sum(ReliabilityRollup.downtime_hours),
+        func.sum(ReliabilityRollup.repair_hours),
+    ).filter(
+        ReliabilityRollup.day >= start,
+        ReliabilityRollup.day <= end,
+    )
+    machine_query = db.query(Machine.production_line_id, func.count(Machine.id)).group_by(Machine.production_line_id)
+    if machine_id is not None:
+        query = query.filter(ReliabilityRollup.machine_id == machine_id)
+        machine_query = machine_query.filter(Machine.id == machine_id)
+    if production_line_id is not None:
+        query = query.filter(ReliabilityRollup.production_line_id == production_line_id)
+        machine_query = machine_query.filter(Machine.production_line_id == production_line_id)
+    rows = query.group_by(*group_columns).order_by(*group_columns).all()
+
+    machines_per_line = dict(machine_query.all())
+    period_hours = ((end - start).days + 1) * 24
+
+    result = []
+    for row in rows:
+        keys = row[:len(group_columns)]
+        failures, downtime, repair = row[len(group_columns):]
+        failures = int(failures or 0)
+        downtime = float(downtime or 0)
+        repair = float(repair or 0)
+
+        if group_by == "machine":
+            scheduled_hours = period_hours
+            item = {"machine_id": keys[0], "production_line_id": keys[1]}
+        elif group_by == "line":
+            scheduled_hours = period_hours * machines_per_line.get(keys[0], 0)
+            item = {"production_line_id": keys[0]}
+        else:
+            scheduled_hours = 24 * sum(machines_per_line.values())
+            item = {"day": keys[0]}
+
+        item.update({
+            "failures": failures,
+            "downtime_hours": round(downtime, 3),
+            "mttr_hours": round(repair / failures, 3) if failures else None,
+            "mtbf_hours": round(max(scheduled_hours - downtime, 0) / failures, 3) if failures else None,
+        })
+        result.append(item)
+    return result
@@ -0,0 +1,120 @@
+"""
+Maintained reorder set (parts below safety stock)
+reorder_items holds exactly the parts whose quantity on hand is below their
+safety stock. Any flush that changes a stock level or a part's reorder
+settings refreshes the affected parts in the same transaction, so the
+low-stock count and the reorder list are read in O(result).
+"""
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, List, Set
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database.upsert import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+_PARTS_KEY = "reorder_parts"
+
+# Attributes that can move a part in or out of the reorder set
+_WATCHED = {
+    "inventory_levels": ("part_id", "quantity_on_hand"),
+    "parts": ("safety_stock", "reorder_quantity", "supplier_id", "deleted_at"),
+}
+
+
+def _changed(obj, attributes) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_parts(session, flush_context):
+    part_ids: Set[int] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table_name = getattr(obj, "__tablename__", None)
+        if table_name not in _WATCHED:
+            continue
+        if obj in session.dirty and not _changed(obj, _WATCHED[table_name]):
+            continue
+        if table_name == "parts":
+            part_ids.add(obj.id)
+        else:
+            history = inspect(obj).attrs.part_id.history
+            part_ids.update(p for p in chain(history.added, history.deleted, history.unchanged) if p is not None)
+    if part_ids:
+        session.info.setdefault(_PARTS_KEY, set()).update(part_ids)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refresh_parts(session, flush_context):
+    part_ids = session.info.pop(_PARTS_KEY, None)
+    if part_ids:
+        refresh_parts(session.connection(), part_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_parts(session):
+    session.info.pop(_PARTS_KEY, None)
+
+
+def _low_stock_query():
+    from database.models_cmms import Part, InventoryLevel
+
+    quantity = func.coalesce(InventoryLevel.quantity_on_hand, 0)
+    return select(
+        Part.id, Part.tenant_id, Part.supplier_id, quantity, Part.safety_stock, Part.reorder_quantity
+    ).select_from(Part).outerjoin(
+        InventoryLevel, InventoryLevel.part_id == Part.id
+    ).where(
+        quantity < Part.safety_stock,
+        Part.deleted_at.is_(None)
+    )
+
+
+def _reorder_row(part_id, tenant_id, supplier_id, quantity_on_hand, safety_stock, reorder_quantity) -> dict:
+    shortfall = safety_stock - quantity_on_hand
+    now = datetime.utcnow()
+    return {
+        "part_id": part_id,
+        "tenant_id": tenant_id,
+        "supplier_id": supplier_id,
+        "quantity_on_hand": quantity_on_hand,
+        "safety_stock": safety_stock,
+        # Order the configured reorder quantity, but never less than the shortfall
+        "suggested_quantity": max(reorder_quantity or 0, shortfall),
+        "flagged_at": now,
+        "updated_at": now,
+    }
+
+
+def refresh_parts(conn, part_ids: Iterable[int]):
+    """Re-evaluate the given parts and add/update/remove their reorder rows"""
+    from database.models_cmms import Part, ReorderItem
+
+    part_ids = list(part_ids)
+    table = ReorderItem.__table__
+    low = conn.execute(_low_stock_query().where(Part.id.in_(part_ids))).all()
+    rows = [_reorder_row(*row) for row in low]
+
+    low_ids = {row["part_id"] for row in rows}
+    cleared = [part_id for part_id in part_ids if part_id not in low_ids]
+    if cleared:
+        conn.execute(table.delete().where(table.c.part_id.in_(cleared)))
+    upsert_rows(conn, table, rows, key_columns=("part_id",), preserve_columns=("flagged_at",))
+
+
+def rebuild_reorder_items(db: Session) -> int:
+    """Recompute the whole reorder set; returns the number of flagged parts"""
+    from database.models_cmms import ReorderItem
+
+    rows: List[dict] = [_reorder_row(*row) for row in db.execute(_low_stock_query()).all()]
+    db.query(ReorderItem).delete(synchronize_session=False)
+    if rows:
+        db.execute(ReorderItem.__table__.insert(), rows)
+    db.commit()
+    logger.info(f"Rebuilt reorder set with {len(rows)} parts")
+    return len(rows)
@@ -0,0 +1,206 @@
+"""
+Soft delete for CMMS entities
+Deleting a machine, part, worksheet or PM task only stamps `deleted_at`, so
+the request writes one row. ORM selects skip deleted rows the same way
+tenant scoping filters other tenants (pass the `include_deleted` execution
+option to see them), and a small partial index over the deleted rows lets
+the purger find them without scanning live data.
+
+The purger hard-deletes rows that have been deleted for longer than
+SOFT_DELETE_RETENTION_HOURS, together with their dependent rows, in batches
+of SOFT_DELETE_PURGE_BATCH rows. Each batch runs in its own short
+transaction (DELETE ... LIMIT on MySQL), so locks are never held for long
+and an interrupted purge simply continues on the next run. Each worker
+schedules the purger, but only the one holding PURGE_LOCK runs it.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Index, and_, event, exists, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from config.app_config import config
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_DELETED = "include_deleted"
+
+# Held while purging so workers and servers sharing the database purge one at a time
+PURGE_LOCK = "cmms_purge"
+
+# Soft-deleted tables in purge order: a machine waits for its worksheets and PM tasks, a part for the worksheets using it
+PURGE_ORDER = ("worksheets", "pm_tasks", "parts", "machines")
+
+# Rows removed together with a purged row: table -> (dependent table, foreign key column)
+_CASCADES = {
+    "worksheets": (("worksheet_parts", "worksheet_id"),),
+    "pm_tasks": (),
+    "parts": (("inventory_levels", "part_id"), ("reorder_items", "part_id")),
+    "machines": (("reliability_rollups", "machine_id"), ("attachments", "machine_id")),
+}
+
+# References that keep a deleted row until the referencing rows are purged themselves
+_BLOCKERS = {
+    "machines": (("worksheets", "machine_id"), ("pm_tasks", "machine_id")),
+    # Live worksheets keep their parts used (and their cost history); purged worksheets take theirs along
+    "parts": (("worksheet_parts", "part_id"),),
+}
+
+
+class SoftDeletable:
+    """Mixin for models that are soft deleted"""
+
+    deleted_at = Column(DateTime, nullable=True)
+
+
+def deleted_index(table_name: str) -> Index:
+    """Index over the deleted rows only (partial where supported, full on MySQL)"""
+    deleted = text("deleted_at IS NOT NULL")
+    return Index(f"ix_{table_name}_deleted_at", "deleted_at", sqlite_where=deleted, postgresql_where=deleted)
+
+
+def soft_delete(obj: SoftDeletable):
+    """Mark a row deleted; it is hidden from queries and purged later"""
+    obj.deleted_at = datetime.utcnow()
+
+
+def is_deleted(values: dict) -> bool:
+    """True for cached column values of a soft-deleted row"""
+    return values.get("deleted_at") is not None
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(execute_state):
+    # Relationship loads are filtered too: a line's machines must not include deleted ones
+    if not execute_state.is_select or execute_state.is_column_load:
+        return
+    if execute_state.execution_options.get(INCLUDE_DELETED):
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(SoftDeletable, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+    )
+
+
+def _tables() -> dict:
+    from database.base import Base
+    from database import models_cmms  # noqa: F401 - registers the tables
+
+    return Base.metadata.tables
+
+
+def _delete_batch(conn: Connection, table, condition, batch_size: int) -> int:
+    """Delete at most `batch_size` rows matching `condition`"""
+    if conn.dialect.name in ("mysql", "mariadb"):
+        statement = table.delete().where(condition).with_dialect_options(mysql_limit=batch_size)
+    else:
+        key = list(table.primary_key.columns)[0]
+        statement = table.delete().where(key.in_(select(key).where(condition).limit(batch_size)))
+    return conn.execute(statement).rowcount
+
+
+def _delete_synced_batch(conn: Connection, table, condition, batch_size: int) -> int:
+    """Delete a batch of rows that offline clients sync, leaving tombstones for them"""
+    from database.models_cmms import SyncTombstone
+
+    rows = conn.execute(select(table.c.id, table.c.tenant_id).where(condition).limit(batch_size)).all()
+    if rows:
+        now = datetime.utcnow()
+        conn.execute(SyncTombstone.__table__.insert(), [
+            {"table_name": table.name, "row_id": row_id, "tenant_id": tenant_id, "deleted_at": now}
+            for row_id, tenant_id in rows
+        ])
+        conn.execute(table.delete().where(table.c.id.in_([row_id for row_id, _ in rows])))
+    return len(rows)
+
+
+def _drain(engine: Engine, table, condition, batch_size: int) -> int:
+    """Delete every row matching `condition`, one batch per transaction"""
+    from database.sync import SYNC_TABLES
+
+    delete_batch = _delete_synced_batch if table.name in SYNC_TABLES else _delete_batch
+    removed = 0
+    while True:
+        with engine.begin() as conn:
+            count = delete_batch(conn, table, condition, batch_size)
+        removed += count
+        if count < batch_size:
+            return removed
+
+
+def _purgeable(tables: dict, name: str, cutoff: datetime):
+    table = tables[name]
+    conditions = [table.c.deleted_at.isnot(None), table.c.deleted_at < cutoff]
+    for blocker_name, column in _BLOCKERS.get(name, ()):
+        blocker = tables[blocker_name]
+        conditions.append(~exists().where(blocker.c[column] == table.c.id))
+    return and_(*conditions)
+
+
+def purge_deleted(
+    engine: Optional[Engine] = None,
+    retention_hours: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    orphans: bool = False,
+) -> Dict[str, int]:
+    """
+    Hard-delete rows soft-deleted before the retention window and their dependents
+    Sync tombstones past SYNC_TOMBSTONE_RETENTION_DAYS are removed as well.
+    With `orphans`, also removes worksheet parts left behind by parts or
+    worksheets deleted before soft delete existed (a full scan of
+    worksheet_parts). Returns the number of rows removed per table.
+    """
+    if engine is None:
+        from database import connection
+
+        if connection.engine is None:
+            connection.create_database_engine()
+        engine = connection.engine
+    retention_hours = config.SOFT_DELETE_RETENTION_HOURS if retention_hours is None else retention_hours
+    batch_size = batch_size or config.SOFT_DELETE_PURGE_BATCH
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    tables = _tables()
+    removed: Dict[str, int] = defaultdict(int)
+
+    for name in PURGE_ORDER:
+        table = tables[name]
+        condition = _purgeable(tables, name, cutoff)
+        while True:
+            with engine.connect() as conn:
+                ids: List[int] = conn.execute(
+                    select(table.c.id).where(condition).order_by(table.c.id).limit(batch_size)
+                ).scalars().all()
+            if not ids:
+                break
+            for child_name, column in _CASCADES[name]:
+                child = tables[child_name]
+                removed[child_name] += _drain(engine, child, child.c[column].in_(ids), batch_size)
+            with engine.begin() as conn:
+                removed[name] += conn.execute(
+                    table.delete().where(table.c.id.in_(ids), table.c.deleted_at.isnot(None))
+                ).rowcount
+            if len(ids) < batch_size:
+                break
+
+    if orphans:
+        worksheet_parts, parts, worksheets = tables["worksheet_parts"], tables["parts"], tables["worksheets"]
+        removed["worksheet_parts"] += _drain(engine, worksheet_parts, or_(
+            ~exists().where(parts.c.id == worksheet_parts.c.part_id),
+            ~exists().where(worksheets.c.id == worksheet_parts.c.worksheet_id),
+        ), batch_size)
+
+    from database.sync import purge_tombstones
+
+    with Session(bind=engine) as db:
+        removed["sync_tombstones"] += purge_tombstones(db)
+
+    removed = {name: count for name, count in removed.items() if count}
+    if removed:
+        from database.events import notify_changes
+
+        # Cached rows and responses of these tables are stale now
+        notify_changes({name: {"bulk": {None}} for name in removed})
+        logger.info(f"Purged soft-deleted rows older than {cutoff}: {removed}")
+    return removed
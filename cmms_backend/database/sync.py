@@ -0,0 +1,90 @@
+"""
+Delta sync support for offline-first clients
+Deletions of synced rows (hard or soft) are recorded as tombstones in the
+same transaction, and sync watermarks are encoded as opaque tokens.
+"""
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config.app_config import config
+
+logger = logging.getLogger(__name__)
+
+# Tables whose deletions are recorded for /api/v1/sync
+SYNC_TABLES = ("machines", "parts", "inventory_levels", "worksheets", "pm_tasks")
+
+
+def _soft_deleted(obj) -> bool:
+    """True when this flush sets the row's deleted_at"""
+    state = inspect(obj)
+    return "deleted_at" in state.attrs.keys() and any(
+        value is not None for value in state.attrs.deleted_at.history.added
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _record_tombstones(session, flush_context, instances):
+    deleted = [obj for obj in session.deleted if getattr(obj, "__tablename__", None) in SYNC_TABLES]
+    deleted += [
+        obj for obj in session.dirty
+        if getattr(obj, "__tablename__", None) in SYNC_TABLES and _soft_deleted(obj)
+    ]
+    if not deleted:
+        return
+
+    from database.models_cmms import SyncTombstone
+
+    now = datetime.utcnow()
+    for obj in deleted:
+        session.add(SyncTombstone(
+            table_name=obj.__tablename__, row_id=obj.id, tenant_id=obj.tenant_id, deleted_at=now
+        ))
+
+
+def encode_token(watermark: datetime) -> str:
+    """Encode a sync watermark as an opaque URL-safe token"""
+    payload = json.dumps({"v": 1, "t": watermark.isoformat()}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str) -> Optional[datetime]:
+    """Decode a sync token; returns None if the token is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["t"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def next_watermark(query_started_at: datetime) -> datetime:
+    """
+    Watermark handed back to the client
+    Moved back by SYNC_OVERLAP_SECONDS so rows committed by transactions that
+    were still open during the query are picked up by the next sync; clients
+    apply changes as idempotent upserts, so the overlap is harmless.
+    """
+    return query_started_at - timedelta(seconds=config.SYNC_OVERLAP_SECONDS)
+
+
+def watermark_expired(watermark: datetime) -> bool:
+    """True if tombstones older than the watermark may already be purged"""
+    return watermark < datetime.utcnow() - timedelta(days=config.SYNC_TOMBSTONE_RETENTION_DAYS)
+
+
+def purge_tombstones(db: Session) -> int:
+    """Delete tombstones past the retention window; returns the number removed"""
+    from database.models_cmms import SyncTombstone
+
+    cutoff = datetime.utcnow() - timedelta(days=config.SYNC_TOMBSTONE_RETENTION_DAYS)
+    removed = db.query(SyncTombstone).filter(SyncTombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    if removed:
+        logger.info(f"Purged {removed} sync tombstones older than {cutoff}")
+    return removed
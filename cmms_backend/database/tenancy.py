@@ -0,0 +1,70 @@
+"""
+Tenant scoping for CMMS entities
+Every tenant-scoped table carries a `tenant_id` column that leads its
+composite indexes. Once a session is bound to a tenant (from the
+authenticated principal), ORM selects, updates and deletes on scoped
+entities are filtered to that tenant and new rows are stamped with it, so
+queries stay within one tenant's index range. Sessions that are not bound
+to a tenant (login, scripts, maintenance jobs) are not filtered; neither are
+statements run with the `all_tenants` execution option, e.g. checks against
+globally unique columns.
+"""
+from typing import Optional
+
+from sqlalchemy import Column, String, event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+# Tenant of rows created before tenant scoping existed (single-plant installs)
+DEFAULT_TENANT_ID = "default"
+
+_TENANT_KEY = "tenant_id"
+
+ALL_TENANTS = "all_tenants"
+
+
+class TenantScoped:
+    """Mixin for models partitioned by tenant"""
+
+    # Matches the String(36) ids of the platform tenants table
+    tenant_id = Column(String(36), nullable=False, default=DEFAULT_TENANT_ID, server_default=DEFAULT_TENANT_ID)
+
+
+def set_session_tenant(session: Session, tenant_id: Optional[str]):
+    """Bind a session to a tenant; None removes the binding"""
+    if tenant_id is None:
+        session.info.pop(_TENANT_KEY, None)
+    else:
+        session.info[_TENANT_KEY] = tenant_id
+
+
+def session_tenant(session: Session) -> Optional[str]:
+    """Tenant a session is bound to, if any"""
+    return session.info.get(_TENANT_KEY)
+
+
+def claims_tenant(claims: dict) -> str:
+    """Tenant of a verified access token (tokens without a claim belong to the default tenant)"""
+    return claims.get("tenant") or DEFAULT_TENANT_ID
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _filter_by_tenant(execute_state):
+    tenant_id = execute_state.session.info.get(_TENANT_KEY)
+    if tenant_id is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get(ALL_TENANTS):
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(TenantScoped, lambda cls: cls.tenant_id == tenant_id, include_aliases=True)
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_tenant(session, flush_context, instances):
+    tenant_id = session.info.get(_TENANT_KEY)
+    if tenant_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TenantScoped) and obj.tenant_id is None:
+            obj.tenant_id = tenant_id
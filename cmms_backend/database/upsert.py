@@ -0,0 +1,74 @@
+"""
+Dialect-aware upsert for maintained (derived) tables
+Uses INSERT ... ON DUPLICATE KEY UPDATE on MySQL and ON CONFLICT DO UPDATE on
+SQLite, so concurrent writers refreshing the same key do not collide.
+"""
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import Table
+
+
+def upsert_rows(
+    conn,
+    table: Table,
+    rows: List[dict],
+    key_columns: Sequence[str],
+    preserve_columns: Optional[Iterable[str]] = None,
+):
+    """
+    Insert rows, updating every non-key column of rows whose key already exists
+    Columns in `preserve_columns` keep their stored value on update.
+    """
+    if not rows:
+        return
+    skip = set(key_columns) | set(preserve_columns or ())
+    dialect = conn.dialect.name
+
+    for row in rows:
+        update_columns = [k for k in row if k not in skip]
+        if dialect in ("mysql", "mariadb"):
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table).values(**row)
+            stmt = stmt.on_duplicate_key_update(**{k: stmt.inserted[k] for k in update_columns})
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(**row)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c[k] for k in key_columns],
+                set_={k: stmt.excluded[k] for k in update_columns}
+            )
+        else:
+            key_filter = [table.c[k] == row[k] for k in key_columns]
+            updated = conn.execute(table.update().where(*key_filter).values(
+                **{k: row[k] for k in update_columns}
+            ))
+            if updated.rowcount:
+                continue
+            stmt = table.insert().values(**row)
+        conn.execute(stmt)
+
+
+def increment_rows(conn, table: Table, key_column: str, keys: Iterable, counter_column: str):
+    """Add 1 to `counter_column` of each keyed row, inserting missing rows with 1"""
+    counter = table.c[counter_column]
+    dialect = conn.dialect.name
+
+    for key in keys:
+        row = {key_column: key, counter_column: 1}
+        if dialect in ("mysql", "mariadb"):
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table).values(**row).on_duplicate_key_update(**{counter_column: counter + 1})
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(**row).on_conflict_do_update(
+                index_elements=[table.c[key_column]],
+                set_={counter_column: counter + 1}
+            )
+        else:
+            updated = conn.execute(table.update().where(table.c[key_column] == key).values(
+                **{counter_column: counter + 1}
+            ))
+            if updated.rowcount:
+                continue
+            stmt = table.insert().values(**row)
+        conn.execute(stmt)
@@ -0,0 +1,110 @@
+"""
+Login Lookup Benchmark Script
+Compares the previous login lookup (username query, email fallback, role
+query) with the single joined query over the normalized login columns, on a
+seeded in-memory SQLite database. Password hashing is excluded: it costs the
+same on both paths.
+
+Usage:
+    python scripts/benchmark_login.py [--users 20000] [--logins 2000]
+"""
+import sys
+import argparse
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event, or_
+from sqlalchemy.orm import sessionmaker
+
+from database.base import Base, context_tables
+from database.models_cmms import Role, User, login_key
+
+
+def seed(db, users: int):
+    """Insert two roles and `users` users"""
+    now = datetime.utcnow()
+    db.add_all([Role(id=1, name="ADMIN"), Role(id=2, name="USER")])
+    db.bulk_insert_mappings(User, [
+        {"id": i, "username": f"user{i}", "username_lower": f"user{i}",
+         "email": f"User{i}@Example.com", "email_lower": f"user{i}@example.com",
+         "password_hash": "x", "role_id": 1 + i % 2, "is_active": True, "created_at": now}
+        for i in range(1, users + 1)
+    ])
+    db.commit()
+
+
+def previous_lookup(db, identifier: str):
+    """Username query, then email query, then role query"""
+    user = db.query(User).filter(User.username == identifier).first()
+    if not user:
+        user = db.query(User).filter(User.email == identifier).first()
+    if not user:
+        return None, None
+    role = db.query(Role).filter(Role.id == user.role_id).first()
+    return user, role.name if role else None
+
+
+def joined_lookup(db, identifier: str):
+    """One query for user and role over the indexed login columns"""
+    key = login_key(identifier)
+    rows = db.query(User, Role.name).outerjoin(
+        Role, Role.id == User.role_id
+    ).filter(
+        or_(User.username_lower == key, User.email_lower == key)
+    ).limit(2).all()
+    return next((row for row in rows if row[0].username_lower == key), rows[0] if rows else (None, None))
+
+
+def measure(fn, db, identifiers, statements: list) -> tuple:
+    """Total milliseconds and statements per login over all identifiers"""
+    statements.clear()
+    db.expunge_all()
+    start = time.perf_counter()
+    for identifier in identifiers:
+        fn(db, identifier)
+        db.expunge_all()
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, len(statements) / len(identifiers)
+
+
+def main():
+    """Run the benchmark and print a comparison"""
+    parser = argparse.ArgumentParser(description="Compare login lookup paths")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--logins", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=context_tables(["cmms"]))
+    db = sessionmaker(bind=engine)()
+    seed(db, args.users)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    rng = random.Random(42)
+    # Email logins are exact-case for the previous path, which is case sensitive on SQLite
+    identifiers = [
+        f"user{i}" if rng.random() < 0.5 else f"User{i}@Example.com"
+        for i in (rng.randint(1, args.users) for _ in range(args.logins))
+    ]
+    for identifier in identifiers[:50]:
+        old_user, old_role = previous_lookup(db, identifier)
+        new_user, new_role = joined_lookup(db, identifier)
+        assert old_user.id == new_user.id and old_role == new_role, "Lookup paths disagree"
+
+    old_ms, old_statements = measure(previous_lookup, db, identifiers, statements)
+    new_ms, new_statements = measure(joined_lookup, db, identifiers, statements)
+    print(f"Users: {args.users}, logins: {args.logins} (half by email)")
+    print(f"Previous lookup: {old_ms / args.logins * 1000:8.1f} us/login, {old_statements:.2f} queries/login")
+    print(f"Joined lookup:   {new_ms / args.logins * 1000:8.1f} us/login, {new_statements:.2f} queries/login")
+    print(f"Speedup:         {old_ms / new_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
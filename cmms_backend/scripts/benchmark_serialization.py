@@ -0,0 +1,117 @@
+"""
+Serialization Benchmark Script
+Compares the Pydantic response path with the fast Row -> dict -> orjson path
+for the inventory list, on a seeded in-memory SQLite database
+
+Usage:
+    python scripts/benchmark_serialization.py [--rows 10000] [--repeat 5]
+"""
+import sys
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database.base import Base, context_tables
+from database.models_cmms import Part, InventoryLevel
+from api.schemas import InventoryDto
+from api.fast_json import dumps, rows_to_dicts, orjson
+
+
+def seed(db, rows: int):
+    """Insert `rows` parts with inventory levels"""
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(Part, [
+        {"id": i, "sku": f"SKU-{i:07d}", "name": f"Part {i}", "buy_price": i * 0.5,
+         "safety_stock": i % 20, "created_at": now, "updated_at": now}
+        for i in range(1, rows + 1)
+    ])
+    db.bulk_insert_mappings(InventoryLevel, [
+        {"part_id": i, "quantity_on_hand": i % 50, "bin_location": f"A-{i % 100}", "last_updated": now}
+        for i in range(1, rows + 1)
+    ])
+    db.commit()
+
+
+def pydantic_path(db) -> bytes:
+    """ORM entities -> InventoryDto per row -> response_model validation -> JSON"""
+    rows = db.query(Part, InventoryLevel).outerjoin(InventoryLevel, InventoryLevel.part_id == Part.id).all()
+    result = [
+        InventoryDto(
+            id=part.id,
+            name=part.name,
+            sku=part.sku,
+            quantity=inv_level.quantity_on_hand if inv_level else 0,
+            min_stock_level=part.safety_stock or 0,
+            location=inv_level.bin_location if inv_level else None,
+            unit_price=part.buy_price,
+            created_at=part.created_at
+        )
+        for part, inv_level in rows
+    ]
+    # What FastAPI does with response_model=List[InventoryDto]
+    validated = TypeAdapter(List[InventoryDto]).validate_python(result, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def fast_path(db) -> bytes:
+    """Column select -> Row tuples -> dicts -> orjson"""
+    rows = db.query(
+        Part.id.label("id"),
+        Part.name.label("name"),
+        Part.sku.label("sku"),
+        func.coalesce(InventoryLevel.quantity_on_hand, 0).label("quantity"),
+        func.coalesce(Part.safety_stock, 0).label("min_stock_level"),
+        InventoryLevel.bin_location.label("location"),
+        Part.buy_price.label("unit_price"),
+        Part.created_at.label("created_at"),
+    ).outerjoin(InventoryLevel, InventoryLevel.part_id == Part.id).all()
+    return dumps(rows_to_dicts(rows))
+
+
+def measure(fn, db, repeat: int) -> float:
+    """Best wall time in milliseconds over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        db.expunge_all()
+        start = time.perf_counter()
+        fn(db)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    """Run the benchmark and print a comparison"""
+    parser = argparse.ArgumentParser(description="Compare list serialization paths")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=context_tables(["cmms"]))
+    db = sessionmaker(bind=engine)()
+    seed(db, args.rows)
+
+    # Both paths must produce the same document
+    assert json.loads(pydantic_path(db)) == json.loads(fast_path(db)), "Serialization paths disagree"
+
+    slow_ms = measure(pydantic_path, db, args.repeat)
+    fast_ms = measure(fast_path, db, args.repeat)
+    print(f"Rows: {args.rows} (encoder: {'orjson' if orjson else 'json'})")
+    print(f"Pydantic path: {slow_ms:8.1f} ms")
+    print(f"Fast path:     {fast_ms:8.1f} ms")
+    print(f"Speedup:       {slow_ms / fast_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
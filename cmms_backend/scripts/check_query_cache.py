@@ -0,0 +1,133 @@
+"""
+Query Cache Correctness Check
+Runs writes and reads against a temporary SQLite database and verifies that
+the query cache never returns a stale row or list after a write made by the
+same worker: ORM updates and deletes, bulk updates, reads inside the writing
+transaction, rollbacks, loads racing a write and tenant isolation, and that
+versioned models are not cached.
+Exits non-zero on the first stale read.
+
+Usage:
+    python scripts/check_query_cache.py
+"""
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ["QUERY_CACHE_ENABLED"] = "true"
+os.environ.pop("QUERY_CACHE_REDIS_URL", None)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.base import Base, context_tables
+from database.models_cmms import Machine, PMTask, ProductionLine, WorksheetPart, Worksheet, User, Role
+from database.query_cache import query_cache, cached_get, cached_rows
+from database.tenancy import set_session_tenant
+
+
+def check(condition: bool, message: str):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def main():
+    """Run the scenarios"""
+    path = Path(tempfile.mkdtemp()) / "query_cache.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine, tables=context_tables(["cmms"]))
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        db.add_all([Role(id=1, name="ADMIN"), ProductionLine(id=1, name="Line 1")])
+        db.add(User(id=1, username="tech", password_hash="x", role_id=1))
+        db.add_all([Machine(id=1, production_line_id=1, name="Press"),
+                    Machine(id=2, production_line_id=1, name="Lathe", tenant_id="other")])
+        db.add_all([PMTask(id=1, machine_id=1, task_name="Press"),
+                    PMTask(id=2, machine_id=2, task_name="Lathe", tenant_id="other")])
+        db.add(Worksheet(id=1, machine_id=1, assigned_to_user_id=1, title="Leak", status="PENDING"))
+        db.add(WorksheetPart(worksheet_id=1, part_id=1, quantity_used=1))
+        db.commit()
+
+    def read_name(task_id=1):
+        with Session() as db:
+            task = cached_get(db, PMTask, task_id)
+            return task.task_name if task else None
+
+    def read_parts():
+        with Session() as db:
+            return cached_rows(db, "worksheet_parts:1", [WorksheetPart], lambda: db.query(
+                WorksheetPart.part_id, WorksheetPart.quantity_used
+            ).filter(WorksheetPart.worksheet_id == 1).all())
+
+    check(read_name() == "Press", "first read loads the row")
+    hits = query_cache.counters["hits"]
+    check(read_name() == "Press" and query_cache.counters["hits"] == hits + 1, "second read is a cache hit")
+
+    with Session() as db:
+        task = cached_get(db, PMTask, 1)
+        task.task_name = "Press 2"
+        db.flush()
+        check(cached_get(db, PMTask, 1).task_name == "Press 2", "writing session sees its flushed change")
+        check(read_name() == "Press", "other sessions still see the committed row before commit")
+        db.commit()
+    check(read_name() == "Press 2", "update through a cached instance is visible after commit")
+
+    with Session() as db:
+        db.query(PMTask).filter(PMTask.id == 1).update({"task_name": "Press 3"}, synchronize_session=False)
+        db.commit()
+    check(read_name() == "Press 3", "bulk update invalidates the table")
+
+    with Session() as db:
+        cached_get(db, PMTask, 1).task_name = "Discarded"
+        db.flush()
+        db.rollback()
+    check(read_name() == "Press 3", "rolled back write is not served")
+
+    # A load that started before a write must not store its (old) result
+    token = query_cache.token(["pm_tasks"])
+    with Session() as db:
+        db.query(PMTask).filter(PMTask.id == 1).update({"task_name": "Press 4"}, synchronize_session=False)
+        db.commit()
+    query_cache.set_row("pm_tasks", 1, {"id": 1, "task_name": "Press 3"}, token)
+    check(read_name() == "Press 4", "load racing a write is not cached")
+
+    check(read_parts()[0].quantity_used == 1, "list query loads")
+    with Session() as db:
+        db.query(WorksheetPart).filter(WorksheetPart.worksheet_id == 1).one().quantity_used = 5
+        db.commit()
+    check(read_parts()[0].quantity_used == 5, "list query is invalidated by a write to its table")
+
+    with Session() as db:
+        db.delete(cached_get(db, WorksheetPart, 1))
+        db.commit()
+    check(read_parts() == [], "deleted row disappears from the list")
+
+    check(read_name(2) == "Lathe", "unscoped session caches a row of another tenant")
+    with Session() as db:
+        set_session_tenant(db, "default")
+        check(cached_get(db, PMTask, 2) is None, "cached row of another tenant is not returned")
+
+    with Session() as db:
+        task = cached_get(db, PMTask, 1)
+        db.delete(task)
+        db.commit()
+    check(read_name() is None, "deleted row is not served")
+
+    # Other workers' caches are only invalidated by the TTL; a stale version would fail their If-Match
+    misses = query_cache.counters["misses"]
+    with Session() as db:
+        cached_get(db, Machine, 1)
+    check(query_cache.counters["misses"] == misses, "versioned models bypass the cache")
+
+    print(f"Query cache stats: {query_cache.stats()}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
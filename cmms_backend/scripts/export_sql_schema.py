@@ -11,16 +11,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlalchemy.schema import CreateTable, CreateIndex
 from sqlalchemy.dialects import mysql
-from database.connection import engine
-from database.models import Base
+from database.base import context_tables
 
 def export_schema():
     """Export database schema to SQL file"""
     output_file = Path(__file__).parent.parent / "database" / "cmms_schema.sql"
     output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    # Get all tables
-    tables = Base.metadata.tables
+    # Get tables of the enabled model contexts, in dependency order
+    tables = context_tables()
     
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("-- CMMS Database Schema\n")
@@ -29,7 +28,8 @@ def export_schema():
         f.write("SET FOREIGN_KEY_CHECKS=0;\n\n")
         
         # Create tables
-        for table_name, table in tables.items():
+        for table in tables:
+            table_name = table.name
             # CREATE TABLE statement
             create_table = CreateTable(table).compile(dialect=mysql.dialect())
             f.write(f"-- Table: {table_name}\n")
@@ -0,0 +1,38 @@
+"""
+Attachment Garbage Collection Script
+Removes stored files (and their thumbnails) that no attachment row references
+any more, e.g. after attachments were deleted or purged with their machine.
+Files newer than the grace period are kept since their upload may still be
+committing.
+
+Usage:
+    python scripts/gc_attachments.py [--grace-hours 1]
+"""
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.connection import get_db_session
+from database.models_cmms import Attachment
+from api.storage import blob_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove unreferenced attachment files")
+    parser.add_argument("--grace-hours", type=float, default=1, help="Keep files modified within this window")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    try:
+        with get_db_session() as db:
+            # Includes every tenant: a blob may be shared across tenants
+            referenced = {sha256 for (sha256,) in db.query(Attachment.sha256).distinct()}
+        removed = blob_store.collect_garbage(referenced, grace_seconds=args.grace_hours * 3600)
+        print(f"Files removed: {removed}")
+    except Exception as e:
+        print(f"Error collecting attachment garbage: {e}")
+        sys.exit(1)
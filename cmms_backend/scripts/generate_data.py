@@ -0,0 +1,421 @@
+"""
+Synthetic Data Generator
+Fills the CMMS tables with a deterministic, FK-consistent synthetic plant
+for scale testing: users, lines, suppliers, machines, parts with stock,
+worksheets, worksheet parts and PM tasks.
+
+Distributions follow what real plants look like: a few machines break far
+more often than the rest (lognormal failure weights), part usage is Zipfian
+and open worksheets are the recent ones. Every chunk draws from its own
+seeded generator, so the same seed and sizes produce the same rows (apart
+from the password salt) no matter how many workers or which chunk size load
+them.
+
+Rows are written in parallel chunks, either as multi-row INSERTs (any
+database) or as CSV files loaded with LOAD DATA LOCAL INFILE (MySQL).
+
+Usage:
+    python scripts/generate_data.py --create                      # ~10M rows
+    python scripts/generate_data.py --create --scale 0.01         # ~100k rows
+    python scripts/generate_data.py --method load-data --workers 8
+"""
+import sys
+import os
+import argparse
+import csv
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+# Row counts at scale 1.0: about 10M rows, most of them worksheets and worksheet parts
+DEFAULT_SIZES = {
+    "users": 500,
+    "lines": 20,
+    "suppliers": 200,
+    "machines": 2000,
+    "parts": 50000,
+    "worksheets": 4000000,
+    "pm_tasks": 20000,
+}
+# Rows per seeded generator; chunks are whole blocks so the chunk size does not change the data
+RNG_BLOCK = 10000
+PARTS_PER_WORKSHEET = 1.5
+HISTORY_DAYS = 730
+END_DATE = "2026-01-01"
+
+# (table, size that drives its chunks), parents before children
+LOAD_ORDER = [
+    ("users", "users"),
+    ("production_lines", "lines"),
+    ("suppliers", "suppliers"),
+    ("machines", "machines"),
+    ("parts", "parts"),
+    ("inventory_levels", "parts"),
+    ("worksheets", "worksheets"),
+    ("worksheet_parts", "worksheets"),
+    ("pm_tasks", "pm_tasks"),
+]
+
+FAULT_CAUSES = ["Bearing wear", "Belt failure", "Sensor fault", "Hydraulic leak", "Overheating",
+                "Electrical short", "Misalignment", "Operator error", "Lubrication", "Software fault"]
+CATEGORIES = ["Bearings", "Belts", "Filters", "Sensors", "Motors", "Hydraulics", "Electrical",
+              "Fasteners", "Seals", "Lubricants", "Pneumatics", "Controls"]
+MANUFACTURERS = ["Siemens", "ABB", "Bosch", "Fanuc", "Haas", "Mazak", "DMG Mori", "Okuma"]
+
+
+def scaled_sizes(scale: float = 1.0, **overrides) -> Dict[str, int]:
+    """DEFAULT_SIZES times `scale` (at least 1 row each), with explicit overrides"""
+    sizes = {name: max(1, int(round(count * scale))) for name, count in DEFAULT_SIZES.items()}
+    sizes.update({name: count for name, count in overrides.items() if count is not None})
+    return sizes
+
+
+def _rng(seed: int, *key: int) -> np.random.Generator:
+    return np.random.default_rng([seed, *key])
+
+
+@lru_cache(maxsize=None)
+def _machine_failure_cdf(seed: int, machines: int) -> np.ndarray:
+    """Lognormal failure weights: roughly a tenth of the machines raise ~40% of the breakdowns"""
+    weights = _rng(seed, 1001).lognormal(0.0, 1.25, machines)
+    return np.cumsum(weights) / weights.sum()
+
+
+@lru_cache(maxsize=None)
+def _part_usage_cdf(seed: int, parts: int) -> np.ndarray:
+    """Zipf(1.07) usage over parts; popularity ranks are shuffled across part ids"""
+    ranks = _rng(seed, 1002).permutation(parts) + 1
+    weights = 1.0 / ranks ** 1.07
+    return np.cumsum(weights) / weights.sum()
+
+
+@lru_cache(maxsize=None)
+def _part_prices(seed: int, parts: int) -> np.ndarray:
+    return np.round(_rng(seed, 1003).lognormal(3.0, 1.2, parts), 2)
+
+
+@lru_cache(maxsize=None)
+def _worksheet_part_offsets(seed: int, worksheets: int) -> np.ndarray:
+    """offsets[w] = number of worksheet part rows before worksheet w (0-based)"""
+    counts = _rng(seed, 1004).poisson(PARTS_PER_WORKSHEET, worksheets)
+    return np.concatenate(([0], np.cumsum(counts)))
+
+
+def _pick(cdf: np.ndarray, rng: np.random.Generator, n: int) -> np.ndarray:
+    """1-based ids drawn from a cumulative distribution"""
+    return np.minimum(np.searchsorted(cdf, rng.random(n)), len(cdf) - 1) + 1
+
+
+def _timestamps(end: np.datetime64, seconds_ago: np.ndarray) -> np.ndarray:
+    return end - seconds_ago.astype("timedelta64[s]")
+
+
+def _nullable(mask: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Object array with None where `mask` is set"""
+    values = values.astype(object)
+    values[mask] = None
+    return values
+
+
+def generate_chunk(table: str, sizes: Dict[str, int], seed: int, start: int, stop: int,
+                   password_hash: str, tenant_id: str) -> Dict[str, list]:
+    """Columns of rows [start, stop) of a table (for worksheet_parts: rows of worksheets [start, stop))"""
+    columns: Dict[str, list] = {}
+    for block_start in range(start, stop, RNG_BLOCK):
+        block = _generate_block(table, sizes, seed, block_start, min(block_start + RNG_BLOCK, stop), password_hash, tenant_id)
+        for name, values in block.items():
+            columns.setdefault(name, []).extend(values)
+    return columns
+
+
+def _generate_block(table: str, sizes: Dict[str, int], seed: int, start: int, stop: int,
+                    password_hash: str, tenant_id: str) -> Dict[str, list]:
+    rng = _rng(seed, [name for name, _ in LOAD_ORDER].index(table), start)
+    ids = np.arange(start + 1, stop + 1)
+    n = len(ids)
+    end = np.datetime64(END_DATE, "s")
+    history = HISTORY_DAYS * 86400
+    created = _timestamps(end, np.full(n, history))
+    columns: Dict[str, object] = {}
+
+    if table == "users":
+        names = [f"user{i}" for i in ids.tolist()]
+        columns = {
+            "id": ids, "username": names, "username_lower": names, "full_name": [f"Technician {i}" for i in ids.tolist()],
+            "email": [f"{name}@plant.local" for name in names], "email_lower": [f"{name}@plant.local" for name in names],
+            "password_hash": [password_hash] * n, "role_id": np.where(ids == 1, 1, 2), "is_active": [True] * n,
+            "shift_type": rng.choice(["DAY", "NIGHT", "ROTATING"], n), "created_at": created, "updated_at": created,
+        }
+    elif table == "production_lines":
+        columns = {
+            "id": ids, "name": [f"Line {i}" for i in ids.tolist()], "location": [f"Hall {1 + i % 4}" for i in ids.tolist()],
+            "created_at": created, "updated_at": created,
+        }
+    elif table == "suppliers":
+        columns = {
+            "id": ids, "name": [f"Supplier {i}" for i in ids.tolist()], "email": [f"orders{i}@supplier.local" for i in ids.tolist()],
+            "country": rng.choice(["DE", "HU", "AT", "PL", "CZ", "IT"], n), "created_at": created,
+        }
+    elif table == "machines":
+        columns = {
+            "id": ids, "production_line_id": 1 + (ids - 1) % sizes["lines"], "name": [f"Machine {i}" for i in ids.tolist()],
+            "serial_number": [f"SN-{i:08d}" for i in ids.tolist()], "asset_tag": [f"AT-{i:08d}" for i in ids.tolist()],
+            "manufacturer": rng.choice(MANUFACTURERS, n), "model": [f"M{m}" for m in rng.integers(100, 999, n).tolist()],
+            "status": rng.choice(["RUNNING", "IDLE", "DOWN", "MAINTENANCE"], n, p=[0.8, 0.1, 0.05, 0.05]),
+            "criticality_level": rng.choice(["LOW", "MEDIUM", "HIGH"], n, p=[0.3, 0.5, 0.2]),
+            "install_date": _timestamps(end, rng.integers(history, 10 * 365 * 86400, n)),
+            "operating_hours": np.round(rng.uniform(0, 60000, n), 1), "version": np.ones(n, dtype=np.int64),
+            "created_at": created, "updated_at": created,
+        }
+    elif table == "parts":
+        columns = {
+            "id": ids, "sku": [f"SKU-{i:08d}" for i in ids.tolist()], "name": [f"Part {i}" for i in ids.tolist()],
+            "category": rng.choice(CATEGORIES, n), "unit": ["pcs"] * n,
+            "buy_price": _part_prices(seed, sizes["parts"])[start:stop],
+            "sell_price": np.round(_part_prices(seed, sizes["parts"])[start:stop] * 1.25, 2),
+            "safety_stock": rng.integers(0, 25, n), "reorder_quantity": rng.integers(5, 100, n),
+            "supplier_id": rng.integers(1, sizes["suppliers"] + 1, n), "created_at": created, "updated_at": created,
+        }
+    elif table == "inventory_levels":
+        columns = {
+            "id": ids, "part_id": ids, "quantity_on_hand": rng.negative_binomial(2, 0.05, n),
+            "quantity_reserved": rng.integers(0, 3, n), "bin_location": [f"{chr(65 + i % 26)}-{i % 500:03d}" for i in ids.tolist()],
+            "last_updated": _timestamps(end, rng.integers(0, 30 * 86400, n)),
+        }
+    elif table == "worksheets":
+        age = rng.integers(0, history, n)
+        breakdown = _timestamps(end, age)
+        repair_hours = np.round(rng.lognormal(1.0, 0.8, n), 2)
+        finished = breakdown + (repair_hours * 3600).astype("timedelta64[s]")
+        # Breakdowns of the last three days are still open more often than not
+        is_open = (age < 3 * 86400) & (rng.random(n) < 0.6)
+        status = np.where(is_open, rng.choice(["PENDING", "IN_PROGRESS"], n), rng.choice(["COMPLETED", "CLOSED"], n, p=[0.3, 0.7]))
+        columns = {
+            "id": ids, "machine_id": _pick(_machine_failure_cdf(seed, sizes["machines"]), rng, n),
+            "assigned_to_user_id": rng.integers(1, sizes["users"] + 1, n),
+            "title": [f"Breakdown {i}" for i in ids.tolist()], "status": status, "breakdown_time": breakdown,
+            "repair_finished_time": _nullable(is_open, finished), "total_downtime_hours": _nullable(is_open, repair_hours),
+            "fault_cause": rng.choice(FAULT_CAUSES, n), "created_at": breakdown,
+            "updated_at": np.where(is_open, breakdown, finished), "closed_at": _nullable(status != "CLOSED", finished),
+        }
+    elif table == "worksheet_parts":
+        offsets = _worksheet_part_offsets(seed, sizes["worksheets"])
+        counts = np.diff(offsets[start:stop + 1])
+        m = int(counts.sum())
+        part_ids = _pick(_part_usage_cdf(seed, sizes["parts"]), rng, m)
+        columns = {
+            "id": np.arange(offsets[start] + 1, offsets[stop] + 1), "worksheet_id": np.repeat(ids, counts),
+            "part_id": part_ids, "quantity_used": rng.geometric(0.5, m),
+            "unit_cost_at_time": _part_prices(seed, sizes["parts"])[part_ids - 1],
+            "added_at": _timestamps(end, rng.integers(0, history, m)),
+        }
+    elif table == "pm_tasks":
+        frequency = rng.choice([7, 14, 30, 90, 180, 365], n)
+        last_executed = _timestamps(end, (rng.random(n) * frequency * 86400).astype(np.int64))
+        columns = {
+            "id": ids, "machine_id": rng.integers(1, sizes["machines"] + 1, n), "task_name": [f"PM {i}" for i in ids.tolist()],
+            "task_type": rng.choice(["INSPECTION", "LUBRICATION", "CALIBRATION", "REPLACEMENT"], n),
+            "frequency_days": frequency, "last_executed_date": last_executed,
+            "next_due_date": last_executed + (frequency * 86400).astype("timedelta64[s]"),
+            "is_active": rng.random(n) < 0.95, "assigned_to_user_id": rng.integers(1, sizes["users"] + 1, n),
+            "priority": rng.choice(["LOW", "MEDIUM", "HIGH"], n), "status": ["SCHEDULED"] * n,
+            "created_at": created, "updated_at": created,
+        }
+    else:
+        raise ValueError(f"Unknown table: {table}")
+
+    columns["tenant_id"] = [tenant_id] * len(columns["id"])
+    return {name: values.tolist() if isinstance(values, np.ndarray) else list(values) for name, values in columns.items()}
+
+
+_engines = {}
+
+
+def _engine(database_url: str, method: str):
+    """One engine per worker process; SQLite connections trade durability for load speed"""
+    engine = _engines.get(database_url)
+    if engine is None:
+        is_sqlite = database_url.startswith("sqlite")
+        connect_args = {"timeout": 600} if is_sqlite else {}
+        if method == "load-data":
+            connect_args["local_infile"] = True
+        engine = create_engine(database_url, poolclass=NullPool, connect_args=connect_args)
+        if is_sqlite:
+            @event.listens_for(engine, "connect")
+            def _fast_sqlite(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.close()
+        _engines[database_url] = engine
+    return engine
+
+
+def _csv_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def load_chunk(database_url: str, method: str, csv_dir: Optional[str], table_name: str, sizes: Dict[str, int],
+               seed: int, start: int, stop: int, password_hash: str, tenant_id: str) -> int:
+    """Generate one chunk and write it; returns the number of rows written"""
+    from database.base import Base
+    import database.models_cmms  # noqa: F401 - registers the CMMS tables
+
+    table = Base.metadata.tables[table_name]
+    columns = generate_chunk(table_name, sizes, seed, start, stop, password_hash, tenant_id)
+    names = list(columns)
+    rows = list(zip(*columns.values()))
+    if not rows:
+        return 0
+
+    engine = _engine(database_url, method)
+    with engine.begin() as conn:
+        if engine.dialect.name == "mysql":
+            # Rows are FK-consistent by construction
+            conn.exec_driver_sql("SET foreign_key_checks=0, unique_checks=0")
+        if method == "load-data":
+            path = Path(csv_dir) / f"{table_name}-{start:010d}.csv"
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerows([_csv_value(v) for v in row] for row in rows)
+            conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE '{path.as_posix()}' INTO TABLE {table_name} "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+                f"({', '.join(names)})"
+            )
+        else:
+            conn.execute(table.insert(), [dict(zip(names, row)) for row in rows])
+    return len(rows)
+
+
+def generate_plant(
+    database_url: str,
+    sizes: Dict[str, int],
+    seed: int = 42,
+    workers: int = 1,
+    chunk_size: int = 50000,
+    method: str = "insert",
+    password: str = "password",
+    tenant_id: Optional[str] = None,
+    create: bool = False,
+    csv_dir: Optional[str] = None,
+    rebuild_derived: bool = True,
+) -> Dict[str, int]:
+    """Load a synthetic plant; returns rows written per table"""
+    import bcrypt
+    from sqlalchemy.orm import sessionmaker
+    from database.base import Base, context_tables
+    from database.models_cmms import Role
+    from database.tenancy import DEFAULT_TENANT_ID
+
+    engine = create_engine(database_url)
+    if method == "load-data" and engine.dialect.name != "mysql":
+        raise ValueError("--method load-data needs a MySQL database")
+    if create:
+        tables = context_tables(["cmms"])
+        Base.metadata.drop_all(bind=engine, tables=tables)
+        Base.metadata.create_all(bind=engine, tables=tables)
+    with engine.begin() as conn:
+        conn.execute(Role.__table__.insert(), [{"id": 1, "name": "ADMIN"}, {"id": 2, "name": "USER"}])
+
+    # One hash for every user keeps seeding fast while login still verifies a real bcrypt hash
+    password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(10)).decode("utf-8")
+    tenant_id = tenant_id or DEFAULT_TENANT_ID
+    keep_csv = csv_dir is not None
+    if method == "load-data" and not keep_csv:
+        csv_dir = tempfile.mkdtemp(prefix="cmms-csv-")
+
+    chunk_size = max(RNG_BLOCK, chunk_size - chunk_size % RNG_BLOCK)
+    written = {"roles": 2}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for table_name, size_name in LOAD_ORDER:
+                started = time.perf_counter()
+                total = sizes[size_name]
+                futures = [
+                    pool.submit(load_chunk, database_url, method, csv_dir, table_name, sizes, seed,
+                                start, min(start + chunk_size, total), password_hash, tenant_id)
+                    for start in range(0, total, chunk_size)
+                ]
+                written[table_name] = sum(future.result() for future in futures)
+                elapsed = time.perf_counter() - started
+                print(f"{table_name}: {written[table_name]} rows in {elapsed:.1f}s "
+                      f"({written[table_name] / max(elapsed, 1e-9):,.0f} rows/s)")
+    finally:
+        if method == "load-data" and not keep_csv:
+            shutil.rmtree(csv_dir, ignore_errors=True)
+
+    if rebuild_derived:
+        # Bulk loads bypass the ORM flush hooks that maintain the derived tables
+        from database.reliability import rebuild_rollups
+        from database.reorder import rebuild_reorder_items
+        db = sessionmaker(bind=engine)()
+        try:
+            written["reliability_rollups"] = rebuild_rollups(db)
+            written["reorder_items"] = rebuild_reorder_items(db)
+        finally:
+            db.close()
+    engine.dispose()
+    return written
+
+
+def main():
+    """Parse arguments and load the synthetic plant"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic CMMS plant")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="Target database (default: DATABASE_URL, else the configured database)")
+    parser.add_argument("--create", action="store_true", help="Drop and recreate the CMMS tables first")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the default sizes (1.0 = ~10M rows)")
+    for name in DEFAULT_SIZES:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f"Number of {name}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--method", choices=["insert", "load-data"], default="insert")
+    parser.add_argument("--csv-dir", help="Keep the LOAD DATA files in this directory")
+    parser.add_argument("--password", default="password", help="Password of every generated user")
+    parser.add_argument("--tenant", help="Tenant id of the generated rows")
+    parser.add_argument("--skip-derived", action="store_true", help="Do not rebuild reliability rollups and the reorder set")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        from config.app_config import config
+        database_url = config.get_database_url()
+    sizes = scaled_sizes(args.scale, **{name: getattr(args, name) for name in DEFAULT_SIZES})
+    if args.csv_dir:
+        Path(args.csv_dir).mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    try:
+        written = generate_plant(
+            database_url, sizes, seed=args.seed, workers=args.workers, chunk_size=args.chunk_size,
+            method=args.method, password=args.password, tenant_id=args.tenant, create=args.create,
+            csv_dir=args.csv_dir, rebuild_derived=not args.skip_derived,
+        )
+    except Exception as e:
+        print(f"Error generating data: {e}")
+        sys.exit(1)
+    print(f"Total: {sum(written.values())} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Attachment Import Script
+Moves legacy files into the attachment store:
+- users.profile_picture (base64 or data: URL images stored inline) becomes a
+  profile attachment and the column is cleared
+- machines.manual_pdf_path pointing at a PDF on disk becomes a manual
+  attachment and the path is rewritten to its download URL
+Rows are committed in batches; re-running skips what was already imported.
+
+Usage:
+    python scripts/import_attachments.py [--manuals-dir ./manuals] [--batch 200]
+"""
+import sys
+import argparse
+import base64
+import binascii
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import undefer
+
+from database.connection import get_db_session
+from database.models_cmms import Attachment, Machine, User
+from api.storage import attachment_url, blob_store
+
+# Leading bytes of the accepted formats
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
+
+
+def sniff_content_type(data: bytes):
+    """Content type from the file's magic bytes, or None"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return None
+
+
+def decode_inline_image(value: str):
+    """Bytes of a base64 or data: URL image, or None if it is not one"""
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        return base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def import_profile_pictures(batch: int) -> int:
+    imported = 0
+    last_id = 0
+    while True:
+        with get_db_session() as db:
+            users = db.query(User).options(undefer(User.profile_picture)).filter(
+                User.id > last_id, User.profile_picture.isnot(None)
+            ).order_by(User.id).limit(batch).all()
+            if not users:
+                return imported
+            for user in users:
+                last_id = user.id
+                data = decode_inline_image(user.profile_picture)
+                content_type = sniff_content_type(data) if data else None
+                if not content_type or not content_type.startswith("image/"):
+                    print(f"Skipping user {user.id}: profile_picture is not a recognised image")
+                    continue
+                blob = blob_store.save_bytes(data)
+                attachment = Attachment(
+                    tenant_id=user.tenant_id,
+                    kind="profile",
+                    content_type=content_type,
+                    size=blob.size,
+                    sha256=blob.sha256,
+                    created_by_user_id=user.id
+                )
+                db.add(attachment)
+                db.flush()
+                user.profile_attachment_id = attachment.id
+                user.profile_picture = None
+                imported += 1
+            db.commit()
+
+
+def import_manuals(manuals_dir: Path, batch: int) -> int:
+    imported = 0
+    last_id = 0
+    while True:
+        with get_db_session() as db:
+            machines = db.query(Machine).filter(
+                Machine.id > last_id,
+                Machine.manual_pdf_path.isnot(None),
+                Machine.manual_pdf_path.notlike("/api/v1/attachments/%")
+            ).order_by(Machine.id).limit(batch).all()
+            if not machines:
+                return imported
+            for machine in machines:
+                last_id = machine.id
+                path = manuals_dir / machine.manual_pdf_path
+                if not path.is_file():
+                    print(f"Skipping machine {machine.id}: {path} not found")
+                    continue
+                data = path.read_bytes()
+                if sniff_content_type(data) != "application/pdf":
+                    print(f"Skipping machine {machine.id}: {path} is not a PDF")
+                    continue
+                blob = blob_store.save_bytes(data)
+                attachment = Attachment(
+                    tenant_id=machine.tenant_id,
+                    machine_id=machine.id,
+                    kind="manual",
+                    filename=path.name,
+                    content_type="application/pdf",
+                    size=blob.size,
+                    sha256=blob.sha256
+                )
+                db.add(attachment)
+                db.flush()
+                machine.manual_pdf_path = attachment_url(attachment.id)
+                imported += 1
+            db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import inline profile pictures and manual files as attachments")
+    parser.add_argument("--manuals-dir", type=Path, default=Path("."), help="Directory manual_pdf_path values are relative to")
+    parser.add_argument("--batch", type=int, default=200, help="Rows per transaction")
+    args = parser.parse_args()
+
+    try:
+        print(f"Profile pictures imported: {import_profile_pictures(args.batch)}")
+        print(f"Manuals imported: {import_manuals(args.manuals_dir, args.batch)}")
+    except Exception as e:
+        print(f"Error importing attachments: {e}")
+        sys.exit(1)
@@ -0,0 +1,292 @@
+"""
+Load Test Script
+Seeds a synthetic plant (scripts/generate_data.py) into a local database,
+starts the API against it (or targets a running server) and drives a mixed
+workload with concurrent async clients: login bursts, list polls (half of
+them conditional, as the mobile app does) and stock movements. Reports p50/p95/p99 latency and RPS
+per endpoint as JSON, and can compare a run against a saved baseline.
+
+Usage:
+    python scripts/load_test.py --seed --clients 50 --duration 30 --output baseline.json
+    python scripts/load_test.py --clients 50 --duration 30 --baseline baseline.json
+    python scripts/load_test.py --base-url http://127.0.0.1:8000 --duration 60
+
+Requires httpx. Without --base-url the database is DATABASE_URL (default:
+a SQLite file next to this script) and the server runs with rate limiting off.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.generate_data import generate_plant, scaled_sizes
+
+try:
+    import httpx
+except ImportError:  # optional dependency
+    httpx = None
+
+BACKEND_DIR = Path(__file__).parent.parent
+DEFAULT_DATABASE_URL = f"sqlite:///{BACKEND_DIR / 'loadtest.db'}"
+PASSWORD = "loadtest"
+
+# Workload mix: (weight, scenario)
+SCENARIOS = [
+    (5, "login"),
+    (20, "list_machines"),
+    (20, "list_inventory"),
+    (20, "list_worksheets"),
+    (10, "list_pm_tasks"),
+    (10, "reports_summary"),
+    (10, "stock_movement"),
+    (5, "create_worksheet"),
+]
+
+
+def seed_plant(database_url: str, sizes: Dict[str, int], rng_seed: int = 42):
+    """Create the schema and load a synthetic plant (replaces existing rows)"""
+    written = generate_plant(database_url, sizes, seed=rng_seed, password=PASSWORD, create=True)
+    print(f"Seeded {sum(written.values())} rows")
+
+
+class Recorder:
+    """Latency samples and status counts per endpoint"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, elapsed: float, status_code: int):
+        self.samples[name].append(elapsed)
+        self.statuses[name][status_code] += 1
+        if status_code >= 400:
+            self.errors[name] += 1
+
+    def report(self, duration: float) -> Dict[str, dict]:
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            endpoints[name] = _summary(samples, duration)
+            endpoints[name]["errors"] = self.errors[name]
+            endpoints[name]["statuses"] = dict(sorted(self.statuses[name].items()))
+        everything = [s for samples in self.samples.values() for s in samples]
+        total = _summary(everything, duration) if everything else {}
+        total["errors"] = sum(self.errors.values())
+        return {"endpoints": endpoints, "total": total}
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summary(samples: List[float], duration: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "rps": round(len(ordered) / duration, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class VirtualUser:
+    """One mobile client: logs in, then polls lists and moves stock"""
+
+    def __init__(self, client, recorder: Recorder, rng: random.Random, username: str, parts: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.username = username
+        self.parts = parts
+        self.headers: Dict[str, str] = {}
+        self.etags: Dict[str, str] = {}
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status_code = response.status_code
+        except httpx.HTTPError:
+            response, status_code = None, 599
+        self.recorder.record(name, time.perf_counter() - start, status_code)
+        return response
+
+    async def login(self):
+        response = await self.request(
+            "POST /auth/login", "POST", "/api/v1/auth/login",
+            json={"username": self.username, "password": PASSWORD}
+        )
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def poll(self, name: str, url: str):
+        headers = dict(self.headers)
+        # Half of the polls revalidate a previous copy like the app's HTTP cache does
+        if url in self.etags and self.rng.random() < 0.5:
+            headers["If-None-Match"] = self.etags[url]
+        response = await self.request(name, "GET", url, headers=headers)
+        if response is not None and response.headers.get("etag"):
+            self.etags[url] = response.headers["etag"]
+
+    async def step(self, scenario: str):
+        if scenario == "login" or not self.headers:
+            await self.login()
+        elif scenario == "list_machines":
+            await self.poll("GET /machines", "/api/v1/machines")
+        elif scenario == "list_inventory":
+            await self.poll("GET /inventory", "/api/v1/inventory")
+        elif scenario == "list_worksheets":
+            await self.poll("GET /worksheets", "/api/v1/worksheets")
+        elif scenario == "list_pm_tasks":
+            await self.poll("GET /pm/tasks", "/api/v1/pm/tasks")
+        elif scenario == "reports_summary":
+            await self.request("GET /reports/summary", "GET", "/api/v1/reports/summary", headers=self.headers)
+        elif scenario == "stock_movement":
+            part_id = self.rng.randint(1, self.parts)
+            await self.request(
+                "PUT /inventory/{id}", "PUT", f"/api/v1/inventory/{part_id}",
+                headers=self.headers, json={"quantity": self.rng.randint(0, 100)}
+            )
+        elif scenario == "create_worksheet":
+            await self.request(
+                "POST /worksheets", "POST", "/api/v1/worksheets",
+                headers=self.headers, json={"title": "Load test breakdown"}
+            )
+
+
+async def run_workload(base_url: str, clients: int, duration: float, users: int, parts: int, rng_seed: int) -> dict:
+    """Drive the mixed workload and return the JSON report"""
+    recorder = Recorder()
+    weights = [weight for weight, _ in SCENARIOS]
+    names = [name for _, name in SCENARIOS]
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user(index: int):
+            rng = random.Random(rng_seed + index)
+            user = VirtualUser(client, recorder, rng, f"user{1 + index % users}", parts)
+            await user.login()
+            while time.perf_counter() < deadline:
+                await user.step(rng.choices(names, weights)[0])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "base_url": base_url, "clients": clients, "duration_s": round(elapsed, 2),
+        "scenarios": dict(zip(names, weights)), "seed": rng_seed,
+        "started_at": datetime.utcnow().isoformat(),
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Endpoints whose p95 latency regressed by more than `tolerance` (fraction) or whose RPS dropped"""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def start_server(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    """Start uvicorn against the load test database and wait until it answers"""
+    env = dict(os.environ, DATABASE_URL=database_url, USE_MYSQL="false",
+               RATE_LIMIT_ENABLED="false", LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=str(BACKEND_DIR), env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start")
+
+
+def main():
+    """Seed, run the workload and print or save the report"""
+    parser = argparse.ArgumentParser(description="Load test the CMMS API")
+    parser.add_argument("--base-url", help="Target a running server instead of starting one")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--seed", action="store_true", help="(Re)create and seed the database first")
+    parser.add_argument("--scale", type=float, default=0.005, help="Seed size relative to the generator's ~10M rows")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--rng-seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare with a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if httpx is None:
+        print("httpx is required for the load test (pip install httpx)")
+        sys.exit(1)
+
+    sizes = scaled_sizes(args.scale, users=args.users)
+    if args.seed:
+        seed_plant(args.database_url, sizes, args.rng_seed)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(args.database_url, args.port, args.workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run_workload(base_url, args.clients, args.duration, sizes["users"], sizes["parts"], args.rng_seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Report written to {args.output}")
+    else:
+        print(output)
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(2)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Schema Migration Script
+Generates and applies versioned migrations for the CMMS models
+
+Usage:
+    python scripts/migrate.py status
+    python scripts/migrate.py generate <name>
+    python scripts/migrate.py upgrade
+    python scripts/migrate.py stamp
+"""
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.migrations import generate_migration, upgrade, stamp, pending_migrations, applied_versions
+
+
+def main():
+    """Run the migration command given on the command line"""
+    parser = argparse.ArgumentParser(description="CMMS schema migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show applied and pending migrations")
+    generate_parser = subparsers.add_parser("generate", help="Generate a migration from the model diff")
+    generate_parser.add_argument("name", help="Short migration name, e.g. add_worksheet_indexes")
+    subparsers.add_parser("upgrade", help="Apply pending migrations")
+    subparsers.add_parser("stamp", help="Mark pending migrations as applied without running them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+    if args.command == "status":
+        applied = applied_versions()
+        pending = pending_migrations()
+        print(f"Applied migrations: {len(applied)}")
+        for version in sorted(applied):
+            print(f"  {version}")
+        print(f"Pending migrations: {len(pending)}")
+        for version, name, _ in pending:
+            print(f"  {version}_{name}")
+    elif args.command == "generate":
+        path = generate_migration(args.name)
+        if path:
+            print(f"Migration written to: {path}")
+        else:
+            print("Schema is up to date")
+    elif args.command == "upgrade":
+        versions = upgrade()
+        print(f"Applied {len(versions)} migration(s)")
+    elif args.command == "stamp":
+        versions = stamp()
+        print(f"Stamped {len(versions)} migration(s)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Migration error: {e}")
+        sys.exit(1)
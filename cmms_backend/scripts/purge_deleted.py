@@ -0,0 +1,46 @@
+"""
+Soft-Delete Purge Script
+Hard-deletes machines, parts, worksheets and PM tasks that were deleted more
+than SOFT_DELETE_RETENTION_HOURS ago, with their dependent rows, in batches,
+and sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS. Revocations of
+tokens that have expired anyway are removed too.
+For cron when the in-process purger is off (SOFT_DELETE_PURGE_INTERVAL_SECONDS=0).
+
+Usage:
+    python scripts/purge_deleted.py [--retention-hours 24] [--batch 1000] [--orphans]
+"""
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.connection import get_db_session
+from database.locks import try_lock
+from database.soft_delete import PURGE_LOCK, purge_deleted
+from api.revocation import purge_revoked_tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purge soft-deleted CMMS rows")
+    parser.add_argument("--retention-hours", type=float, default=None, help="Override SOFT_DELETE_RETENTION_HOURS")
+    parser.add_argument("--batch", type=int, default=None, help="Override SOFT_DELETE_PURGE_BATCH")
+    parser.add_argument("--orphans", action="store_true", help="Also remove worksheet parts of missing parts or worksheets")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    try:
+        with try_lock(PURGE_LOCK) as acquired:
+            if not acquired:
+                print("Another purge is running, nothing to do")
+                sys.exit(0)
+            removed = purge_deleted(retention_hours=args.retention_hours, batch_size=args.batch, orphans=args.orphans)
+            with get_db_session() as db:
+                revocations = purge_revoked_tokens(db)
+        print(f"Rows purged: {removed or 'none'}")
+        print(f"Expired token revocations purged: {revocations}")
+    except Exception as e:
+        print(f"Error purging deleted rows: {e}")
+        sys.exit(1)
@@ -0,0 +1,25 @@
+"""
+Reliability Rollup Rebuild Script
+Recomputes reliability_rollups from all closed worksheets
+Run once after deploying the rollup table, or after bulk worksheet imports
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.connection import get_db_session
+from database.reliability import rebuild_rollups
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    try:
+        with get_db_session() as db:
+            rows = rebuild_rollups(db)
+        print(f"Rollup rows written: {rows}")
+    except Exception as e:
+        print(f"Error rebuilding reliability rollups: {e}")
+        sys.exit(1)
@@ -0,0 +1,25 @@
+"""
+Reorder Set Rebuild Script
+Recomputes reorder_items from all parts and inventory levels
+Run once after deploying the reorder table, or after bulk stock imports
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.connection import get_db_session
+from database.reorder import rebuild_reorder_items
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    try:
+        with get_db_session() as db:
+            parts = rebuild_reorder_items(db)
+        print(f"Parts flagged for reorder: {parts}")
+    except Exception as e:
+        print(f"Error rebuilding reorder set: {e}")
+        sys.exit(1)